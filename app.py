@@ -1,20 +1,128 @@
-from flask import Flask, render_template, request, jsonify
-from checkers import CheckersBoard
+import atexit
+
+from flask import Flask, g, render_template, request, jsonify
+from bitboard import SQUARES
+from book import open_book
 from cpu import CPUPlayer
+from evaluation import load_tables
+from journal import GameJournal
+from ponder import Ponder, PonderTotals
+from positionindex import open_index
+from searchstats import SearchStatsTotals
+from sessions import GameStore
+from tablebase import open_tablebase
+from turns import TurnQueue
+from wire import board_delta
 
-# Initialize Flask app and create a new Checkers game instance
+# Initialize Flask app and the store holding each player's game
 app = Flask(__name__)
-game = CheckersBoard()
+# Number of transposition table entries kept for the CPU player of a game
+app.config['CPU_TT_ENTRIES'] = 1 << 16
+# Wall-clock time the CPU player may spend on its whole turn, in milliseconds
+app.config['CPU_MOVE_BUDGET_MS'] = 200
+# Worker processes searching the CPU player's root moves in parallel; 1 searches serially
+app.config['CPU_WORKERS'] = 1
+# Threads playing CPU turns in the background, and the most turns waiting or running at once
+app.config['CPU_TURN_THREADS'] = 4
+app.config['CPU_TURN_QUEUE'] = 64
+# Collect statistics of every CPU search for /stats
+app.config['CPU_SEARCH_STATS'] = True
+# Search the human's likely replies while they think (see ponder.py): the most replies
+# pondered per move, the time one game's ponder may take, and the threads and most
+# ponders waiting or running for all games together
+app.config['CPU_PONDER'] = False
+app.config['CPU_PONDER_REPLIES'] = 8
+app.config['CPU_PONDER_BUDGET_MS'] = 1600
+app.config['CPU_PONDER_THREADS'] = 1
+app.config['CPU_PONDER_QUEUE'] = 16
+# Endgame tablebase file built with `python tablebase.py build`; None plays without one
+app.config['TABLEBASE_PATH'] = None
+# Opening book file built with `python book.py build`; None plays without one
+app.config['BOOK_PATH'] = None
+# Position index built with `python positionindex.py build` from a game collection; it
+# answers /explore, and the CPU player plays a move from it once its book runs out
+app.config['POSITION_INDEX_PATH'] = None
+# Evaluation weights fitted with `python tuning.py fit`; None uses the built-in tables
+app.config['EVALUATION_PATH'] = None
+# Maximum number of games kept in memory, and seconds before an idle game expires
+app.config['GAME_STORE_MAX_GAMES'] = 1000
+app.config['GAME_STORE_IDLE_TTL_S'] = 3600
+# Directory of the games' move logs (see journal.py), so games survive a restart; None keeps
+# games in memory only. Logs are written every GAME_LOG_FLUSH_MS and replaced by a snapshot
+# every GAME_LOG_SNAPSHOT_EVERY moves
+app.config['GAME_LOG_DIR'] = None
+app.config['GAME_LOG_FLUSH_MS'] = 50
+app.config['GAME_LOG_SNAPSHOT_EVERY'] = 32
+# Cookie holding the id of the player's game
+app.config['SESSION_COOKIE'] = 'checkers_session'
+# Settings can be overridden with FLASK_-prefixed environment variables
+app.config.from_prefixed_env()
+journal = None
+if app.config['GAME_LOG_DIR']:
+    journal = GameJournal(app.config['GAME_LOG_DIR'], flush_interval=app.config['GAME_LOG_FLUSH_MS'] / 1000.0,
+                          snapshot_every=app.config['GAME_LOG_SNAPSHOT_EVERY'],
+                          max_age=app.config['GAME_STORE_IDLE_TTL_S'])
+    atexit.register(journal.close)
+store = GameStore(
+    max_games=app.config['GAME_STORE_MAX_GAMES'],
+    idle_ttl=app.config['GAME_STORE_IDLE_TTL_S'],
+    tt_entries=app.config['CPU_TT_ENTRIES'],
+    journal=journal,
+)
+tablebase = open_tablebase(app.config['TABLEBASE_PATH']) if app.config['TABLEBASE_PATH'] else None
+book = open_book(app.config['BOOK_PATH']) if app.config['BOOK_PATH'] else None
+position_index = open_index(app.config['POSITION_INDEX_PATH']) if app.config['POSITION_INDEX_PATH'] else None
+evaluation_tables = load_tables(app.config['EVALUATION_PATH']) if app.config['EVALUATION_PATH'] else None
+search_totals = SearchStatsTotals()
+cpu_turns = TurnQueue(workers=app.config['CPU_TURN_THREADS'], max_pending=app.config['CPU_TURN_QUEUE'])
+ponder_totals = PonderTotals()
+ponder_queue = TurnQueue(workers=app.config['CPU_PONDER_THREADS'], max_pending=app.config['CPU_PONDER_QUEUE'])
+
+def current_session():
+    """
+    Gets the game session of the current request.
+
+    Looks the session up by the id in the request's cookie, starting a new game
+    if the client has none or its game has expired. A new id is sent back in a
+    cookie once the request completes. A game just restored from its log with
+    the CPU player to move gets its CPU turn, lost with the old process.
+
+    Returns:
+        GameSession: The session of the player making the request.
+    """
+    session = store.get_or_create(request.cookies.get(app.config['SESSION_COOKIE']))
+    g.session_id = session.session_id
+    if session.restored:
+        with session.lock:
+            if session.restored:
+                session.restored = False
+                if session.board.current_player == 'B' and not session.board.is_game_over():
+                    start_cpu_turn(session)
+    return session
+
+@app.after_request
+def set_session_cookie(response):
+    """
+    Sends the session id back to the client when it has changed.
+    """
+    session_id = g.get('session_id')
+    if session_id and request.cookies.get(app.config['SESSION_COOKIE']) != session_id:
+        response.set_cookie(app.config['SESSION_COOKIE'], session_id, httponly=True, samesite='Lax')
+    return response
 
 @app.route('/')
 def index():
     """
     Route to serve the main page of the Checkers game.
 
-    Renders the index.html template with the current state of the game board
-    and the current player.
+    Renders the index.html template with the player's game board packed into a
+    string (see ``wire.py``), its version and the current player; the client
+    draws the pieces from it.
     """
-    return render_template('index.html', board=game.board, current_player=game.current_player)
+    session = current_session()
+    with session.lock:
+        return render_template('index.html', squares=session.packed_board(), version=session.version,
+                               current_player=session.board.current_player)
 
 @app.route('/move', methods=['POST'])
 def move():
@@ -22,42 +130,216 @@ def move():
     Route to handle player moves.
 
     Receives the move as JSON data, processes the move, and updates the game state.
-    If the move is valid and it's the CPU's turn, it triggers the CPU to make its move.
+    If the move is valid and it's the CPU's turn, the CPU's move is queued to be played
+    in the background and the response says so with ``cpu_pending``; the client then
+    polls ``/state`` for it. When the queue is full the CPU moves within the request.
+    With pondering on, a human move the CPU has pondered is answered within the request.
+    Moves sent while the CPU's turn is pending are refused with status 409.
+    A client sending the ``version`` of the board it shows gets the changes since
+    then instead of the full board. A multi-capture may be sent hop by hop as
+    ``start`` and ``end``, or whole as a ``path`` of positions. A body without
+    at least two [row, col] positions is refused with status 400.
+    """
+    data = request.get_json(silent=True)
+    path = move_path(data)
+    if path is None:
+        return jsonify({'valid': False}), 400
+    since = data.get('version')
+
+    session = current_session()
+    with session.lock:
+        if session.cpu_pending:
+            return jsonify({'valid': False, 'cpu_pending': True}), 409
+        game = session.board
+        valid_move, next_player, continue_turn, mandatory_capture = game.move_piece(*path)
+
+        if valid_move:
+            session.cpu_moves = []
+            session.record_version(path)
+            # Check if the game is over or if the next player (CPU) can move
+            if not game.is_game_over() and game.current_player == 'B':
+                cpu_move = pondered_move(session)
+                if cpu_move is not None:
+                    play_cpu_move(session, cpu_move)
+                else:
+                    start_cpu_turn(session)
+
+        return generate_response(game, valid_move, continue_turn, mandatory_capture, session.cpu_pending,
+                                 session, since)
+
+def move_path(data):
+    """
+    Reads the positions of a move from the JSON body of a ``/move`` request.
+
+    Args:
+        data: The decoded body; a ``path`` of positions or a ``start`` and ``end``.
+
+    Returns:
+        list: The positions as (row, col) tuples, or None if the body does not
+        hold at least two positions of two integers each.
+    """
+    if not isinstance(data, dict):
+        return None
+    positions = data['path'] if 'path' in data else [data.get('start'), data.get('end')]
+    if not isinstance(positions, list) or len(positions) < 2:
+        return None
+    if not all(isinstance(position, list) and len(position) == 2 and
+               all(type(coordinate) is int for coordinate in position) for position in positions):
+        return None
+    return [tuple(position) for position in positions]
+
+@app.route('/state', methods=['GET'])
+def state():
+    """
+    Route to poll the player's game.
+
+    Returns only ``cpu_pending`` while the CPU's turn is being played, and the full
+    game state once it is done; with a ``version`` query argument, the board
+    changes since that version.
+    """
+    session = current_session()
+    if session.cpu_pending:
+        return jsonify({'cpu_pending': True})
+    with session.lock:
+        return generate_response(session.board, True, False, False, session.cpu_pending,
+                                 session, request.args.get('version', type=int))
+
+@app.route('/explore', methods=['GET'])
+def explore():
     """
-    data = request.json
-    start = tuple(data['start'])
-    end = tuple(data['end'])
+    Route to report what the position index knows of the player's current position.
 
-    valid_move, next_player, continue_turn, mandatory_capture = game.move_piece(start, end)
+    Returns how many indexed games reached the position and how they ended, and
+    the same for each move played from it, most played first, with the move as
+    its path of ``[row, col]`` positions. All zero without a position index.
+    """
+    session = current_session()
+    with session.lock:
+        if position_index is None:
+            return jsonify({'games': 0, 'red_wins': 0, 'black_wins': 0, 'draws': 0, 'moves': []})
+        return jsonify(position_index.lookup(session.board))
+
+def start_cpu_turn(session):
+    """
+    Queues the CPU player's turn to be played in the background, or plays it
+    within the request when the queue is full.
 
-    if valid_move:
-        # Check if the game is over or if the next player (CPU) can move
-        if not game.is_game_over() and game.current_player == 'B':
-            cpu_player_turn()
+    Args:
+        session (GameSession): The game, with the CPU player to move; its lock must be held.
+    """
+    session.cpu_pending = True
+    if not cpu_turns.submit(background_cpu_turn, session, session.generation):
+        session.cpu_pending = False
+        cpu_player_turn(session)
 
-    return generate_response(valid_move, continue_turn, mandatory_capture)
+def background_cpu_turn(session, generation):
+    """
+    Plays the CPU player's turn on a background thread.
+
+    Args:
+        session (GameSession): The game the CPU player moves in.
+        generation (int): The session's game when the turn was queued; if the game
+            has been reset since, the turn is dropped.
+    """
+    with session.lock:
+        if session.generation != generation:
+            return
+        try:
+            cpu_player_turn(session)
+        finally:
+            session.cpu_pending = False
 
-def cpu_player_turn():
+def cpu_player_turn(session, time_budget_ms=None):
     """
     Handles the CPU player's turn.
 
-    Continues to make moves for the CPU player as long as it's the CPU's turn
-    and there are valid moves available.
+    Searches once for the CPU player's move and plays it; a multi-capture is a
+    single move, so the whole turn comes from one search.
+
+    Args:
+        session (GameSession): The game the CPU player moves in; its lock must be held.
+        time_budget_ms (float, optional): Wall-clock time allowed for the turn,
+            in milliseconds. Defaults to the CPU_MOVE_BUDGET_MS setting.
     """
-    while game.current_player == 'B' and game.has_valid_moves('B'):
-        cpu_player = CPUPlayer(game, 'B')
-        cpu_move_start, cpu_move_end = cpu_player.choose_move()
-        if cpu_move_start and cpu_move_end:
-            game.move_piece(cpu_move_start, cpu_move_end)
-        else:
-            break  # Exit the loop if no valid CPU move is found
+    if time_budget_ms is None:
+        time_budget_ms = app.config['CPU_MOVE_BUDGET_MS']
+    game = session.board
+    session.cpu_moves = []
+    if game.current_player != 'B' or not game.has_valid_moves('B'):
+        return
+    cpu_player = CPUPlayer(game, 'B', session.transposition_table, workers=app.config['CPU_WORKERS'],
+                           tablebase=tablebase, book=book, position_index=position_index,
+                           tables=evaluation_tables)
+    if app.config['CPU_SEARCH_STATS']:
+        cpu_move, search_stats = cpu_player.choose_move(time_budget_ms=time_budget_ms, with_stats=True)
+        search_totals.add(search_stats)
+    else:
+        cpu_move = cpu_player.choose_move(time_budget_ms=time_budget_ms)
+    if cpu_move:
+        play_cpu_move(session, cpu_move)
+
+def play_cpu_move(session, cpu_move):
+    """
+    Plays the CPU player's move and, with pondering on, starts pondering the human's replies.
+
+    Args:
+        session (GameSession): The game the CPU player moves in; its lock must be held.
+        cpu_move (tuple): The move, as returned by ``CPUPlayer.choose_move``.
+    """
+    game = session.board
+    game.move_piece(*cpu_move)
+    # One [start, end] square pair per hop
+    session.cpu_moves = [[SQUARES[hop_start], SQUARES[hop_end]]
+                         for hop_start, hop_end in zip(cpu_move, cpu_move[1:])]
+    session.record_version(cpu_move)
+    if app.config['CPU_PONDER'] and game.current_player == 'R' and not game.is_game_over():
+        # The search just made left its best reply for the human in the table
+        entry = session.transposition_table.probe(game.zobrist_key())
+        session.ponder = Ponder(game, 'B', session.transposition_table,
+                                expected_reply=entry[3] if entry is not None else None,
+                                max_replies=app.config['CPU_PONDER_REPLIES'],
+                                reply_budget_ms=app.config['CPU_MOVE_BUDGET_MS'],
+                                budget_ms=app.config['CPU_PONDER_BUDGET_MS'],
+                                tablebase=tablebase, book=book, position_index=position_index)
+        if not ponder_queue.submit(session.ponder.run):
+            session.ponder = None
 
-def generate_response(valid_move, continue_turn, mandatory_capture):
+def pondered_move(session):
+    """
+    Stops the session's ponder and gets its answer to the human's move.
+
+    Args:
+        session (GameSession): The game, with the CPU player to move; its lock must be held.
+
+    Returns:
+        tuple: The pondered CPU move, or None if there is none and the CPU must search.
+    """
+    ponder = session.ponder
+    if ponder is None:
+        return None
+    session.ponder = None
+    ponder.cancel()
+    cpu_move = ponder.answer(session.board)
+    ponder_totals.add(ponder, cpu_move is not None)
+    return cpu_move
+
+def generate_response(game, valid_move, continue_turn, mandatory_capture, cpu_pending=False,
+                      session=None, since=None):
     """
     Generates a JSON response to be sent back to the client.
 
-    Includes information about the validity of the move, the game state, 
-    and whether the game is over.
+    Includes information about the validity of the move, the game state,
+    and whether the game is over. Clients that send the board version they
+    show get the board in the compact format of ``wire.py``: the current
+    ``version``, the changed squares as a ``delta`` (or the whole board as
+    ``squares`` when that version is no longer kept) and the CPU's last turn
+    as ``cpu_moves``. Other clients get the full 8x8 ``board``.
+
+    Args:
+        game (CheckersBoard): The board of the player's game.
+        cpu_pending (bool): Whether the CPU's reply is still being played in the background.
+        session (GameSession, optional): The player's session, for the compact format.
+        since (int, optional): The board version the client shows, or None for the full board.
 
     Returns:
         jsonify: A Flask JSON response containing game state information.
@@ -68,30 +350,58 @@ def generate_response(valid_move, continue_turn, mandatory_capture):
 
     if game_over:
         # Determine the winner based on remaining pieces and valid moves
-        winner = 'R' if not game.has_pieces('B') or not game.has_valid_moves('B') else 'B'
+        winner = game.winner()
         no_legal_moves = not game.has_valid_moves(winner)
 
-    return jsonify({
+    response = {
         'valid': valid_move,
-        'board': game.board,
         'current_player': game.current_player,
         'continue_turn': continue_turn and not game_over,
         'mandatory_capture': mandatory_capture,
         'game_over': game_over,
         'winner': winner,
-        'no_legal_moves': no_legal_moves
-    })
+        'no_legal_moves': no_legal_moves,
+        'cpu_pending': cpu_pending
+    }
+    if since is None or session is None:
+        response['board'] = game.board
+    else:
+        response['version'] = session.version
+        response['cpu_moves'] = session.cpu_moves
+        previous = session.packed_board(since)
+        if previous is None:
+            response['squares'] = session.packed_board()
+        else:
+            response['delta'] = board_delta(previous, session.packed_board())
+    return jsonify(response)
 
 @app.route('/reset', methods=['GET'])
 def reset_game():
     """
     Route to reset the game to its initial state.
 
-    Re-initializes the game board and returns a success response.
+    Re-initializes the player's game board, discards the CPU player's search
+    results and returns a success response.
     """
-    global game
-    game = CheckersBoard()
+    session = current_session()
+    with session.lock:
+        session.reset()
     return jsonify({'success': True})
 
+@app.route('/stats', methods=['GET'])
+def stats():
+    """
+    Route to report server statistics.
+
+    Returns the game store's counters: live games, capacity, and lookup hits,
+    misses, evictions and expirations; the CPU turn queue's depth, turn
+    counts and wait and run times; totals and averages of the CPU player's
+    searches; how often pondering answered the human's move; and, with move
+    logs, the records written and games restored.
+    """
+    return jsonify({'sessions': store.stats(), 'cpu_turns': cpu_turns.stats(), 'search': search_totals.as_dict(),
+                    'ponder': dict(ponder_totals.as_dict(), queue=ponder_queue.stats()),
+                    'journal': journal.stats() if journal is not None else None})
+
 if __name__ == '__main__':
     app.run(debug=True)
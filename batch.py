@@ -0,0 +1,224 @@
+"""
+Array-backed batches of positions, evaluated with NumPy instead of Python loops.
+
+A ``PositionBatch`` holds N positions as an (N, 32) int8 array with one
+column per playable square (numbered as in ``bitboard.py``) and an (N,)
+int8 array of the side to move. Square codes:
+
+    0 empty, 1 red man, 2 red king, -1 black man, -2 black king
+
+Side to move: 1 for Red, -1 for Black. Positions are taken at turn
+boundaries; a multi-capture in progress is not represented.
+
+``evaluate`` scores the whole batch with the piece-square tables, and
+``count_moves`` counts legal moves by running the bitboard shifts of
+``bitboard.py`` on arrays of 32-bit boards. Positions with a multi-capture,
+which are rare, have their capture paths counted one position at a time.
+"""
+import numpy as np
+
+from bitboard import ALL_DIRECTIONS, FORWARD, FULL, capture_paths
+from checkers import CheckersBoard
+from evaluation import DEFAULT_TABLES
+
+EMPTY = 0
+RED_MAN = 1
+RED_KING = 2
+BLACK_MAN = -1
+BLACK_KING = -2
+
+RED = 1
+BLACK = -1
+
+_SQUARES = np.arange(32, dtype=np.uint32)
+_BITS = np.left_shift(np.uint64(1), np.arange(32, dtype=np.uint64))
+
+
+class PositionBatch:
+    """
+    N positions as NumPy arrays.
+
+    Attributes:
+        squares (numpy.ndarray): (N, 32) int8 square codes.
+        to_move (numpy.ndarray): (N,) int8 side to move, RED or BLACK.
+    """
+
+    def __init__(self, squares, to_move):
+        """
+        Wrap existing arrays.
+
+        Args:
+            squares (array_like): (N, 32) square codes.
+            to_move (array_like): (N,) side to move.
+        """
+        self.squares = np.asarray(squares, dtype=np.int8)
+        self.to_move = np.asarray(to_move, dtype=np.int8)
+        if self.squares.ndim != 2 or self.squares.shape[1] != 32 or self.to_move.shape != self.squares.shape[:1]:
+            raise ValueError(f"expected (N, 32) squares and (N,) sides, got {self.squares.shape} and {self.to_move.shape}")
+
+    def __len__(self):
+        return len(self.squares)
+
+    @classmethod
+    def from_boards(cls, boards):
+        """
+        Build a batch from boards.
+
+        Args:
+            boards (iterable): CheckersBoard positions.
+
+        Returns:
+            PositionBatch: The positions, in order.
+        """
+        boards = list(boards)
+        pieces = np.array([(board.men['R'], board.kings['R'], board.men['B'], board.kings['B'])
+                           for board in boards], dtype=np.uint32).reshape(-1, 4)
+        to_move = np.array([RED if board.current_player == 'R' else BLACK for board in boards], dtype=np.int8)
+        bits = (pieces[:, :, None] >> _SQUARES) & 1
+        codes = np.array([RED_MAN, RED_KING, BLACK_MAN, BLACK_KING], dtype=np.int8)
+        squares = (bits.astype(np.int8) * codes[None, :, None]).sum(axis=1, dtype=np.int8)
+        return cls(squares, to_move)
+
+    def bitboards(self):
+        """
+        Get the batch as bitboards.
+
+        Returns:
+            dict: (N,) uint32 arrays keyed by 'men' and 'kings', then by 'R' and 'B'.
+        """
+        def pack(code):
+            return ((self.squares == code).astype(np.uint64) @ _BITS).astype(np.uint32)
+
+        return {
+            'men': {'R': pack(RED_MAN), 'B': pack(BLACK_MAN)},
+            'kings': {'R': pack(RED_KING), 'B': pack(BLACK_KING)},
+        }
+
+    def to_boards(self):
+        """
+        Convert the batch back to boards, e.g. for spot checks.
+
+        Returns:
+            list: One CheckersBoard per position.
+        """
+        bitboards = self.bitboards()
+        boards = []
+        for index in range(len(self)):
+            board = CheckersBoard()
+            board.set_pieces({player: int(bitboards['men'][player][index]) for player in ('R', 'B')},
+                             {player: int(bitboards['kings'][player][index]) for player in ('R', 'B')})
+            board.current_player = 'R' if self.to_move[index] == RED else 'B'
+            boards.append(board)
+        return boards
+
+
+def _value_table(tables):
+    """
+    Lay the piece-square tables out by square code, Black's values negated.
+
+    Args:
+        tables (dict): (men table, kings table) per player.
+
+    Returns:
+        numpy.ndarray: (5, 32) values, row ``code + 2``.
+    """
+    return np.array([
+        [-value for value in tables['B'][1]],
+        [-value for value in tables['B'][0]],
+        [0] * 32,
+        tables['R'][0],
+        tables['R'][1],
+    ], dtype=np.int32)
+
+
+def evaluate(batch, color='R', tables=DEFAULT_TABLES):
+    """
+    Score every position of a batch, as ``CPUPlayer.evaluate_board`` would.
+
+    Args:
+        batch (PositionBatch): The positions.
+        color (str): The player whose perspective the scores take.
+        tables (dict): The piece-square tables.
+
+    Returns:
+        numpy.ndarray: (N,) int32 scores.
+    """
+    values = _value_table(tables)
+    scores = values[batch.squares.astype(np.intp) + 2, np.arange(32)].sum(axis=1, dtype=np.int32)
+    return scores if color == 'R' else -scores
+
+
+def _step(bitboards, direction):
+    """
+    Vectorised ``bitboard.step``: move every piece one step in a direction.
+    """
+    (even_mask, even_shift), (odd_mask, odd_shift) = direction
+    even = bitboards & np.uint32(even_mask)
+    odd = bitboards & np.uint32(odd_mask)
+    if even_shift > 0:
+        return (even << np.uint32(even_shift)) | (odd << np.uint32(odd_shift))
+    return (even >> np.uint32(-even_shift)) | (odd >> np.uint32(-odd_shift))
+
+
+def popcount(bitboards):
+    """
+    Count the set bits of each 32-bit board.
+
+    Args:
+        bitboards (numpy.ndarray): uint32 boards.
+
+    Returns:
+        numpy.ndarray: The counts, as int32.
+    """
+    counts = bitboards - ((bitboards >> np.uint32(1)) & np.uint32(0x55555555))
+    counts = (counts & np.uint32(0x33333333)) + ((counts >> np.uint32(2)) & np.uint32(0x33333333))
+    counts = (counts + (counts >> np.uint32(4))) & np.uint32(0x0F0F0F0F)
+    return ((counts * np.uint32(0x01010101)) >> np.uint32(24)).astype(np.int32)
+
+
+def count_moves(batch, player=None):
+    """
+    Count the legal moves of every position of a batch.
+
+    Captures are mandatory, so a position with a capture counts only its
+    capture paths. Matches ``len(board.get_possible_moves(player))``.
+
+    Args:
+        batch (PositionBatch): The positions.
+        player (str, optional): The player to count for; defaults to the side to move
+            of each position.
+
+    Returns:
+        numpy.ndarray: (N,) int32 move counts.
+    """
+    if player is None:
+        red = count_moves(batch, 'R')
+        black = count_moves(batch, 'B')
+        return np.where(batch.to_move == RED, red, black)
+
+    bitboards = batch.bitboards()
+    opponent = 'B' if player == 'R' else 'R'
+    men = bitboards['men'][player]
+    kings = bitboards['kings'][player]
+    opponents = bitboards['men'][opponent] | bitboards['kings'][opponent]
+    empty = ~(men | kings | opponents) & np.uint32(FULL)
+
+    captures = np.zeros(len(batch), dtype=np.int32)
+    steps = np.zeros(len(batch), dtype=np.int32)
+    # Positions where a piece can capture again after landing. Its second hop
+    # cannot land where it started, as that would jump the piece just taken.
+    continues = np.zeros(len(batch), dtype=bool)
+    for direction in ALL_DIRECTIONS:
+        landings = _step(_step(men | kings, direction) & opponents, direction) & empty
+        captures += popcount(landings)
+        for onward in ALL_DIRECTIONS:
+            continues |= (_step(_step(landings, onward) & opponents, onward) & empty) != 0
+        movers = men | kings if direction in FORWARD[player] else kings
+        steps += popcount(_step(movers, direction) & empty)
+    counts = np.where(captures > 0, captures, steps)
+
+    rows = np.flatnonzero(continues)
+    if len(rows):
+        counts[rows] = [len(capture_paths(int(own), int(their), int(free)))
+                        for own, their, free in zip((men | kings)[rows], opponents[rows], empty[rows])]
+    return counts
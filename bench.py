@@ -0,0 +1,286 @@
+"""
+Benchmarks for the move generator and the CPU player's search.
+
+Usage:
+    python bench.py perft [--depth N] [--position NAME ...] [--output FILE]
+    python bench.py search [--depth N] [--position NAME ...] [--algorithm NAME] [--output FILE]
+    python bench.py compare OLD.json NEW.json
+
+``perft`` counts the leaf nodes of the full move tree of each benchmark
+position using ``get_possible_moves``/``apply_move``/``undo_move`` and checks
+the counts against known values, so it doubles as a move generator test.
+``search`` times ``CPUPlayer.choose_move`` at each depth, with one of the
+search algorithms of ``cpu.py``. Both print JSON (or write it to a file) so
+runs can be compared with ``compare``, also runs of different algorithms.
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+
+from checkers import CheckersBoard
+from cpu import ALGORITHMS, CPUPlayer
+
+# Benchmark positions: rows from the top of the board (Black's side), with
+# r/b for men, R/B for kings and . for empty squares, and the side to move.
+POSITIONS = {
+    'start': (None, 'R'),
+    'midgame': ([
+        '.b.b.b.b',
+        'b...b.b.',
+        '.b...b.b',
+        '..b.....',
+        '...r.r..',
+        'r...r.r.',
+        '.r...r.r',
+        'r.r.r...',
+    ], 'R'),
+    'king-endgame': ([
+        '........',
+        '....B...',
+        '.......b',
+        '........',
+        '...R....',
+        '..R.....',
+        '........',
+        '..B.....',
+    ], 'R'),
+    'multi-jump': ([
+        '.b......',
+        '....b...',
+        '........',
+        '....b...',
+        '........',
+        '..b.b...',
+        '.r......',
+        'r.r.....',
+    ], 'R'),
+}
+
+# Known perft leaf counts per position, for depths 1, 2, 3, ...
+EXPECTED_PERFT = {
+    'start': [7, 49, 302, 1469, 7482, 37986, 190146, 929902],
+    'midgame': [8, 43, 205, 1075, 4919, 23733, 104447, 488718],
+    'king-endgame': [6, 30, 166, 864, 4170, 21487, 118455, 654592],
+    'multi-jump': [2, 10, 42, 184, 759, 2960, 11508, 43144],
+}
+
+DEFAULT_PERFT_DEPTH = 6
+DEFAULT_SEARCH_DEPTH = 6
+
+
+def board_from_diagram(rows, player):
+    """
+    Build a board from a position diagram.
+
+    Args:
+        rows (list): Eight strings of eight characters, r/b for men, R/B for kings, '.' for empty.
+        player (str): The side to move ('R' or 'B').
+
+    Returns:
+        CheckersBoard: The position.
+    """
+    board = CheckersBoard()
+    cells = {'.': ' ', 'r': 'R', 'b': 'B', 'R': 'RQ', 'B': 'BQ'}
+    layout = [[cells[char] for char in row] for row in rows]
+    for row in range(8):
+        for col in range(8):
+            if layout[row][col] != ' ' and col % 2 == row % 2:
+                raise ValueError(f"piece on a light square at {(row, col)}")
+    board.board = layout
+    board.current_player = player
+    return board
+
+
+def load_position(name):
+    """
+    Build one of the benchmark positions.
+
+    Args:
+        name (str): A key of POSITIONS.
+
+    Returns:
+        CheckersBoard: The position.
+    """
+    rows, player = POSITIONS[name]
+    if rows is None:
+        board = CheckersBoard()
+        board.current_player = player
+        return board
+    return board_from_diagram(rows, player)
+
+
+def perft(board, depth):
+    """
+    Count the leaf nodes of the move tree below a position.
+
+    A whole multi-capture counts as one ply. Only the side to move's moves
+    are looked at: a position where the other side cannot move is still
+    expanded, and one where the side to move cannot move adds no leaves
+    unless it is at the last ply.
+
+    Args:
+        board (CheckersBoard): The position; restored before returning.
+        depth (int): The number of plies to expand.
+
+    Returns:
+        int: The number of leaf nodes at the given depth.
+    """
+    if depth == 0:
+        return 1
+    moves = board.get_possible_moves(board.current_player)
+    if depth == 1:
+        return len(moves)
+    nodes = 0
+    for move in moves:
+        captured_piece_pos = board.apply_move(move)
+        nodes += perft(board, depth - 1)
+        board.undo_move(move, captured_piece_pos)
+    return nodes
+
+
+def run_perft(names, max_depth):
+    """
+    Run perft on benchmark positions and check the counts.
+
+    Args:
+        names (list): The positions to run.
+        max_depth (int): The deepest perft to run on each position.
+
+    Returns:
+        list: One result dict per position and depth.
+    """
+    results = []
+    for name in names:
+        expected = EXPECTED_PERFT.get(name, [])
+        for depth in range(1, max_depth + 1):
+            board = load_position(name)
+            start = time.perf_counter()
+            nodes = perft(board, depth)
+            seconds = time.perf_counter() - start
+            known = expected[depth - 1] if depth <= len(expected) else None
+            results.append({
+                'position': name,
+                'depth': depth,
+                'nodes': nodes,
+                'seconds': round(seconds, 6),
+                'nodes_per_second': round(nodes / seconds) if seconds else None,
+                'expected': known,
+                'ok': known is None or known == nodes,
+            })
+    return results
+
+
+def run_search(names, max_depth, algorithm='minimax'):
+    """
+    Time the CPU player's search on benchmark positions.
+
+    Every depth starts from an empty transposition table.
+
+    Args:
+        names (list): The positions to run.
+        max_depth (int): The deepest search to run on each position.
+        algorithm (str): The search algorithm (see ``cpu.ALGORITHMS``).
+
+    Returns:
+        list: One result dict per position and depth.
+    """
+    results = []
+    for name in names:
+        for depth in range(1, max_depth + 1):
+            board = load_position(name)
+            cpu_player = CPUPlayer(board, board.current_player, algorithm=algorithm)
+            start = time.perf_counter()
+            move = cpu_player.choose_move(depth=depth)
+            seconds = time.perf_counter() - start
+            results.append({
+                'position': name,
+                'depth': depth,
+                'algorithm': algorithm,
+                'move': move,
+                'nodes': cpu_player.nodes,
+                'seconds': round(seconds, 6),
+                'nodes_per_second': round(cpu_player.nodes / seconds) if seconds else None,
+            })
+    return results
+
+
+def compare(old, new):
+    """
+    Compare two benchmark reports of the same kind.
+
+    Args:
+        old (dict): The earlier report.
+        new (dict): The later report.
+
+    Returns:
+        list: For each position and depth in both reports, the node counts and the
+        ratio of new to old time.
+    """
+    earlier = {(result['position'], result['depth']): result for result in old['results']}
+    rows = []
+    for result in new['results']:
+        before = earlier.get((result['position'], result['depth']))
+        if before is None:
+            continue
+        rows.append({
+            'position': result['position'],
+            'depth': result['depth'],
+            'nodes_before': before['nodes'],
+            'nodes_after': result['nodes'],
+            'time_ratio': round(result['seconds'] / before['seconds'], 3) if before['seconds'] else None,
+        })
+    return rows
+
+
+def main(argv=None):
+    """
+    Run the benchmark command line.
+
+    Returns:
+        int: The exit status; 1 if a perft count does not match its known value.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+    for command, depth in (('perft', DEFAULT_PERFT_DEPTH), ('search', DEFAULT_SEARCH_DEPTH)):
+        sub = commands.add_parser(command)
+        sub.add_argument('--depth', type=int, default=depth)
+        sub.add_argument('--position', action='append', choices=sorted(POSITIONS))
+        sub.add_argument('--output')
+    # The last parser made is the search command's
+    sub.add_argument('--algorithm', choices=ALGORITHMS, default='minimax')
+    sub = commands.add_parser('compare')
+    sub.add_argument('old')
+    sub.add_argument('new')
+    args = parser.parse_args(argv)
+
+    if args.command == 'compare':
+        with open(args.old) as old_file, open(args.new) as new_file:
+            rows = compare(json.load(old_file), json.load(new_file))
+        json.dump(rows, sys.stdout, indent=2)
+        print()
+        return 0
+
+    names = args.position or list(POSITIONS)
+    if args.command == 'perft':
+        results = run_perft(names, args.depth)
+    else:
+        results = run_search(names, args.depth, args.algorithm)
+    report = {
+        'kind': args.command,
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(report, output, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    return 0 if all(result.get('ok', True) for result in results) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,270 @@
+"""
+Bitboard primitives for the checkers engine.
+
+Only the 32 dark squares of the board can ever hold a piece, so a set of
+pieces fits in a single 32-bit integer. Squares are numbered 0-31 row by row
+from the top of the board (Black's home row), four per row:
+
+    row 0:  .  0  .  1  .  2  .  3
+    row 1:  4  .  5  .  6  .  7  .
+    ...
+    row 7: 28  . 29  . 30  . 31  .
+
+Square ``s`` therefore sits at row ``s // 4``. On even rows it occupies
+column ``2 * (s % 4) + 1``, on odd rows column ``2 * (s % 4)``. With this
+layout a diagonal step is a shift by 3, 4 or 5 depending on the row parity,
+and a jump is always a shift by 7 or 9.
+"""
+
+FULL = 0xFFFFFFFF
+
+EVEN_ROWS = 0x0F0F0F0F
+ODD_ROWS = 0xF0F0F0F0
+# Squares on the left edge of odd rows (column 0) and the right edge of
+# even rows (column 7); only these lose a diagonal neighbour sideways.
+LEFT_EDGE = 0x11111111
+RIGHT_EDGE = 0x88888888
+
+# Promotion rows: Red promotes on row 0, Black on row 7
+RED_PROMOTION = 0x0000000F
+BLACK_PROMOTION = 0xF0000000
+
+# Each direction is a pair of (source mask, shift) for the even and odd rows.
+# A positive shift moves towards higher squares, i.e. down the board.
+UP_LEFT = ((EVEN_ROWS, -4), (ODD_ROWS & ~LEFT_EDGE, -5))
+UP_RIGHT = ((EVEN_ROWS & ~RIGHT_EDGE, -3), (ODD_ROWS, -4))
+DOWN_LEFT = ((EVEN_ROWS, 4), (ODD_ROWS & ~LEFT_EDGE, 3))
+DOWN_RIGHT = ((EVEN_ROWS & ~RIGHT_EDGE, 5), (ODD_ROWS, 4))
+
+ALL_DIRECTIONS = (DOWN_RIGHT, DOWN_LEFT, UP_RIGHT, UP_LEFT)
+FORWARD = {'R': (UP_LEFT, UP_RIGHT), 'B': (DOWN_LEFT, DOWN_RIGHT)}
+PROMOTION = {'R': RED_PROMOTION, 'B': BLACK_PROMOTION}
+OPPONENT = {'R': 'B', 'B': 'R'}
+
+# Distance between the start and landing square of a jump in each direction
+JUMP_OFFSETS = ((DOWN_RIGHT, 9), (DOWN_LEFT, 7), (UP_RIGHT, -7), (UP_LEFT, -9))
+
+# Flattened (source mask, shift, forward) triples for regular moves of each
+# player; men use only the forward ones, kings use all of them.
+STEP_SHIFTS = {
+    player: tuple((mask, shift, direction in FORWARD[player])
+                  for direction in ALL_DIRECTIONS for mask, shift in direction)
+    for player in ('R', 'B')
+}
+
+
+def square_to_position(square):
+    """
+    Converts a square number to its (row, col) position on the 8x8 board.
+
+    Args:
+        square (int): The square number (0-31).
+
+    Returns:
+        tuple: The (row, col) position of the square.
+    """
+    row = square >> 2
+    return row, ((square & 3) << 1) + (1 - (row & 1))
+
+
+def position_to_square(row, col):
+    """
+    Converts a (row, col) position to its square number.
+
+    Args:
+        row (int): The row of the position.
+        col (int): The column of the position.
+
+    Returns:
+        int: The square number, or -1 if the position is off the board or
+        on a light square that can never hold a piece.
+    """
+    if 0 <= row < 8 and 0 <= col < 8 and col % 2 != row % 2:
+        return (row << 2) | (col >> 1)
+    return -1
+
+
+POSITIONS = tuple(square_to_position(square) for square in range(32))
+SQUARES = {position: square for square, position in enumerate(POSITIONS)}
+
+# Moves are handled internally as integer codes (start << 5) | end. MOVES maps
+# each code to a prebuilt ((row, col), (row, col)) tuple, so move generation
+# hands out shared tuples instead of allocating new ones.
+MOVES = [(POSITIONS[start], POSITIONS[end]) for start in range(32) for end in range(32)]
+
+# Square jumped over by a capture, indexed the same way as MOVES
+JUMPED = [-1] * 1024
+for _start in range(32):
+    for _direction, _offset in JUMP_OFFSETS:
+        _mask, _shift = _direction[0] if (1 << _start) & EVEN_ROWS else _direction[1]
+        _end = _start + _offset
+        if (1 << _start) & _mask and 0 <= _end < 32:
+            _over = _start + _shift
+            _over_mask, _over_shift = _direction[0] if (1 << _over) & EVEN_ROWS else _direction[1]
+            if (1 << _over) & _over_mask:
+                JUMPED[(_start << 5) | _end] = _over
+del _start, _direction, _offset, _mask, _shift, _end, _over, _over_mask, _over_shift
+
+
+def step(bitboard, direction):
+    """
+    Moves every piece of a bitboard one diagonal step in a direction.
+
+    Pieces that would leave the board are dropped.
+
+    Args:
+        bitboard (int): The set of pieces to move.
+        direction (tuple): One of UP_LEFT, UP_RIGHT, DOWN_LEFT or DOWN_RIGHT.
+
+    Returns:
+        int: The bitboard of the squares the pieces land on.
+    """
+    (even_mask, even_shift), (odd_mask, odd_shift) = direction
+    even = bitboard & even_mask
+    odd = bitboard & odd_mask
+    if even_shift > 0:
+        return ((even << even_shift) | (odd << odd_shift)) & FULL
+    return (even >> -even_shift) | (odd >> -odd_shift)
+
+
+def popcount(bitboard):
+    """
+    Counts the pieces in a bitboard.
+
+    Args:
+        bitboard (int): The set of pieces.
+
+    Returns:
+        int: The number of set bits.
+    """
+    return bin(bitboard).count('1')
+
+
+def jumps(movers, opponents, empty):
+    """
+    Lists the captures available to a set of pieces.
+
+    Every piece may capture in all four directions, men included.
+
+    Args:
+        movers (int): The pieces that may capture.
+        opponents (int): The pieces that may be captured.
+        empty (int): The empty squares.
+
+    Returns:
+        list: Move codes ``(start << 5) | end``, one per capture.
+    """
+    captures = []
+    for direction, offset in JUMP_OFFSETS:
+        landings = step(step(movers, direction) & opponents, direction) & empty
+        while landings:
+            low = landings & -landings
+            end = low.bit_length() - 1
+            captures.append(((end - offset) << 5) | end)
+            landings ^= low
+    return captures
+
+
+def capture_paths(movers, opponents, empty):
+    """
+    Lists the complete capture paths available to a set of pieces.
+
+    A path goes on for as long as the capturing piece can capture again.
+    Captured pieces leave the board as they are jumped, so none is jumped
+    twice, and a man promoted on the way keeps capturing.
+
+    Args:
+        movers (int): The pieces that may capture.
+        opponents (int): The pieces that may be captured.
+        empty (int): The empty squares.
+
+    Returns:
+        list: Tuples of squares, each from a capturing piece to where it ends up.
+    """
+    paths = []
+    for code in jumps(movers, opponents, empty):
+        start = code >> 5
+        over = 1 << JUMPED[code]
+        # The capturing piece is lifted off the board for the rest of the path
+        _extend_path((start, code & 31), opponents ^ over, empty | over | (1 << start), paths)
+    return paths
+
+
+def _extend_path(path, opponents, empty, paths):
+    """
+    Follows a capture path to every end it can reach, adding each to ``paths``.
+    """
+    codes = jumps(1 << path[-1], opponents, empty)
+    if not codes:
+        paths.append(path)
+        return
+    for code in codes:
+        over = 1 << JUMPED[code]
+        _extend_path(path + (code & 31,), opponents ^ over, empty | over, paths)
+
+
+def can_jump(movers, opponents, empty):
+    """
+    Checks whether any piece in a set can capture.
+
+    Args:
+        movers (int): The pieces that may capture.
+        opponents (int): The pieces that may be captured.
+        empty (int): The empty squares.
+
+    Returns:
+        bool: True if at least one capture exists.
+    """
+    for direction in ALL_DIRECTIONS:
+        if step(step(movers, direction) & opponents, direction) & empty:
+            return True
+    return False
+
+
+def steps(men, kings, empty, player):
+    """
+    Lists the regular (non-capture) moves available to a player.
+
+    Args:
+        men (int): The player's men.
+        kings (int): The player's kings.
+        empty (int): The empty squares.
+        player (str): The player ('R' or 'B') the men belong to.
+
+    Returns:
+        list: Move codes ``(start << 5) | end``, one per move.
+    """
+    moves = []
+    pieces = men | kings
+    for mask, shift, forward in STEP_SHIFTS[player]:
+        targets = (pieces if forward else kings) & mask
+        if not targets:
+            continue
+        targets = ((targets << shift) & FULL if shift > 0 else targets >> -shift) & empty
+        while targets:
+            low = targets & -targets
+            end = low.bit_length() - 1
+            moves.append(((end - shift) << 5) | end)
+            targets ^= low
+    return moves
+
+
+def can_step(men, kings, empty, player):
+    """
+    Checks whether a player has any regular (non-capture) move.
+
+    Args:
+        men (int): The player's men.
+        kings (int): The player's kings.
+        empty (int): The empty squares.
+        player (str): The player ('R' or 'B') the men belong to.
+
+    Returns:
+        bool: True if at least one regular move exists.
+    """
+    pieces = men | kings
+    for mask, shift, forward in STEP_SHIFTS[player]:
+        targets = (pieces if forward else kings) & mask
+        if targets and ((targets << shift) & FULL if shift > 0 else targets >> -shift) & empty:
+            return True
+    return False
@@ -0,0 +1,300 @@
+"""
+Opening book: prepared moves for the first plies of the game.
+
+Usage:
+    python book.py build --plies N --depth D [--margin M] --output FILE
+    python book.py show FILE
+
+``build`` walks the move tree from the starting position. At each position
+every legal move is scored by a search of depth D; the moves scoring within
+M of the best are kept, weighted by how close they come to it, and the tree
+is followed through each kept move for N plies (a whole multi-capture is
+one ply). ``BookReader`` memory-maps the result, and ``CPUPlayer`` plays a
+book move, picked at random by weight, instead of searching.
+
+File layout (little endian): a header of magic, version and record count,
+then the records sorted by position key. A record is the position's Zobrist
+key, the move as ``(start square << 5) | end square`` and its weight.
+"""
+import argparse
+import bisect
+import mmap
+import random
+import struct
+import sys
+
+from bitboard import SQUARES
+from checkers import CheckersBoard
+from cpu import CPUPlayer
+from transposition import TranspositionTable
+
+MAGIC = b'CKBK'
+VERSION = 1
+HEADER = struct.Struct('<4sHxxI')
+RECORD = struct.Struct('<QHH')
+
+DEFAULT_PLIES = 6
+DEFAULT_DEPTH = 6
+DEFAULT_MARGIN = 20
+MAX_WEIGHT = 0xFFFF
+
+_readers = {}
+
+
+def move_code(move):
+    """
+    Pack a move into its record code.
+
+    A multi-capture is packed by where it starts and ends, so two capture
+    paths with the same ends share a code; such moves are left out of the
+    book (see ``unique_move_codes``).
+
+    Args:
+        move (tuple): The start position and the landing positions.
+
+    Returns:
+        int: ``(start square << 5) | end square``.
+    """
+    return (SQUARES[move[0]] << 5) | SQUARES[move[-1]]
+
+
+def unique_move_codes(moves):
+    """
+    Map record codes to the moves they stand for, leaving out codes shared by several moves.
+
+    Args:
+        moves (list): The legal moves of a position.
+
+    Returns:
+        dict: The move of each code that stands for exactly one of the moves.
+    """
+    codes = {}
+    for move in moves:
+        code = move_code(move)
+        codes[code] = None if code in codes else move
+    return {code: move for code, move in codes.items() if move is not None}
+
+
+def score_moves(board, depth, transposition_table):
+    """
+    Score every legal move of a position by searching it.
+
+    Args:
+        board (CheckersBoard): The position; restored before returning.
+        depth (int): The search depth, including the move itself.
+        transposition_table (TranspositionTable): Shared between the searches.
+
+    Returns:
+        list: (score, move) pairs, scores from the perspective of the side to move.
+    """
+    color = board.current_player
+    cpu_player = CPUPlayer(board, color, transposition_table)
+    scored = []
+    for move in board.get_possible_moves(color):
+        board.apply_move(move)
+        try:
+            score, _ = cpu_player.minimax(depth - 1, float('-inf'), float('inf'),
+                                          board.current_player == color, ply=1)
+        finally:
+            board.undo_move(move)
+        scored.append((score, move))
+    return scored
+
+
+def build_book(plies=DEFAULT_PLIES, depth=DEFAULT_DEPTH, margin=DEFAULT_MARGIN, progress=None):
+    """
+    Build book entries by searching the move tree from the starting position.
+
+    Args:
+        plies (int): How many plies deep the book goes.
+        depth (int): The search depth used to score each move.
+        margin (int): How far below the best score a move may be and still be kept.
+        progress (callable, optional): Called with the number of positions done.
+
+    Returns:
+        dict: Weighted moves of each position, ``{key: [(move, weight), ...]}``.
+    """
+    board = CheckersBoard()
+    transposition_table = TranspositionTable(1 << 18)
+    book = {}
+
+    def expand(remaining):
+        key = board.zobrist_key()
+        if remaining == 0 or key in book or board.is_game_over():
+            return
+        transposition_table.new_search()
+        scored = score_moves(board, depth, transposition_table)
+        best = max(score for score, _ in scored)
+        # A move whose code another move shares could be read back as the other move
+        codes = unique_move_codes(move for _, move in scored)
+        book[key] = [(move, margin + 1 - (best - score)) for score, move in scored
+                     if best - score <= margin and codes.get(move_code(move)) == move]
+        if progress is not None:
+            progress(len(book))
+        for move, _ in book[key]:
+            board.apply_move(move)
+            expand(remaining - 1)
+            board.undo_move(move)
+
+    expand(plies)
+    return book
+
+
+def write_book(path, book):
+    """
+    Write book entries to a book file.
+
+    Args:
+        path (str): The file to write.
+        book (dict): Weighted moves of each position, keyed by Zobrist key.
+    """
+    records = sorted((key, move_code(move), min(weight, MAX_WEIGHT))
+                     for key, moves in book.items() for move, weight in moves)
+    with open(path, 'wb') as output:
+        output.write(HEADER.pack(MAGIC, VERSION, len(records)))
+        for record in records:
+            output.write(RECORD.pack(*record))
+
+
+class BookReader:
+    """
+    Looks positions up in a book file through a read-only memory map.
+
+    Attributes:
+        path (str): The book file.
+        count (int): The number of records.
+        probes (int): Positions looked up.
+        hits (int): Lookups that found a book move.
+    """
+
+    def __init__(self, path):
+        """
+        Open a book file.
+
+        Args:
+            path (str): The book file.
+
+        Raises:
+            ValueError: If the file is not a book of this version.
+        """
+        self.path = path
+        with open(path, 'rb') as book_file:
+            self._data = mmap.mmap(book_file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.count = HEADER.unpack_from(self._data, 0)
+        if magic != MAGIC or version != VERSION:
+            self._data.close()
+            raise ValueError(f"{path} is not a version {VERSION} opening book")
+        self.probes = 0
+        self.hits = 0
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, number):
+        """
+        Get the key of a record, so ``bisect`` can search the records.
+        """
+        return RECORD.unpack_from(self._data, HEADER.size + number * RECORD.size)[0]
+
+    def moves(self, board):
+        """
+        Get the book moves of a position.
+
+        Moves that are not legal in the position (after a hash collision) are left out.
+
+        Args:
+            board (CheckersBoard): The position.
+
+        Returns:
+            list: (move, weight) pairs; empty if the position is not in the book.
+        """
+        self.probes += 1
+        key = board.zobrist_key()
+        number = bisect.bisect_left(self, key)
+        legal = None
+        moves = []
+        while number < self.count:
+            record_key, code, weight = RECORD.unpack_from(self._data, HEADER.size + number * RECORD.size)
+            if record_key != key:
+                break
+            if legal is None:
+                legal = unique_move_codes(board.get_possible_moves(board.current_player))
+            if code in legal:
+                moves.append((legal[code], weight))
+            number += 1
+        if moves:
+            self.hits += 1
+        return moves
+
+    def choose(self, board, rng=random):
+        """
+        Pick a book move of a position at random, in proportion to the weights.
+
+        Args:
+            board (CheckersBoard): The position.
+            rng (random.Random): The source of randomness.
+
+        Returns:
+            tuple: The move, or None if the position is not in the book.
+        """
+        moves = self.moves(board)
+        if not moves:
+            return None
+        return rng.choices([move for move, _ in moves], weights=[weight for _, weight in moves])[0]
+
+    def close(self):
+        """
+        Unmap the file.
+        """
+        self._data.close()
+
+
+def open_book(path):
+    """
+    Open a book, reusing this process's reader of the same file.
+
+    Args:
+        path (str): The book file.
+
+    Returns:
+        BookReader: The reader.
+    """
+    reader = _readers.get(path)
+    if reader is None:
+        reader = _readers[path] = BookReader(path)
+    return reader
+
+
+def main(argv=None):
+    """
+    Run the opening book command line.
+
+    Returns:
+        int: The exit status.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+    sub = commands.add_parser('build')
+    sub.add_argument('--plies', type=int, default=DEFAULT_PLIES)
+    sub.add_argument('--depth', type=int, default=DEFAULT_DEPTH)
+    sub.add_argument('--margin', type=int, default=DEFAULT_MARGIN)
+    sub.add_argument('--output', required=True)
+    sub = commands.add_parser('show')
+    sub.add_argument('path')
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        book = build_book(args.plies, args.depth, args.margin,
+                          progress=lambda done: print('positions', done, file=sys.stderr))
+        write_book(args.output, book)
+        return 0
+
+    reader = BookReader(args.path)
+    print(f"{args.path}: {reader.count} moves")
+    for move, weight in reader.moves(CheckersBoard()):
+        print(move, weight)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,26 +1,158 @@
+from bitboard import (
+    FULL, JUMPED, MOVES, OPPONENT, POSITIONS, PROMOTION, SQUARES,
+    can_jump, can_step, capture_paths, jumps, steps,
+)
+from evaluation import DEFAULT_TABLES
+from zobrist import BLACK_TO_MOVE_KEY, CAPTURING_KEYS, KING_KEYS, MEN_KEYS, hash_pieces
+
+# Values saved on the undo stack per move: the four bitboards, the hash, both
+# material sums, the side to move, the multi-capture flag and the capturing square
+UNDO_FIELDS = 10
+# Moves the undo stack holds before it has to grow
+UNDO_DEPTH = 128
+# Positions whose legal moves and move availability are cached. The cache is
+# shared by every board of the process and emptied when it fills up.
+POSITION_CACHE_SIZE = 1 << 16
+
+_position_cache = {}
+
+
 class CheckersBoard:
     """
     A class to represent a Checkers game board.
 
+    The position is stored as bitboards over the 32 playable squares (see
+    ``bitboard.py``), one integer per colour for men and one for kings.
+
     Attributes
     ----------
     board : list
-        A 2D list representing the game board.
+        A 2D list view of the game board, built on each access. Assigning a
+        2D list loads that position; mutating the returned list does not
+        change the game.
+    men : dict
+        Bitboard of each player's men, keyed by 'R' and 'B'.
+    kings : dict
+        Bitboard of each player's kings (queens), keyed by 'R' and 'B'.
+    hash : int
+        Zobrist hash of the pieces on the board, kept up to date by every move.
+    material : dict
+        Sum of the piece-square table values of each player's pieces, keyed by
+        'R' and 'B' and kept up to date by every move and promotion.
+    tables : dict
+        The piece-square tables used for ``material`` (see ``evaluation.py``).
     current_player : str
         The current player ('R' for Red or 'B' for Black).
     multi_capture_in_progress : bool
         Flag to track if multiple captures are in progress.
+    capturing_square : int
+        The square of the piece that must go on capturing while a multi-capture
+        is in progress, or -1.
     """
 
     def __init__(self):
         """
-        Initializes the CheckersBoard with a starting board layout, 
-        sets the current player to 'R' (Red), and sets the multi-capture 
+        Initializes the CheckersBoard with a starting board layout,
+        sets the current player to 'R' (Red), and sets the multi-capture
         flag to False.
         """
+        self.men = {'R': 0, 'B': 0}
+        self.kings = {'R': 0, 'B': 0}
+        self.tables = DEFAULT_TABLES
         self.board = self.create_board()
         self.current_player = 'R'
         self.multi_capture_in_progress = False
+        self.capturing_square = -1
+        self._undo = [0] * (UNDO_FIELDS * UNDO_DEPTH)
+        self._undo_top = 0
+
+    def __getstate__(self):
+        """
+        Gets the state to pickle, leaving out the undo stack, which only
+        makes sense in the process that applied the moves.
+        """
+        state = self.__dict__.copy()
+        state['_undo'] = [0] * (UNDO_FIELDS * UNDO_DEPTH)
+        state['_undo_top'] = 0
+        return state
+
+    @property
+    def board(self):
+        """
+        Builds the 2D list view of the board from the bitboards.
+
+        Returns
+        -------
+        list
+            A 2D list with 'R', 'B', 'RQ', 'BQ' or ' ' in each cell.
+        """
+        board = [[' '] * 8 for _ in range(8)]
+        for player in ('R', 'B'):
+            for pieces, name in ((self.men[player], player), (self.kings[player], player + 'Q')):
+                while pieces:
+                    low = pieces & -pieces
+                    row, col = POSITIONS[low.bit_length() - 1]
+                    board[row][col] = name
+                    pieces ^= low
+        return board
+
+    @board.setter
+    def board(self, board):
+        """
+        Loads a position from a 2D list of cells.
+
+        Parameters
+        ----------
+        board : list
+            A 2D list with 'R', 'B', 'RQ', 'BQ' or ' ' in each cell.
+        """
+        men = {'R': 0, 'B': 0}
+        kings = {'R': 0, 'B': 0}
+        for (row, col), square in SQUARES.items():
+            cell = board[row][col]
+            if cell != ' ':
+                if 'Q' in cell:
+                    kings[cell[0]] |= 1 << square
+                else:
+                    men[cell[0]] |= 1 << square
+        self.set_pieces(men, kings)
+
+    def set_pieces(self, men, kings):
+        """
+        Loads a position from bitboards, recomputing the hash and ``material``.
+
+        Parameters
+        ----------
+        men : dict
+            Bitboard of each player's men, keyed by 'R' and 'B'.
+        kings : dict
+            Bitboard of each player's kings, keyed by 'R' and 'B'.
+        """
+        self.men = dict(men)
+        self.kings = dict(kings)
+        self.hash = hash_pieces(self.men, self.kings)
+        self.set_tables(self.tables)
+
+    def set_tables(self, tables):
+        """
+        Switches to other piece-square tables and recomputes ``material``.
+
+        Parameters
+        ----------
+        tables : dict
+            (men table, kings table) lists of 32 values, keyed by 'R' and 'B'.
+        """
+        self.tables = tables
+        material = {}
+        for player in ('R', 'B'):
+            total = 0
+            for pieces, values in zip((self.men[player], self.kings[player]), tables[player]):
+                while pieces:
+                    low = pieces & -pieces
+                    total += values[low.bit_length() - 1]
+                    pieces ^= low
+            material[player] = total
+        self.material = material
 
     def create_board(self):
         """
@@ -47,6 +179,89 @@ class CheckersBoard:
                     board[row].append(' ')  # Empty space
         return board
 
+    def piece_at(self, square):
+        """
+        Gets the piece standing on a square.
+
+        Parameters
+        ----------
+        square : int
+            The square number (0-31).
+
+        Returns
+        -------
+        str
+            'R', 'B', 'RQ', 'BQ', or ' ' for an empty square.
+        """
+        bit = 1 << square
+        for player in ('R', 'B'):
+            if self.men[player] & bit:
+                return player
+            if self.kings[player] & bit:
+                return player + 'Q'
+        return ' '
+
+    def occupied(self):
+        """
+        Gets the bitboard of all occupied squares.
+
+        Returns
+        -------
+        int
+            A bitboard with one bit set per piece on the board.
+        """
+        return self.men['R'] | self.kings['R'] | self.men['B'] | self.kings['B']
+
+    def zobrist_key(self):
+        """
+        Gets the Zobrist hash identifying the full position.
+
+        Unlike ``hash``, the key also covers the side to move and the piece in
+        the middle of a multi-capture, if any.
+
+        Returns
+        -------
+        int
+            A 64-bit hash of the position.
+        """
+        key = self.hash
+        if self.current_player == 'B':
+            key ^= BLACK_TO_MOVE_KEY
+        if self.multi_capture_in_progress:
+            key ^= CAPTURING_KEYS[self.capturing_square]
+        return key
+
+    def _position_facts(self, player):
+        """
+        Gets the cache entry of the position, seen from one player.
+
+        Entries are keyed like ``zobrist_key`` with ``player`` in place of the side
+        to move, so each position's facts are worked out once, however many
+        callers ask for them.
+
+        Parameters
+        ----------
+        player : str
+            The player ('R' or 'B') the facts are about.
+
+        Returns
+        -------
+        list
+            [legal moves (tuple), has a capture (bool), has a valid move (bool)],
+            each None until first needed.
+        """
+        key = self.hash
+        if player == 'B':
+            key ^= BLACK_TO_MOVE_KEY
+        if self.multi_capture_in_progress:
+            key ^= CAPTURING_KEYS[self.capturing_square]
+        facts = _position_cache.get(key)
+        if facts is None:
+            if len(_position_cache) >= POSITION_CACHE_SIZE:
+                _position_cache.clear()
+            facts = _position_cache[key] = [None, None, None]
+        return facts
+
     def is_valid_move(self, start, end):
         """
         Checks if a move is valid.
@@ -63,95 +278,73 @@ class CheckersBoard:
         bool
             True if the move is valid, False otherwise.
         """
-        start_row, start_col = start
-        end_row, end_col = end
-        moving_piece = self.board[start_row][start_col]
-        target_piece = self.board[end_row][end_col]
-
-        if target_piece != ' ':
+        start_square = SQUARES.get(tuple(start))
+        end_square = SQUARES.get(tuple(end))
+        if start_square is None or end_square is None:
+            return False  # Pieces only ever stand on the 32 dark squares
+
+        moving_piece = self.piece_at(start_square)
+        if moving_piece == ' ':
+            return False
+        if self.occupied() & (1 << end_square):
             return False  # Can't move to a cell that's already occupied
 
-        row_direction = end_row - start_row
-        col_distance = abs(end_col - start_col)
-
-        # Logic for normal pieces
-        if moving_piece in ['R', 'B']:
-            # Simple move
-            if abs(row_direction) == 1 and col_distance == 1:
-                if moving_piece == 'R' and row_direction == -1:
-                    return True
-                if moving_piece == 'B' and row_direction == 1:
-                    return True
-
-            # Capture move
-            elif abs(row_direction) == 2 and col_distance == 2:
-                mid_row = (start_row + end_row) // 2
-                mid_col = (start_col + end_col) // 2
-                mid_piece = self.board[mid_row][mid_col]
-                if mid_piece == ' ' or mid_piece[0] == moving_piece[0]:
-                    return False  # Can't capture your own piece or jump over an empty space
-                return True
+        row_direction = end[0] - start[0]
+        col_distance = abs(end[1] - start[1])
 
-        # Queen move logic
-        elif moving_piece in ['RQ', 'BQ']:
-            # Simple move for queen
-            if abs(row_direction) == 1 and col_distance == 1:
-                return True  # Allow one-step moves in any direction
-
-            # Capture move for queen
-            elif abs(row_direction) == 2 and col_distance == 2:
-                mid_row = (start_row + end_row) // 2
-                mid_col = (start_col + end_col) // 2
-                mid_piece = self.board[mid_row][mid_col]
-                if mid_piece == ' ' or mid_piece[0] == moving_piece[0]:
-                    return False  # Can't capture your own piece or jump over an empty space
+        # Simple move: queens step in any direction, normal pieces only forward
+        if abs(row_direction) == 1 and col_distance == 1:
+            if moving_piece in ['RQ', 'BQ']:
                 return True
+            return row_direction == (-1 if moving_piece == 'R' else 1)
 
-        return False
-    def move_piece(self, start, end):
-        # Check if the current player must capture and if the move is a capture move
-        if self.must_capture() and not self.is_capture_move(start, end):
-            return False, self.current_player, False, True
+        # Capture move: any piece may jump an opponent's piece in any direction
+        if abs(row_direction) == 2 and col_distance == 2:
+            mid_square = JUMPED[(start_square << 5) | end_square]
+            opponent = OPPONENT[moving_piece[0]]
+            return bool((self.men[opponent] | self.kings[opponent]) & (1 << mid_square))
 
-        # Check if the move is valid
-        if not self.is_valid_move(start, end):
-            return False, self.current_player, False, False
+        return False
 
-        start_row, start_col = start
-        end_row, end_col = end
-        moving_piece = self.board[start_row][start_col]
+    def move_piece(self, start, end, *path):
+        """
+        Plays a move of the current player, if it is legal.
 
-        # Move the piece
-        self.board[start_row][start_col] = ' '
-        self.board[end_row][end_col] = moving_piece
+        A multi-capture may be played a hop at a time or as a whole path
+        (``move_piece(start, first_landing, second_landing, ...)``). A path
+        that stops before the last capture leaves the turn with the same
+        piece, which must carry on capturing.
 
-        # Handle capture move
-        if abs(start_row - end_row) == 2:
-            mid_row = (start_row + end_row) // 2
-            mid_col = (start_col + end_col) // 2
-            self.board[mid_row][mid_col] = ' '  # Remove the captured piece
+        Parameters
+        ----------
+        start : tuple
+            The starting position (row, col) of the piece.
+        end : tuple
+            The position the piece moves or jumps to.
+        *path : tuple
+            The further landing positions of a multi-capture.
 
-            further_captures = self.check_captures_from_position(end_row, end_col)
-            if not further_captures:
-                self.current_player = 'B' if self.current_player == 'R' else 'R'
-                self.multi_capture_in_progress = False
-            else:
-                self.multi_capture_in_progress = True
-        else:
-            self.current_player = 'B' if self.current_player == 'R' else 'R'
-            self.multi_capture_in_progress = False
+        Returns
+        -------
+        tuple
+            (valid, current player, turn continues with a capture, a capture was
+            mandatory and the move is not one).
+        """
+        # Check if the current player must capture and if the move is a capture move
+        if self.must_capture() and not self.is_capture_move(start, end):
+            return False, self.current_player, False, True
 
-        # Promote to queen if the piece reaches the opposite end
-        if end_row == 0 and moving_piece == 'R':
-            self.board[end_row][end_col] = 'RQ'
-        elif end_row == 7 and moving_piece == 'B':
-            self.board[end_row][end_col] = 'BQ'
+        # The move must be a legal move or the start of a legal capture path
+        move = tuple(tuple(position) for position in (start, end) + path)
+        if not any(legal[:len(move)] == move for legal in self.get_possible_moves(self.current_player)):
+            return False, self.current_player, False, False
 
-        # Check if the game is over
-        if self.is_game_over():
-            return True, self.current_player, False, False
+        # Move the piece, remove any captured pieces, promote to queen and
+        # hand the turn over unless further captures are possible
+        for hop_start, hop_end in zip(move, move[1:]):
+            self._make(SQUARES[hop_start], SQUARES[hop_end])
+        return True, self.current_player, self.multi_capture_in_progress, False
 
-        return True, self.current_player, False, False
     def get_possible_captures(self, player):
         """
         Gets all possible captures for a given player.
@@ -166,12 +359,11 @@ class CheckersBoard:
         list
             A list of tuples representing all possible captures.
         """
-        captures = []
-        for row in range(8):
-            for col in range(8):
-                if self.board[row][col].startswith(player):
-                    captures += self.check_captures_from_position(row, col)
-        return captures
+        opponent = OPPONENT[player]
+        own = self.men[player] | self.kings[player]
+        opponents = self.men[opponent] | self.kings[opponent]
+        empty = FULL & ~(own | opponents)
+        return [MOVES[code] for code in jumps(own, opponents, empty)]
 
     def check_captures_from_position(self, row, col):
         """
@@ -189,14 +381,16 @@ class CheckersBoard:
         list
             A list of tuples representing possible capture moves from the given position.
         """
-        captures = []
-        directions = [(2, 2), (2, -2), (-2, 2), (-2, -2)]
-        for dr, dc in directions:
-            end_row, end_col = row + dr, col + dc
-            if 0 <= end_row < 8 and 0 <= end_col < 8:
-                if self.is_valid_move((row, col), (end_row, end_col)):
-                    captures.append(((row, col), (end_row, end_col)))
-        return captures
+        square = SQUARES.get((row, col))
+        if square is None:
+            return []
+        piece = self.piece_at(square)
+        if piece == ' ':
+            return []
+        opponent = OPPONENT[piece[0]]
+        opponents = self.men[opponent] | self.kings[opponent]
+        empty = FULL & ~self.occupied()
+        return [MOVES[code] for code in jumps(1 << square, opponents, empty)]
 
     def is_capture_move(self, start, end):
         """
@@ -216,6 +410,28 @@ class CheckersBoard:
         """
         return abs(start[0] - end[0]) == 2 and abs(start[1] - end[1]) == 2
 
+    def has_captures(self, player):
+        """
+        Checks if a player has any capture available, without listing them.
+
+        Parameters
+        ----------
+        player : str
+            The player ('R' for Red, 'B' for Black) to check.
+
+        Returns
+        -------
+        bool
+            True if at least one capture is available.
+        """
+        facts = self._position_facts(player)
+        if facts[1] is None:
+            opponent = OPPONENT[player]
+            own = self.men[player] | self.kings[player]
+            opponents = self.men[opponent] | self.kings[opponent]
+            facts[1] = can_jump(own, opponents, FULL & ~(own | opponents))
+        return facts[1]
+
     def must_capture(self):
         """
         Checks if the current player must make a capture move.
@@ -225,7 +441,7 @@ class CheckersBoard:
         bool
             True if a capture move is available and mandatory, False otherwise.
         """
-        return bool(self.get_possible_captures(self.current_player))
+        return self.has_captures(self.current_player)
 
     def has_pieces(self, player):
         """
@@ -241,13 +457,13 @@ class CheckersBoard:
         bool
             True if the player has pieces on the board, False otherwise.
         """
-        return any(player in cell for row in self.board for cell in row)
+        return bool(self.men[player] | self.kings[player])
 
     def has_valid_moves(self, player):
         """
         Determines if the given player has any valid moves left.
 
-        This function checks all pieces belonging to the player and determines if any of them can make a valid move. 
+        This function checks all pieces belonging to the player and determines if any of them can make a valid move.
         This includes both regular moves and capture moves.
 
         Parameters
@@ -260,32 +476,16 @@ class CheckersBoard:
         bool
             True if the player has at least one valid move, False otherwise.
         """
-        for row in range(8):
-            for col in range(8):
-                piece = self.board[row][col]
-                # Check if the piece belongs to the player
-                if piece.startswith(player):
-                    # If the piece is a queen, check for regular moves in all directions
-                    if 'Q' in piece:
-                        if self.check_regular_moves_from_position(row, col):
-                            return True
-                    else:
-                        # For non-queen pieces, determine the direction of movement based on the player
-                        direction = 1 if player == 'B' else -1
-                        for dc in (-1, 1):  # Check both diagonal directions
-                            end_row, end_col = row + direction, col + dc
-                            if 0 <= end_row < 8 and 0 <= end_col < 8:
-                                # Check for a regular move (empty target cell)
-                                if self.board[end_row][end_col] == ' ':
-                                    return True
-                                # Check for a possible capture move
-                                if 0 <= end_row + direction < 8 and 0 <= end_col + dc < 8:
-                                    if self.board[end_row + direction][end_col + dc] == ' ' \
-                                            and self.board[end_row][end_col] != ' ' \
-                                            and self.board[end_row][end_col][0] != player:
-                                        return True
-        # If no valid moves are found, return False
-        return False
+        facts = self._position_facts(player)
+        if facts[2] is None:
+            men = self.men[player]
+            kings = self.kings[player]
+            empty = FULL & ~self.occupied()
+            opponent = OPPONENT[player]
+            facts[2] = bool(men | kings) and (
+                can_step(men, kings, empty, player)
+                or can_jump(men | kings, self.men[opponent] | self.kings[opponent], empty))
+        return facts[2]
 
     def check_regular_moves_from_position(self, row, col):
         """
@@ -305,33 +505,25 @@ class CheckersBoard:
         list
             A list of tuples representing possible regular moves from the given position.
         """
-        moves = []
-        piece = self.board[row][col]
-
-        # Directions for queen
-        if piece in ['RQ', 'BQ']:
-            directions = [(1, 1), (1, -1), (-1, 1), (-1, -1)]
-        # Directions for normal pieces
-        elif piece == 'R':
-            directions = [(-1, -1), (-1, 1)]
-        elif piece == 'B':
-            directions = [(1, -1), (1, 1)]
+        square = SQUARES.get((row, col))
+        if square is None:
+            return []
+        piece = self.piece_at(square)
+        if piece == ' ':
+            return []  # Return empty list for empty cell
+        bit = 1 << square
+        empty = FULL & ~self.occupied()
+        if 'Q' in piece:
+            codes = steps(0, bit, empty, piece[0])
         else:
-            return moves  # Return empty list for empty cell or unrecognized piece
+            codes = steps(bit, 0, empty, piece)
+        return [MOVES[code] for code in codes]
 
-        for dr, dc in directions:
-            end_row, end_col = row + dr, col + dc
-            if 0 <= end_row < 8 and 0 <= end_col < 8:
-                if self.board[end_row][end_col] == ' ':
-                    moves.append(((row, col), (end_row, end_col)))
-
-        return moves
-    
     def is_game_over(self):
         """
         Checks if the game is over, which occurs when either player has no valid moves.
 
-        The game is considered over if one of the players cannot make a valid move. This could be 
+        The game is considered over if one of the players cannot make a valid move. This could be
         because they have no pieces left or because their pieces are blocked from making any moves.
 
         Returns
@@ -343,94 +535,231 @@ class CheckersBoard:
         if not self.has_valid_moves('R') or not self.has_valid_moves('B'):
             return True
         return False
-    
+
+    def winner(self):
+        """
+        Gets the winner of a finished game.
+
+        Red wins if Black cannot move, whether Black has no pieces left or all
+        of them are blocked; otherwise Black wins once Red cannot move.
+
+        Returns
+        -------
+        str
+            'R' or 'B', or None if the game is not over.
+        """
+        if not self.has_valid_moves('B'):
+            return 'R'
+        if not self.has_valid_moves('R'):
+            return 'B'
+        return None
+
+    def _make(self, start, end):
+        """
+        Plays a move given as square numbers.
+
+        Moves the piece, removes a captured piece, promotes a piece reaching the
+        far row and passes the turn to the opponent unless the moving piece can
+        capture again. The Zobrist hash and the material counters are updated
+        along with the bitboards.
+
+        Parameters
+        ----------
+        start : int
+            The starting square of the piece.
+        end : int
+            The square the piece moves to.
+
+        Returns
+        -------
+        int
+            The square of the captured piece, or -1 if the move is not a capture.
+        """
+        start_bit = 1 << start
+        end_bit = 1 << end
+        player = 'R' if (self.men['R'] | self.kings['R']) & start_bit else 'B'
+        opponent = OPPONENT[player]
+        was_king = self.kings[player] & start_bit
+        material = self.material
+        men_values, king_values = self.tables[player]
+        if was_king:
+            self.kings[player] ^= start_bit | end_bit
+            keys = KING_KEYS[player]
+            material[player] += king_values[end] - king_values[start]
+        else:
+            self.men[player] ^= start_bit | end_bit
+            keys = MEN_KEYS[player]
+            material[player] += men_values[end] - men_values[start]
+        self.hash ^= keys[start] ^ keys[end]
+
+        captured = JUMPED[(start << 5) | end]
+        if captured >= 0:
+            captured_bit = 1 << captured
+            if self.kings[opponent] & captured_bit:
+                self.kings[opponent] ^= captured_bit
+                self.hash ^= KING_KEYS[opponent][captured]
+                material[opponent] -= self.tables[opponent][1][captured]
+            else:
+                self.men[opponent] ^= captured_bit
+                self.hash ^= MEN_KEYS[opponent][captured]
+                material[opponent] -= self.tables[opponent][0][captured]
+
+        # Promote to queen if the piece reaches the opposite end
+        if not was_king and end_bit & PROMOTION[player]:
+            self.men[player] ^= end_bit
+            self.kings[player] |= end_bit
+            self.hash ^= MEN_KEYS[player][end] ^ KING_KEYS[player][end]
+            material[player] += king_values[end] - men_values[end]
+
+        further_captures = False
+        if captured >= 0:
+            opponents = self.men[opponent] | self.kings[opponent]
+            further_captures = can_jump(end_bit, opponents, FULL & ~self.occupied())
+
+        self.multi_capture_in_progress = further_captures
+        self.capturing_square = end if further_captures else -1
+        self.current_player = player if further_captures else opponent
+        return captured
+
+    def _save(self):
+        """
+        Pushes the state a move changes onto the undo stack.
+
+        The stack is a flat list allocated up front, so saving a position only
+        overwrites slots. It doubles in size if a line gets longer than it.
+        """
+        top = self._undo_top
+        undo = self._undo
+        if top == len(undo):
+            undo.extend([0] * len(undo))
+        men = self.men
+        kings = self.kings
+        material = self.material
+        undo[top] = men['R']
+        undo[top + 1] = men['B']
+        undo[top + 2] = kings['R']
+        undo[top + 3] = kings['B']
+        undo[top + 4] = self.hash
+        undo[top + 5] = material['R']
+        undo[top + 6] = material['B']
+        undo[top + 7] = self.current_player
+        undo[top + 8] = self.multi_capture_in_progress
+        undo[top + 9] = self.capturing_square
+        self._undo_top = top + UNDO_FIELDS
+
+    def _restore(self):
+        """
+        Pops the last saved state off the undo stack, restoring the position exactly.
+
+        Raises
+        ------
+        IndexError
+            If there is no move to undo.
+        """
+        top = self._undo_top - UNDO_FIELDS
+        if top < 0:
+            raise IndexError("no move to undo")
+        undo = self._undo
+        men = self.men
+        kings = self.kings
+        material = self.material
+        men['R'] = undo[top]
+        men['B'] = undo[top + 1]
+        kings['R'] = undo[top + 2]
+        kings['B'] = undo[top + 3]
+        self.hash = undo[top + 4]
+        material['R'] = undo[top + 5]
+        material['B'] = undo[top + 6]
+        self.current_player = undo[top + 7]
+        self.multi_capture_in_progress = undo[top + 8]
+        self.capturing_square = undo[top + 9]
+        self._undo_top = top
 
     def apply_move(self, move):
         """
         Applies a move on the board.
 
-        This method moves a piece from the start position to the end position.
-        It handles capture moves by removing the captured piece and checks for 
-        further possible captures, enabling multi-capture sequences.
+        This method moves a piece from the start position to the end position,
+        or along every landing position of a capture path. It handles capture
+        moves by removing the captured pieces, promotes pieces reaching the far
+        row and checks for further possible captures, enabling multi-capture
+        sequences. The turn passes to the opponent once no further capture is
+        possible. A whole path is undone by a single ``undo_move``.
 
         Args:
-            move (tuple): A tuple containing start and end positions of the move.
+            move (tuple): The start position of the move followed by its landing positions.
 
         Returns:
-            tuple: The position of the captured piece, if any; otherwise None.
-        """
-        start_pos, end_pos = move
-        moving_piece = self.board[start_pos[0]][start_pos[1]]
-        self.board[start_pos[0]][start_pos[1]] = ' '
-        self.board[end_pos[0]][end_pos[1]] = moving_piece
-        
-        captured_piece_pos = None
-        if abs(start_pos[0] - end_pos[0]) == 2:
-            # Handle capture move
-            mid_row = (start_pos[0] + end_pos[0]) // 2
-            mid_col = (start_pos[1] + end_pos[1]) // 2
-            captured_piece_pos = (mid_row, mid_col)
-            self.board[mid_row][mid_col] = ' '
-
-            # Check for further captures
-            further_captures = self.check_captures_from_position(end_pos[0], end_pos[1])
-            self.multi_capture_in_progress = bool(further_captures)
-        else:
-            self.multi_capture_in_progress = False
-
-        return captured_piece_pos
+            tuple: The position of the captured piece, if any; otherwise None. For a
+            path of more than one hop, the positions of all captured pieces.
+        """
+        self._save()
+        start = SQUARES[move[0]]
+        if len(move) == 2:
+            captured = self._make(start, SQUARES[move[1]])
+            return POSITIONS[captured] if captured >= 0 else None
+        captured = []
+        for position in move[1:]:
+            end = SQUARES[position]
+            captured.append(POSITIONS[self._make(start, end)])
+            start = end
+        return tuple(captured)
 
     def undo_move(self, move, captured_piece_pos=None):
         """
         Reverts a move on the board.
 
         This method is particularly useful for undoing moves during the process
-        of evaluating future game states (as in the minimax algorithm).
+        of evaluating future game states (as in the minimax algorithm). Moves must
+        be undone in the reverse order they were applied; the captured piece, a
+        promotion, the side to move and the multi-capture flag are all restored
+        exactly.
 
         Args:
-            move (tuple): A tuple containing start and end positions of the move.
+            move (tuple): The move, as given to ``apply_move``.
             captured_piece_pos (tuple, optional): Position of the piece captured in the move, if any.
         """
-        start_pos, end_pos = move
-        moving_piece = self.board[end_pos[0]][end_pos[1]]
-        self.board[end_pos[0]][end_pos[1]] = ' '
-        self.board[start_pos[0]][start_pos[1]] = moving_piece
-
-        if captured_piece_pos:
-            # Restore the captured piece
-            captured_piece_color = 'R' if self.current_player == 'B' else 'B'
-            self.board[captured_piece_pos[0]][captured_piece_pos[1]] = captured_piece_color
-
-        self.multi_capture_in_progress = False
+        self._restore()
 
     def get_possible_moves(self, player):
         """
         Gets all possible moves for a given player.
 
         This includes both regular and capture moves, with priority given to
-        captures if available.
+        captures if available. A capture is listed as its complete path, so a
+        multi-capture is a single move; during a multi-capture only the paths
+        of the capturing piece are left.
 
         Args:
             player (str): The player ('R' for Red, 'B' for Black) for whom to find moves.
 
         Returns:
-            list: A list of tuples representing all possible moves for the player.
+            list: A list of tuples representing all possible moves for the player:
+            ``(start, end)`` for a step or a single capture, ``(start, landing, ...)``
+            for a multi-capture. The list is new on every call, so callers may
+            reorder it.
         """
-        if self.multi_capture_in_progress:
-            # Handle multi-capture scenario
-            return self.get_possible_captures(player)
-        else:
-            moves = []
-            captures = self.get_possible_captures(player)
-            if captures:
-                # Prioritize captures
-                return captures
-
-            for row in range(8):
-                for col in range(8):
-                    if self.board[row][col].startswith(player):
-                        moves.extend(self.check_regular_moves_from_position(row, col))
-            return moves
+        facts = self._position_facts(player)
+        if facts[0] is None:
+            men = self.men[player]
+            kings = self.kings[player]
+            opponent = OPPONENT[player]
+            opponents = self.men[opponent] | self.kings[opponent]
+            empty = FULL & ~(men | kings | opponents)
+
+            # Captures are mandatory, and the only moves during a multi-capture
+            movers = men | kings
+            if self.multi_capture_in_progress:
+                movers &= 1 << self.capturing_square
+            paths = capture_paths(movers, opponents, empty)
+            if paths:
+                facts[0] = tuple([MOVES[(path[0] << 5) | path[1]] if len(path) == 2
+                                  else tuple([POSITIONS[square] for square in path]) for path in paths])
+            elif self.multi_capture_in_progress:
+                facts[0] = ()
+            else:
+                facts[0] = tuple([MOVES[code] for code in steps(men, kings, empty, player)])
+        return list(facts[0])
 
     def print_board(self):
         """
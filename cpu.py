@@ -1,39 +1,139 @@
+import time
+
+from bitboard import OPPONENT
 from checkers import CheckersBoard
+from ordering import MoveOrdering
+from searchstats import SearchStats
+from tablebase import LOSS, WIN
+from transposition import EXACT, LOWER, UPPER, TranspositionTable
+
+# Deepest iteration a time-managed search will start
+MAX_SEARCH_DEPTH = 64
+# Number of nodes searched between two checks of the clock
+TIME_CHECK_INTERVAL = 256
+# Score of a won game, far above any material balance. Tablebase wins score
+# just below it, higher the sooner they end.
+WIN_SCORE = 1_000_000
+# Search algorithms a CPUPlayer can use; see CPUPlayer.__init__
+ALGORITHMS = ('minimax', 'pvs', 'aspiration', 'mtdf')
+# Half-width of the first aspiration window, in evaluation units (a man is 100)
+ASPIRATION_WINDOW = 50
+# A bound on a score seen from the other side
+FLIPPED_BOUND = {EXACT: EXACT, LOWER: UPPER, UPPER: LOWER}
+
+
+class SearchTimeout(Exception):
+    """
+    Raised inside the search when the time budget of a move runs out or the
+    search is stopped.
+    """
+
 
 class CPUPlayer:
-    def __init__(self, board, color):
+    def __init__(self, board, color, transposition_table=None, workers=1, tablebase=None, book=None,
+                 quiescence=True, stop=None, algorithm='minimax', position_index=None,
+                 tables=None):
         """
         Initialize a CPU player for checkers.
 
         Args:
             board (CheckersBoard): The current state of the checkers board.
             color (str): The color ('R' or 'B') that the CPU player is controlling.
+            transposition_table (TranspositionTable, optional): Table of earlier search
+                results to reuse. Pass the same table to every CPU player of a game, for
+                the same color, so results carry over between moves. A new table is
+                created if omitted.
+            workers (int): Number of processes searching the root moves in parallel;
+                1 searches serially in this process.
+            tablebase (TablebaseReader, optional): Endgame tablebase probed for the
+                exact value of positions with few pieces.
+            book (BookReader, optional): Opening book whose moves are played without searching.
+            quiescence (bool): Keep searching captures past the search depth before
+                evaluating, so positions are not scored in the middle of an exchange.
+            stop (threading.Event, optional): Set from another thread to end a search with
+                a time budget early, as if the budget had run out. Parallel workers do
+                not see it, so use it with ``workers=1``.
+            algorithm (str): The search algorithm, one of ALGORITHMS. 'minimax' is
+                full-window alpha-beta with separate max and min branches. The others
+                share a negamax core: 'pvs' searches moves after the first with a null
+                window, 'aspiration' adds windows around the previous iteration's
+                score, and 'mtdf' finds the score with null-window searches alone.
+                All find the same move and score at the same depth.
+            position_index (PositionIndex, optional): Index of a game collection; out of
+                the book, the move that scored best in its games is played without
+                searching if it was played often enough (see ``positionindex.py``).
+            tables (dict, optional): Piece-square tables to evaluate with, such as fitted
+                ones from ``evaluation.load_tables``; the board is switched to them.
+                The board keeps its own tables if omitted.
+
+        Raises:
+            ValueError: If the algorithm is not one of ALGORITHMS.
         """
+        if algorithm not in ALGORITHMS:
+            raise ValueError(f"unknown search algorithm {algorithm!r}, expected one of {ALGORITHMS}")
         self.board = board
+        if tables is not None and board.tables is not tables:
+            board.set_tables(tables)
         self.color = color
+        self.transposition_table = transposition_table if transposition_table is not None else TranspositionTable()
+        self.workers = workers
+        self.tablebase = tablebase
+        self.book = book
+        self.quiescence = quiescence
+        self.stop = stop
+        self.algorithm = algorithm
+        self.position_index = position_index
+        self.nodes = 0
+        self.deadline = None
+        self.principal_variation = []
+        self.stats = None
+        self.ordering = MoveOrdering()
+        self._pv_moves = {}
+        self._previous_score = None
 
     def evaluate_board(self):
         """
         Evaluate the current board state from the perspective of the CPU player.
 
-        The board is evaluated by assigning scores to pieces based on their type and position.
-        The CPU's pieces are positively scored, and the opponent's pieces are negatively scored.
+        The board is evaluated by assigning scores to pieces based on their type and position,
+        using the board's piece-square tables. The CPU's pieces are positively scored, and the
+        opponent's pieces are negatively scored. The board keeps both sums up to date as moves
+        are made, so this takes constant time.
 
         Returns:
             int: An integer score representing the board state's value.
         """
-        score = 0
-        for row in self.board.board:
-            for cell in row:
-                if cell == self.color:
-                    score += 100  # Assign 100 points for each piece of CPU's color
-                elif cell == f"{self.color}Q":
-                    score += 175  # Assign 175 points for each king of CPU's color
-                elif cell in ['R', 'B'] and cell != self.color:
-                    score -= 100  # Subtract points for opponent's pieces
-                elif cell in ['RQ', 'BQ'] and cell[0] != self.color:
-                    score -= 175  # Subtract more points for opponent's kings
-        return score
+        material = self.board.material
+        return material[self.color] - material[OPPONENT[self.color]]
+
+    def game_over_score(self):
+        """
+        Score a finished game from the perspective of the CPU player.
+
+        Returns:
+            int: WIN_SCORE if the CPU player won, -WIN_SCORE if it lost.
+        """
+        return WIN_SCORE if self.board.winner() == self.color else -WIN_SCORE
+
+    def tablebase_score(self):
+        """
+        Look the current position up in the endgame tablebase.
+
+        Returns:
+            int: The exact score from the perspective of the CPU player, or None if
+            the position is not in the tablebase.
+        """
+        entry = self.tablebase.probe(self.board)
+        if entry is None:
+            return None
+        result, distance = entry
+        if result == WIN:
+            score = WIN_SCORE - 1 - distance
+        elif result == LOSS:
+            score = -(WIN_SCORE - 1 - distance)
+        else:
+            score = 0
+        return score if self.board.current_player == self.color else -score
 
     def get_possible_moves(self):
         """
@@ -46,73 +146,591 @@ class CPUPlayer:
         """
         return self.board.get_possible_moves(self.color)
 
-    def minimax(self, depth, alpha, beta, maximizing_player):
+    def minimax(self, depth, alpha, beta, maximizing_player, ply=0):
         """
         The minimax algorithm with alpha-beta pruning for optimizing CPU player moves.
 
         This method recursively explores possible moves up to a given depth and evaluates
-        the board state to choose the best move.
+        the board state to choose the best move. Results are stored in the transposition
+        table and reused when the same position is reached again with enough depth.
+        Finished games score as wins or losses, and below the root, positions in the
+        endgame tablebase score their exact value without being searched.
 
         Args:
             depth (int): The maximum depth of the recursion.
             alpha (float): The alpha value for alpha-beta pruning.
             beta (float): The beta value for alpha-beta pruning.
             maximizing_player (bool): True if the current recursion level is maximizing, False otherwise.
+            ply (int): The distance from the root of the search, used for move ordering.
 
         Returns:
             tuple: A tuple containing the evaluation score and the best move.
         """
-        # Base case: max depth reached or game over
-        if depth == 0 or self.board.is_game_over():
+        self.nodes += 1
+        if self.deadline is not None and not self.nodes % TIME_CHECK_INTERVAL and self._out_of_time():
+            raise SearchTimeout()
+
+        # Base case: game over, position in the tablebase or max depth reached
+        stats = self.stats
+        if self.board.is_game_over():
+            if stats is not None:
+                stats.leaves += 1
+            return self.game_over_score(), None
+        if self.tablebase is not None and ply > 0 and not self.board.multi_capture_in_progress:
+            score = self.tablebase_score()
+            if score is not None:
+                if stats is not None:
+                    stats.leaves += 1
+                return score, None
+        if depth == 0:
+            if self.quiescence:
+                return self.quiescence_search(alpha, beta, maximizing_player, ply), None
+            if stats is not None:
+                stats.leaves += 1
             return self.evaluate_board(), None
 
+        # Reuse an earlier result for this position if it was searched deeply enough
+        key = self.board.zobrist_key()
+        alpha_orig, beta_orig = alpha, beta
+        tt_move = None
+        entry = self.transposition_table.probe(key)
+        if entry is not None:
+            entry_depth, bound, entry_score, tt_move = entry
+            if entry_depth >= depth:
+                if bound == EXACT:
+                    return entry_score, tt_move
+                if bound == LOWER:
+                    alpha = max(alpha, entry_score)
+                else:
+                    beta = min(beta, entry_score)
+                if beta <= alpha:
+                    return entry_score, tt_move
+
+        player = self.color if maximizing_player else OPPONENT[self.color]
+        moves = self.order_moves(self.board.get_possible_moves(player), key, tt_move, player, ply)
+        if stats is not None:
+            stats.expanded += 1
+
         # Maximizing player logic
         if maximizing_player:
-            max_eval = float('-inf')
+            best_eval = float('-inf')
             best_move = None
-            for move in self.get_possible_moves():
+            for index, move in enumerate(moves):
                 captured_piece_pos = self.board.apply_move(move)
-                eval_score, _ = self.minimax(depth - 1, alpha, beta, not self.board.multi_capture_in_progress)
-                self.board.undo_move(move, captured_piece_pos)
+                try:
+                    eval_score, _ = self.minimax(depth - 1, alpha, beta, self.board.current_player == self.color, ply + 1)
+                finally:
+                    self.board.undo_move(move, captured_piece_pos)
 
-                if eval_score > max_eval:
-                    max_eval = eval_score
+                if eval_score > best_eval:
+                    best_eval = eval_score
                     best_move = move
 
                 alpha = max(alpha, eval_score)
                 if beta <= alpha:
+                    self.ordering.record_cutoff(player, move, depth, ply)
+                    if stats is not None:
+                        self._record_cutoff(index)
                     break  # Alpha-beta pruning
-            return max_eval, best_move
         else:
             # Minimizing player logic
-            min_eval = float('inf')
+            best_eval = float('inf')
             best_move = None
-            for move in self.get_possible_moves():
+            for index, move in enumerate(moves):
                 captured_piece_pos = self.board.apply_move(move)
-                eval_score, _ = self.minimax(depth - 1, alpha, beta, self.board.multi_capture_in_progress)
-                self.board.undo_move(move, captured_piece_pos)
+                try:
+                    eval_score, _ = self.minimax(depth - 1, alpha, beta, self.board.current_player == self.color, ply + 1)
+                finally:
+                    self.board.undo_move(move, captured_piece_pos)
 
-                if eval_score < min_eval:
-                    min_eval = eval_score
+                if eval_score < best_eval:
+                    best_eval = eval_score
                     best_move = move
 
                 beta = min(beta, eval_score)
                 if beta <= alpha:
+                    self.ordering.record_cutoff(player, move, depth, ply)
+                    if stats is not None:
+                        self._record_cutoff(index)
                     break  # Alpha-beta pruning
-            return min_eval, best_move
 
-    def choose_move(self):
+        if stats is not None:
+            stats.children += index + 1 if moves else 0
+        if best_move is not None:
+            if best_eval <= alpha_orig:
+                bound = UPPER
+            elif best_eval >= beta_orig:
+                bound = LOWER
+            else:
+                bound = EXACT
+            self.transposition_table.store(key, depth, bound, best_eval, best_move)
+        return best_eval, best_move
+
+    def negamax(self, depth, alpha, beta, ply=0, moves=None):
+        """
+        Alpha-beta search in negamax form, the core of the 'pvs', 'aspiration' and 'mtdf' algorithms.
+
+        Scores are seen from the side to move, so one branch serves both sides.
+        Except with 'mtdf', moves after the first are searched with a null
+        window, which only tells whether they beat the best move so far, and
+        searched again with the full window when they do. Results go into the
+        transposition table from the CPU player's point of view, as ``minimax``
+        stores them, so the algorithms can share a table.
+
+        Args:
+            depth (int): The maximum depth of the recursion.
+            alpha (float): The score the side to move is already sure of.
+            beta (float): The score above which the opponent avoids this position.
+            ply (int): The distance from the root of the search, used for move ordering.
+            moves (list, optional): The moves to search, in order. Given at the root, so
+                every pass of a search tries them in the same order; the transposition
+                table is then not used to cut the search short.
+
+        Returns:
+            tuple: The score for the side to move and the best move.
+        """
+        self.nodes += 1
+        if self.deadline is not None and not self.nodes % TIME_CHECK_INTERVAL and self._out_of_time():
+            raise SearchTimeout()
+
+        board = self.board
+        player = board.current_player
+        sign = 1 if player == self.color else -1
+        stats = self.stats
+        if board.is_game_over():
+            if stats is not None:
+                stats.leaves += 1
+            return sign * self.game_over_score(), None
+        if self.tablebase is not None and ply > 0 and not board.multi_capture_in_progress:
+            score = self.tablebase_score()
+            if score is not None:
+                if stats is not None:
+                    stats.leaves += 1
+                return sign * score, None
+        if depth == 0:
+            if self.quiescence:
+                if sign > 0:
+                    return self.quiescence_search(alpha, beta, True, ply), None
+                return -self.quiescence_search(-beta, -alpha, False, ply), None
+            if stats is not None:
+                stats.leaves += 1
+            return sign * self.evaluate_board(), None
+
+        key = board.zobrist_key()
+        alpha_orig, beta_orig = alpha, beta
+        if moves is None:
+            tt_move = None
+            entry = self.transposition_table.probe(key)
+            if entry is not None:
+                entry_depth, bound, entry_score, tt_move = entry
+                if entry_depth >= depth:
+                    if sign < 0:
+                        entry_score = -entry_score
+                        bound = FLIPPED_BOUND[bound]
+                    if bound == EXACT:
+                        return entry_score, tt_move
+                    if bound == LOWER:
+                        alpha = max(alpha, entry_score)
+                    else:
+                        beta = min(beta, entry_score)
+                    if beta <= alpha:
+                        return entry_score, tt_move
+            moves = self.order_moves(board.get_possible_moves(player), key, tt_move, player, ply)
+        if stats is not None:
+            stats.expanded += 1
+
+        null_window = self.algorithm != 'mtdf'
+        best_score = float('-inf')
+        best_move = None
+        for index, move in enumerate(moves):
+            board.apply_move(move)
+            try:
+                # The turn passes with every move, so the child scores for the opponent
+                if index and null_window:
+                    score = -self.negamax(depth - 1, -alpha - 1, -alpha, ply + 1)[0]
+                    if alpha < score < beta:
+                        score = -self.negamax(depth - 1, -beta, -score, ply + 1)[0]
+                else:
+                    score = -self.negamax(depth - 1, -beta, -alpha, ply + 1)[0]
+            finally:
+                board.undo_move(move)
+
+            if score > best_score:
+                best_score = score
+                best_move = move
+            alpha = max(alpha, score)
+            if beta <= alpha:
+                self.ordering.record_cutoff(player, move, depth, ply)
+                if stats is not None:
+                    self._record_cutoff(index)
+                break
+
+        if stats is not None:
+            stats.children += index + 1 if moves else 0
+        if best_move is not None:
+            if best_score <= alpha_orig:
+                bound = UPPER
+            elif best_score >= beta_orig:
+                bound = LOWER
+            else:
+                bound = EXACT
+            if sign < 0:
+                self.transposition_table.store(key, depth, FLIPPED_BOUND[bound], -best_score, best_move)
+            else:
+                self.transposition_table.store(key, depth, bound, best_score, best_move)
+        return best_score, best_move
+
+    def search(self, depth, alpha, beta, ply=0):
+        """
+        Search the current position with the core of the chosen algorithm.
+
+        Args:
+            depth (int): The search depth.
+            alpha (float): The alpha value, for the CPU player.
+            beta (float): The beta value, for the CPU player.
+            ply (int): The distance from the root of the search.
+
+        Returns:
+            tuple: The score for the CPU player and the best move.
+        """
+        if self.algorithm == 'minimax':
+            return self.minimax(depth, alpha, beta, self.board.current_player == self.color, ply)
+        if self.board.current_player == self.color:
+            return self.negamax(depth, alpha, beta, ply)
+        score, move = self.negamax(depth, -beta, -alpha, ply)
+        return -score, move
+
+    def mtdf(self, depth, guess, moves):
+        """
+        Find the score of the root with null-window searches converging on it (MTD(f)).
+
+        Each pass only tells whether the score is above or below a test value,
+        which narrows the range the score lies in until it is pinned down; the
+        transposition table keeps the work of the earlier passes.
+
+        Args:
+            depth (int): The search depth.
+            guess (int): The first test value; the closer to the score, the fewer passes.
+            moves (list): The root moves, in search order.
+
+        Returns:
+            tuple: The best score and the best move.
+        """
+        lower, upper = float('-inf'), float('inf')
+        score = guess
+        move = None
+        while lower < upper:
+            beta = score + 1 if score == lower else score
+            score, move = self.negamax(depth, beta - 1, beta, moves=moves)
+            if score < beta:
+                upper = score
+            else:
+                lower = score
+        if score < beta:
+            # The last pass failed low, which does not single out a move: find the
+            # first move reaching the score
+            score, move = self.negamax(depth, score - 1, score, moves=moves)
+        return score, move
+
+    def aspiration_search(self, depth, guess, moves):
+        """
+        Search the root in a window around an expected score, opening it up on a miss.
+
+        A narrow window cuts off more of the tree. If the score falls outside
+        it, the search is repeated with the window open on that side.
+
+        Args:
+            depth (int): The search depth.
+            guess (int): The expected score, usually the previous iteration's.
+            moves (list): The root moves, in search order.
+
+        Returns:
+            tuple: The best score and the best move.
+        """
+        alpha, beta = guess - ASPIRATION_WINDOW, guess + ASPIRATION_WINDOW
+        while True:
+            score, move = self.negamax(depth, alpha, beta, moves=moves)
+            if score <= alpha:
+                alpha = float('-inf')
+            elif score >= beta:
+                beta = float('inf')
+            else:
+                return score, move
+
+    def quiescence_search(self, alpha, beta, maximizing_player, ply):
+        """
+        Search only captures past the search depth, until the position is quiet.
+
+        Captures are mandatory, so a side with a capture cannot stand pat: all
+        of its captures are searched. A quiet position is scored by the
+        evaluation as it stands. Every capture removes a piece, so the search
+        always ends.
+
+        Args:
+            alpha (float): The alpha value for alpha-beta pruning.
+            beta (float): The beta value for alpha-beta pruning.
+            maximizing_player (bool): True if the CPU player is to move.
+            ply (int): The distance from the root of the search.
+
+        Returns:
+            float: The score of the position once its captures are played out.
+        """
+        self.nodes += 1
+        if self.deadline is not None and not self.nodes % TIME_CHECK_INTERVAL and self._out_of_time():
+            raise SearchTimeout()
+
+        board = self.board
+        player = self.color if maximizing_player else OPPONENT[self.color]
+        score = None
+        if board.is_game_over():
+            score = self.game_over_score()
+        elif self.tablebase is not None and not board.multi_capture_in_progress:
+            score = self.tablebase_score()
+        if score is None and not board.has_captures(player):
+            score = self.evaluate_board()  # Stand pat: nothing is left hanging
+        stats = self.stats
+        if score is not None:
+            if stats is not None:
+                stats.leaves += 1
+            return score
+        if stats is not None:
+            stats.expanded += 1
+
+        best_score = float('-inf') if maximizing_player else float('inf')
+        for move in board.get_possible_moves(player):
+            board.apply_move(move)
+            try:
+                score = self.quiescence_search(alpha, beta, board.current_player == self.color, ply + 1)
+            finally:
+                board.undo_move(move)
+            if stats is not None:
+                stats.children += 1
+            if maximizing_player:
+                best_score = max(best_score, score)
+                alpha = max(alpha, score)
+            else:
+                best_score = min(best_score, score)
+                beta = min(beta, score)
+            if beta <= alpha:
+                break
+        return best_score
+
+    def _record_cutoff(self, index):
+        """
+        Count a beta cutoff in the search statistics.
+
+        Args:
+            index (int): The position of the move that caused it in the search order.
+        """
+        self.stats.beta_cutoffs += 1
+        if index == 0:
+            self.stats.first_move_cutoffs += 1
+
+    def order_moves(self, moves, key, tt_move, player=None, ply=0):
+        """
+        Order the moves of a position for searching.
+
+        The previous iteration's principal variation goes first, then the best
+        move from an earlier result for this position, then promotions, killer
+        moves and the rest by history score (see ``ordering.py``).
+
+        Args:
+            moves (list): The legal moves of the position; reordered in place.
+            key (int): The Zobrist key of the position.
+            tt_move (tuple): The best move stored in the transposition table, or None.
+            player (str): The side to move; defaults to the CPU player.
+            ply (int): The distance from the root of the search.
+
+        Returns:
+            list: The ordered moves.
+        """
+        return self.ordering.order(self.board, moves, player or self.color, ply,
+                                   self._pv_moves.get(key, tt_move))
+
+    def search_root(self, depth, parallel=True):
+        """
+        Search the current position to a fixed depth with the chosen algorithm.
+
+        With several workers the root moves are searched in parallel (see
+        ``parallel.py``), each with the core of the chosen algorithm.
+
+        Args:
+            depth (int): The search depth.
+            parallel (bool): Use the workers, if there are several.
+
+        Returns:
+            tuple: The best score and the best move.
+        """
+        if parallel and self.workers > 1:
+            from parallel import search_root
+            score, move = search_root(self, depth, self.workers)
+        elif self.algorithm == 'minimax':
+            score, move = self.minimax(depth=depth, alpha=float('-inf'), beta=float('inf'), maximizing_player=True)
+        else:
+            key = self.board.zobrist_key()
+            entry = self.transposition_table.probe(key)
+            moves = self.order_moves(self.get_possible_moves(), key, entry[3] if entry is not None else None)
+            guess = self._previous_score
+            if guess is None:
+                guess = self.evaluate_board()
+            if self.algorithm == 'mtdf':
+                score, move = self.mtdf(depth, guess, moves)
+            elif self.algorithm == 'aspiration':
+                score, move = self.aspiration_search(depth, guess, moves)
+            else:
+                score, move = self.negamax(depth, float('-inf'), float('inf'), moves=moves)
+        self._previous_score = score
+        return score, move
+
+    def _search_iteration(self, depth):
+        """
+        Search to one depth, recording its nodes and time when collecting statistics.
+
+        Args:
+            depth (int): The search depth.
+
+        Returns:
+            tuple: The best score and the best move.
+        """
+        if self.stats is None:
+            return self.search_root(depth)
+        start = time.perf_counter()
+        nodes = self.nodes
+        score, move = self.search_root(depth)
+        self.stats.add_iteration(depth, self.nodes - nodes, time.perf_counter() - start, score, move)
+        return score, move
+
+    def choose_move(self, depth=3, time_budget_ms=None, with_stats=False):
         """
         Choose the best move for the CPU player.
 
-        The best move is selected using the minimax algorithm with a specified depth.
+        A move from the opening book is played at once if the position is in it,
+        and failing that a move from the position index.
+        Otherwise the best move is selected using the minimax algorithm with the CPU
+        player as the maximizing side and to move. Without a time budget the search goes to a fixed
+        depth. With a budget it deepens iteratively (depth 1, 2, 3, ...) until the budget
+        runs out and returns the best move of the last completed iteration; each iteration
+        searches the previous iteration's principal variation first.
+
+        Args:
+            depth (int): The search depth when no time budget is given.
+            time_budget_ms (float, optional): Wall-clock time allowed for the move, in milliseconds.
+            with_stats (bool): Collect statistics of the search (see ``searchstats.py``)
+                and return them with the move. Also kept in ``stats``.
 
         Returns:
-            tuple: The chosen move as a tuple of start and end positions.
+            tuple: The chosen move as a tuple of start and end positions; with
+            ``with_stats``, a tuple of that move and the SearchStats.
+        """
+        self.transposition_table.new_search()
+        self.ordering.new_search()
+        self.stats = SearchStats() if with_stats else None
+        start = time.perf_counter()
+        nodes = self.nodes
+        probes, hits = self.transposition_table.probes, self.transposition_table.hits
+        previous_player = self.board.current_player
+        self.board.current_player = self.color
+        try:
+            best_move = None
+            if self.book is not None:
+                best_move = self.book.choose(self.board)
+                if best_move is not None:
+                    self.principal_variation = [best_move]
+                    if with_stats:
+                        self.stats.book_move = True
+            if best_move is None and self.position_index is not None:
+                best_move = self.position_index.choose(self.board)
+                if best_move is not None:
+                    self.principal_variation = [best_move]
+                    if with_stats:
+                        self.stats.index_move = True
+            self._previous_score = None
+            if best_move is None and time_budget_ms is None:
+                self._pv_moves = {}
+                _, best_move = self._search_iteration(depth)
+            elif best_move is None:
+                best_move = self._iterative_deepening(time.perf_counter() + time_budget_ms / 1000.0)
+        finally:
+            self.board.current_player = previous_player
+            self.deadline = None
+        if not with_stats:
+            return best_move
+        stats = self.stats
+        stats.nodes = self.nodes - nodes
+        stats.tt_probes = self.transposition_table.probes - probes
+        stats.tt_hits = self.transposition_table.hits - hits
+        stats.seconds = time.perf_counter() - start
+        return best_move, stats
+
+    def _iterative_deepening(self, deadline):
         """
-        _, best_move = self.minimax(depth=3, alpha=float('-inf'), beta=float('inf'), maximizing_player=self.color == 'R')
+        Search with increasing depth until the deadline passes.
+
+        The first iteration always completes, so a move is returned even when the
+        budget is smaller than a depth-1 search.
+
+        Args:
+            deadline (float): The ``time.perf_counter()`` value at which to stop.
+
+        Returns:
+            tuple: The best move of the last completed iteration.
+        """
+        best_move = None
+        self._pv_moves = {}
+        self.deadline = None
+        for depth in range(1, MAX_SEARCH_DEPTH + 1):
+            try:
+                _, move = self._search_iteration(depth)
+            except SearchTimeout:
+                break
+            if move is None:
+                break
+            best_move = move
+            self.principal_variation = self._extract_principal_variation(depth)
+            self.deadline = deadline
+            if self._out_of_time():
+                break
         return best_move
 
+    def _out_of_time(self):
+        """
+        Check whether the search must stop: its deadline has passed or ``stop`` is set.
+
+        Returns:
+            bool: True if the search must stop.
+        """
+        return time.perf_counter() >= self.deadline or self.stop is not None and self.stop.is_set()
+
+    def _extract_principal_variation(self, depth):
+        """
+        Follow the best moves stored in the transposition table from the current position.
+
+        Also records them in ``_pv_moves``, keyed by position, so the next iteration
+        searches them first.
+
+        Args:
+            depth (int): The maximum number of moves to follow.
+
+        Returns:
+            list: The principal variation as a list of moves.
+        """
+        variation = []
+        self._pv_moves = {}
+        for _ in range(depth):
+            key = self.board.zobrist_key()
+            entry = self.transposition_table.probe(key)
+            if entry is None or entry[3] is None or key in self._pv_moves:
+                break
+            move = entry[3]
+            if move not in self.board.get_possible_moves(self.board.current_player):
+                break
+            self._pv_moves[key] = move
+            variation.append(move)
+            self.board.apply_move(move)
+        for move in reversed(variation):
+            self.board.undo_move(move)
+        return variation
+
 # Testing the CPU player independently
 if __name__ == '__main__':
     # Initialize a game board
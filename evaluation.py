@@ -0,0 +1,105 @@
+"""
+Piece-square tables for the CPU player's evaluation.
+
+A table gives the value of a man or a king of each colour on each of the 32
+playable squares (numbered as in ``bitboard.py``). ``CheckersBoard`` keeps the
+sum of these values for each colour up to date as moves are made, so the
+evaluation of a position is a single subtraction no matter how detailed the
+tables are.
+
+Tables fitted to game results (see ``tuning.py``) are stored as JSON with
+Red's 32 man values and 32 king values; Black's tables are the same values
+seen from the other side of the board.
+"""
+import json
+
+MAN_VALUE = 100
+KING_VALUE = 175
+
+# Home rows; men left there keep the opponent from promoting
+BACK_RANK = {'R': 0xF0000000, 'B': 0x0000000F}
+# The four central squares, on rows 3 and 4
+CENTRE = (1 << 13) | (1 << 14) | (1 << 17) | (1 << 18)
+
+
+def piece_square_tables(man_value=MAN_VALUE, king_value=KING_VALUE, back_rank_bonus=0, centre_bonus=0):
+    """
+    Build piece-square tables from material values and positional bonuses.
+
+    Args:
+        man_value (int): The value of a man on any square.
+        king_value (int): The value of a king on any square.
+        back_rank_bonus (int): Extra value of a man still on its home row.
+        centre_bonus (int): Extra value of any piece on one of the four central squares.
+
+    Returns:
+        dict: (men table, kings table) lists of 32 values, keyed by 'R' and 'B'.
+    """
+    tables = {}
+    for player in ('R', 'B'):
+        men = []
+        kings = []
+        for square in range(32):
+            bit = 1 << square
+            centre = centre_bonus if bit & CENTRE else 0
+            men.append(man_value + centre + (back_rank_bonus if bit & BACK_RANK[player] else 0))
+            kings.append(king_value + centre)
+        tables[player] = (men, kings)
+    return tables
+
+
+def mirrored_tables(men, kings):
+    """
+    Build piece-square tables from Red's values, mirroring them for Black.
+
+    The board turned half a turn takes square ``s`` to square ``31 - s``.
+
+    Args:
+        men (list): Red's man value on each square.
+        kings (list): Red's king value on each square.
+
+    Returns:
+        dict: (men table, kings table) lists of 32 values, keyed by 'R' and 'B'.
+    """
+    return {'R': (list(men), list(kings)), 'B': (list(men)[::-1], list(kings)[::-1])}
+
+
+def load_tables(path):
+    """
+    Read piece-square tables from a weights file.
+
+    Args:
+        path (str): A JSON file with 'men' and 'kings' lists of 32 integers, Red's values.
+
+    Returns:
+        dict: (men table, kings table) lists of 32 values, keyed by 'R' and 'B'.
+
+    Raises:
+        ValueError: If the file does not hold two tables of 32 integers.
+    """
+    with open(path) as weights_file:
+        weights = json.load(weights_file)
+    tables = [weights.get(name) if isinstance(weights, dict) else None for name in ('men', 'kings')]
+    if any(not isinstance(table, list) or len(table) != 32 or not all(isinstance(value, int) for value in table)
+           for table in tables):
+        raise ValueError(f"{path} does not hold 'men' and 'kings' tables of 32 integers")
+    return mirrored_tables(*tables)
+
+
+def write_tables(path, men, kings, **info):
+    """
+    Write Red's piece-square values to a weights file ``load_tables`` reads.
+
+    Args:
+        path (str): The file to write.
+        men (list): Red's man value on each square.
+        kings (list): Red's king value on each square.
+        **info: Further fields to record, such as how the values were fitted.
+    """
+    with open(path, 'w') as weights_file:
+        json.dump(dict(info, men=[int(value) for value in men], kings=[int(value) for value in kings]),
+                  weights_file, indent=2)
+        weights_file.write('\n')
+
+
+DEFAULT_TABLES = piece_square_tables()
@@ -0,0 +1,335 @@
+"""
+Crash-safe storage of the web app's games: an append-only move log per session.
+
+Each game is a log file named after its session id. A log starts with a
+snapshot of the position and goes on with the moves played since, each with
+the board version it led to. Every ``snapshot_every`` moves a new snapshot
+replaces the log (written to a temporary file and renamed over it), so logs
+stay short and restoring a game replays few moves.
+
+Requests do not write the log themselves: they queue its records, and a
+background thread writes them in batches every ``flush_interval`` seconds,
+with one fsync per log per batch, so a move never waits for the disk. A
+crash loses at most the moves of the last interval. ``GameStore`` restores a
+session from its log the first time the session is asked for, so a restart
+reads no logs up front.
+
+Record layout (little endian): kind and board version, then for a snapshot
+the 13-byte position of ``wire.py``, and for a move the number of squares
+and the squares of its path, numbered as in ``bitboard.py``.
+"""
+import os
+import re
+import struct
+import threading
+import time
+
+from bitboard import POSITIONS, SQUARES
+from wire import POSITION, pack_position, unpack_position
+
+HEADER = struct.Struct('<BI')
+SNAPSHOT = 1
+MOVE = 2
+SUFFIX = '.log'
+
+DEFAULT_FLUSH_INTERVAL = 0.05
+DEFAULT_SNAPSHOT_EVERY = 32
+
+# Session ids are used as file names, so only those ``secrets.token_urlsafe`` makes are accepted
+_SESSION_ID = re.compile(r'[A-Za-z0-9_-]{1,64}')
+
+
+class GameJournal:
+    """
+    Move logs of the web app's games, written by a background thread.
+
+    Attributes:
+        directory (str): Where the logs are kept.
+        flush_interval (float): Seconds between writes of the queued records.
+        snapshot_every (int): Moves after which a game's log is replaced by a snapshot.
+        max_age (float): Seconds after its last write that a log is deleted, or None to keep logs.
+        records (int): Records written.
+        batches (int): Writes of the queued records that found some.
+        syncs (int): Logs synced to disk.
+        restored (int): Games restored from their logs.
+    """
+
+    def __init__(self, directory, flush_interval=DEFAULT_FLUSH_INTERVAL,
+                 snapshot_every=DEFAULT_SNAPSHOT_EVERY, max_age=None, clock=time.time):
+        """
+        Open a journal directory, creating it if needed, and start the writer thread.
+
+        The writer deletes the logs older than ``max_age`` when it starts and
+        every ``max_age / 2`` seconds after, so a long-running server does not
+        collect the logs of abandoned games.
+
+        Args:
+            directory (str): Where the logs are kept.
+            flush_interval (float): Seconds between writes of the queued records.
+            snapshot_every (int): Moves after which a game's log is replaced by a snapshot.
+            max_age (float, optional): Seconds after its last write that a log is deleted.
+            clock (callable): Returns the wall-clock time, compared with file times.
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.snapshot_every = snapshot_every
+        self.max_age = max_age
+        self.clock = clock
+        self.records = 0
+        self.batches = 0
+        self.syncs = 0
+        self.restored = 0
+        self._pending = []
+        self._moves = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='game-journal', daemon=True)
+        self._thread.start()
+
+    def path(self, session_id):
+        """
+        Get the log file of a session.
+
+        Args:
+            session_id (str): The id of the session.
+
+        Returns:
+            str: The file, or None if the id cannot be a session id.
+        """
+        if not session_id or not _SESSION_ID.fullmatch(session_id):
+            return None
+        return os.path.join(self.directory, session_id + SUFFIX)
+
+    def record_move(self, session, move):
+        """
+        Queue a move of a session's game, or a snapshot in its place when one is due.
+
+        Must be called with the session's lock held, after the move is played
+        and the version counted.
+
+        Args:
+            session (GameSession): The game.
+            move (list): The positions of the move's path.
+        """
+        squares = [SQUARES[tuple(position)] for position in move]
+        record = HEADER.pack(MOVE, session.version) + bytes([len(squares)] + squares)
+        with self._lock:
+            moves = self._moves.get(session.session_id)
+            if moves is not None and moves + 1 < self.snapshot_every:
+                self._moves[session.session_id] = moves + 1
+                self._pending.append((session.session_id, 'append', record))
+                return
+        self.record_snapshot(session)
+
+    def record_snapshot(self, session):
+        """
+        Queue a snapshot of a session's game, which replaces its log.
+
+        Args:
+            session (GameSession): The game; its lock must be held.
+        """
+        record = HEADER.pack(SNAPSHOT, session.version) + pack_position(session.board)
+        with self._lock:
+            self._moves[session.session_id] = 0
+            self._pending.append((session.session_id, 'replace', record))
+
+    def delete(self, session_id):
+        """
+        Queue the deletion of a session's log, once its game is over for good.
+
+        Args:
+            session_id (str): The id of the session.
+        """
+        with self._lock:
+            self._moves.pop(session_id, None)
+            self._pending.append((session_id, 'delete', b''))
+
+    def release(self, session_id):
+        """
+        Forget a session that left memory but whose game is not over; its log is
+        kept, to be restored or to expire.
+
+        Args:
+            session_id (str): The id of the session.
+        """
+        with self._lock:
+            self._moves.pop(session_id, None)
+
+    def restore(self, session_id):
+        """
+        Read a session's game back from its log.
+
+        Records queued but not yet written are replayed over the log without
+        writing anything, so restoring a game never waits for other games'
+        logs to be synced. A log cut short by a crash is restored up to its
+        last whole record.
+
+        Args:
+            session_id (str): The id of the session.
+
+        Returns:
+            tuple: The board and its version, or None if the session has no log
+            or it is older than ``max_age``.
+        """
+        path = self.path(session_id)
+        if path is None:
+            return None
+        # Holding the flush lock keeps a batch from being half written while the log is read
+        with self._flush_lock:
+            with self._lock:
+                queued = [(action, record) for pending_id, action, record in self._pending if pending_id == session_id]
+            try:
+                with open(path, 'rb') as log:
+                    expired = self.max_age is not None and self.clock() - os.fstat(log.fileno()).st_mtime > self.max_age
+                    data = b'' if expired else log.read()
+            except FileNotFoundError:
+                expired = False
+                data = b''
+        if expired and not queued:
+            self.delete(session_id)
+            return None
+        # A replace starts the log over and a delete, whose record is empty, clears it
+        for action, record in queued:
+            if action == 'append':
+                data += record
+            else:
+                data = record
+
+        board = None
+        version = 0
+        moves = 0
+        offset = 0
+        while offset + HEADER.size <= len(data):
+            kind, record_version = HEADER.unpack_from(data, offset)
+            offset += HEADER.size
+            if kind == SNAPSHOT and offset + POSITION.size <= len(data):
+                board = unpack_position(data, offset)
+                offset += POSITION.size
+                moves = 0
+            elif kind == MOVE and board is not None and offset < len(data) and offset + 1 + data[offset] <= len(data):
+                squares = data[offset + 1:offset + 1 + data[offset]]
+                offset += 1 + len(squares)
+                if not board.move_piece(*[POSITIONS[square] for square in squares])[0]:
+                    break
+                moves += 1
+            else:
+                break
+            version = record_version
+        if board is None:
+            return None
+        with self._lock:
+            self._moves[session_id] = moves
+            self.restored += 1
+        return board, version
+
+    def flush(self):
+        """
+        Write the queued records, syncing each log written to once.
+        """
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, []
+            if not pending:
+                return
+            # Reduce each log's records to one write: a replace or delete drops what came before it
+            writes = {}
+            for session_id, action, record in pending:
+                if action == 'append' and session_id in writes:
+                    writes[session_id][1].append(record)
+                else:
+                    writes[session_id] = (action, [record])
+            for session_id, (action, records) in writes.items():
+                path = self.path(session_id)
+                if path is None:
+                    continue
+                if action == 'delete':
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        pass
+                    continue
+                if action == 'replace':
+                    temporary = path + '.tmp'
+                    with open(temporary, 'wb') as log:
+                        log.write(b''.join(records))
+                        log.flush()
+                        os.fsync(log.fileno())
+                    os.replace(temporary, path)
+                else:
+                    with open(path, 'ab') as log:
+                        log.write(b''.join(records))
+                        log.flush()
+                        os.fsync(log.fileno())
+                self.syncs += 1
+            self.records += len(pending)
+            self.batches += 1
+
+    def expire(self):
+        """
+        Delete the logs not written to for longer than ``max_age``.
+
+        The logs of sessions still in memory are kept however old they are:
+        a game can be visited without a move being played, and its store
+        deletes its log when it expires there.
+
+        Returns:
+            int: The number of logs deleted.
+        """
+        if self.max_age is None:
+            return 0
+        deleted = 0
+        now = self.clock()
+        # Holding the flush lock keeps a session from being restored from a log being deleted
+        with self._flush_lock, os.scandir(self.directory) as entries:
+            for entry in entries:
+                if not entry.name.endswith(SUFFIX) or now - entry.stat().st_mtime <= self.max_age:
+                    continue
+                with self._lock:
+                    if entry.name[:-len(SUFFIX)] in self._moves:
+                        continue
+                try:
+                    os.remove(entry.path)
+                    deleted += 1
+                except FileNotFoundError:
+                    pass
+        return deleted
+
+    def _run(self):
+        """
+        Write queued records every ``flush_interval`` seconds until closed, and
+        delete expired logs every ``max_age / 2`` seconds.
+        """
+        self.expire()
+        expired_at = self.clock()
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+            if self.max_age is not None and self.clock() - expired_at >= self.max_age / 2:
+                self.expire()
+                expired_at = self.clock()
+
+    def close(self):
+        """
+        Stop the writer thread and write what is still queued.
+        """
+        self._stop.set()
+        self._thread.join()
+        self.flush()
+
+    def stats(self):
+        """
+        Get the journal's counters.
+
+        Returns:
+            dict: Records queued and written, batches, syncs and games restored.
+        """
+        with self._lock:
+            queued = len(self._pending)
+        return {
+            'queued': queued,
+            'records': self.records,
+            'batches': self.batches,
+            'syncs': self.syncs,
+            'restored': self.restored,
+        }
@@ -0,0 +1,106 @@
+"""
+Move ordering for the CPU player's alpha-beta search.
+
+Alpha-beta prunes most when the best move of a position is searched first.
+Moves are tried in this order:
+
+1. the principal variation or transposition table move,
+2. moves that promote a man,
+3. killer moves: moves that caused a cutoff at the same ply elsewhere in the tree,
+4. the rest, by history score: how often and how deep each move caused a cutoff.
+
+Captures are mandatory, so a position's moves are either all captures or
+none; there is no separate "captures first" stage.
+"""
+from bitboard import SQUARES
+
+PROMOTION_SCORE = 1 << 24
+KILLER_SCORES = (1 << 23, 1 << 22)
+# History scores are halved once one of them reaches this value, so they
+# stay below the killer scores and old cutoffs fade out
+HISTORY_LIMIT = 1 << 20
+# Killer move slots kept per ply
+MAX_PLY = 128
+
+PROMOTION_ROW = {'R': 0, 'B': 7}
+
+
+class MoveOrdering:
+    """
+    Killer and history tables, kept for the iterations of one search.
+
+    Attributes:
+        killers (list): Two killer moves per ply, most recent first.
+        history (dict): History score of each (player, move).
+    """
+
+    def __init__(self):
+        """
+        Create empty killer and history tables.
+        """
+        self.killers = [[None, None] for _ in range(MAX_PLY)]
+        self.history = {}
+
+    def new_search(self):
+        """
+        Forget the killers and age the history scores before a new search.
+        """
+        self.killers = [[None, None] for _ in range(MAX_PLY)]
+        self.history = {key: score >> 2 for key, score in self.history.items() if score >> 2}
+
+    def order(self, board, moves, player, ply, first_move=None):
+        """
+        Sort moves into search order.
+
+        Args:
+            board (CheckersBoard): The position the moves are played from.
+            moves (list): The legal moves; sorted in place.
+            player (str): The side to move.
+            ply (int): The distance from the root of the search.
+            first_move (tuple): The move to search first, or None.
+
+        Returns:
+            list: The ordered moves.
+        """
+        if len(moves) > 1:
+            killers = self.killers[ply] if ply < MAX_PLY else (None, None)
+            history = self.history
+            men = board.men[player]
+            promotion_row = PROMOTION_ROW[player]
+
+            def score(move):
+                value = history.get((player, move), 0)
+                if move == killers[0]:
+                    value += KILLER_SCORES[0]
+                elif move == killers[1]:
+                    value += KILLER_SCORES[1]
+                if move[-1][0] == promotion_row and men & (1 << SQUARES[move[0]]):
+                    value += PROMOTION_SCORE
+                return value
+
+            moves.sort(key=score, reverse=True)
+        if first_move is not None and first_move in moves:
+            moves.remove(first_move)
+            moves.insert(0, first_move)
+        return moves
+
+    def record_cutoff(self, player, move, depth, ply):
+        """
+        Credit a move that caused a beta cutoff.
+
+        Args:
+            player (str): The side that played the move.
+            move (tuple): The move.
+            depth (int): The remaining depth of the node; deeper cutoffs weigh more.
+            ply (int): The distance from the root of the search.
+        """
+        if ply < MAX_PLY:
+            killers = self.killers[ply]
+            if killers[0] != move:
+                killers[1] = killers[0]
+                killers[0] = move
+        key = (player, move)
+        score = self.history.get(key, 0) + depth * depth
+        self.history[key] = score
+        if score >= HISTORY_LIMIT:
+            self.history = {key: value >> 1 for key, value in self.history.items() if value >> 1}
@@ -0,0 +1,197 @@
+"""
+Parallel root search for the CPU player.
+
+The moves at the root of the search are split across a pool of worker
+processes. The first (best-ordered) move is searched alone to establish a
+bound, then the remaining moves are searched concurrently ("young brothers
+wait"). Workers publish each exact score to a slot of shared memory and read
+the best score so far before starting a move, so later moves are searched
+with the tightest bound available.
+
+The pool is created on first use and kept for later searches, so process
+startup is paid once.
+"""
+import atexit
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from cpu import CPUPlayer, SearchTimeout
+from tablebase import open_tablebase
+from transposition import EXACT, TranspositionTable
+
+# Number of searches that can share the pool at the same time
+BOUND_SLOTS = 64
+# Transposition table entries of a worker, per root move
+WORKER_TT_ENTRIES = 1 << 14
+# Stands in for minus infinity in the shared bounds, which hold integers
+NO_BOUND = -(1 << 62)
+
+_pool = None
+_pool_workers = 0
+_bounds = None
+_free_slots = []
+_pool_lock = threading.Lock()
+
+# The shared bounds as seen from inside a worker process
+_worker_bounds = None
+
+
+def _init_worker(bounds):
+    """
+    Keep a reference to the shared bounds in a new worker process.
+
+    Args:
+        bounds (multiprocessing.Array): One best-score slot per concurrent search.
+    """
+    global _worker_bounds
+    _worker_bounds = bounds
+
+
+def get_pool(workers):
+    """
+    Get the process pool, creating it (or resizing it) as needed.
+
+    Args:
+        workers (int): The number of worker processes.
+
+    Returns:
+        ProcessPoolExecutor: The shared pool.
+    """
+    global _pool, _pool_workers, _bounds, _free_slots
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=True)
+            context = multiprocessing.get_context('spawn')
+            _bounds = context.Array('q', BOUND_SLOTS)
+            _free_slots = list(range(BOUND_SLOTS))
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                        initializer=_init_worker, initargs=(_bounds,))
+            _pool_workers = workers
+        return _pool
+
+
+def shutdown_pool():
+    """
+    Stop the worker processes. The next parallel search starts a new pool.
+    """
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True)
+        _pool = None
+        _pool_workers = 0
+
+
+atexit.register(shutdown_pool)
+
+
+def _search_move(board, color, move, depth, slot, wall_deadline, tablebase_path=None, quiescence=True,
+                 algorithm='minimax'):
+    """
+    Search one root move in a worker process.
+
+    The move is searched with alpha just below the best exact score published
+    so far, so a move that ties the best still gets its exact score.
+
+    Args:
+        board (CheckersBoard): The root position.
+        color (str): The color of the CPU player.
+        move (tuple): The root move to search.
+        depth (int): The depth of the whole search, including the root move.
+        slot (int): The shared bound slot of this search.
+        wall_deadline (float): ``time.time()`` at which to give up, or None.
+        tablebase_path (str): The endgame tablebase file to probe, or None.
+        quiescence (bool): Whether to search captures past the depth.
+        algorithm (str): The search algorithm whose core searches the move.
+
+    Returns:
+        tuple: (score, alpha, nodes), or None if the deadline passed.
+    """
+    tablebase = open_tablebase(tablebase_path) if tablebase_path else None
+    player = CPUPlayer(board, color, TranspositionTable(WORKER_TT_ENTRIES), tablebase=tablebase,
+                       quiescence=quiescence, algorithm=algorithm)
+    if wall_deadline is not None:
+        player.deadline = time.perf_counter() + (wall_deadline - time.time())
+    best = _worker_bounds[slot]
+    alpha = float('-inf') if best == NO_BOUND else best - 1
+    board.apply_move(move)
+    try:
+        score, _ = player.search(depth - 1, alpha, float('inf'), ply=1)
+    except SearchTimeout:
+        return None
+    if score > alpha:
+        with _worker_bounds.get_lock():
+            if score > _worker_bounds[slot]:
+                _worker_bounds[slot] = score
+    return score, alpha, player.nodes
+
+
+def search_root(cpu_player, depth, workers):
+    """
+    Search the CPU player's root moves in parallel.
+
+    Returns the same score and move as a serial search at the same depth:
+    among the moves with the highest score, the first in search order.
+
+    Args:
+        cpu_player (CPUPlayer): The player to move; its board is the root position.
+        depth (int): The search depth.
+        workers (int): The number of worker processes.
+
+    Returns:
+        tuple: The best score and the best move.
+
+    Raises:
+        SearchTimeout: If the player's deadline passed before every move was searched.
+    """
+    board = cpu_player.board
+    key = board.zobrist_key()
+    entry = cpu_player.transposition_table.probe(key)
+    moves = cpu_player.order_moves(board.get_possible_moves(cpu_player.color), key,
+                                   entry[3] if entry is not None else None)
+    if len(moves) <= 1 or depth <= 1:
+        return cpu_player.search_root(depth, parallel=False)
+
+    pool = get_pool(workers)
+    with _pool_lock:
+        slot = _free_slots.pop() if _free_slots else None
+    if slot is None:
+        # Every slot is taken by other searches; search this one serially
+        return cpu_player.search_root(depth, parallel=False)
+
+    wall_deadline = None
+    if cpu_player.deadline is not None:
+        wall_deadline = time.time() + (cpu_player.deadline - time.perf_counter())
+    # Workers map the tablebase file themselves, sharing its pages
+    tablebase_path = cpu_player.tablebase.path if cpu_player.tablebase is not None else None
+    try:
+        _bounds[slot] = NO_BOUND
+        # Young brothers wait: search the eldest move alone to get a bound
+        futures = [pool.submit(_search_move, board, cpu_player.color, moves[0], depth, slot, wall_deadline,
+                               tablebase_path, cpu_player.quiescence, cpu_player.algorithm)]
+        if futures[0].result() is None:
+            raise SearchTimeout()
+        futures += [pool.submit(_search_move, board, cpu_player.color, move, depth, slot, wall_deadline,
+                                tablebase_path, cpu_player.quiescence, cpu_player.algorithm)
+                    for move in moves[1:]]
+        results = [future.result() for future in futures]
+    finally:
+        with _pool_lock:
+            _free_slots.append(slot)
+
+    if any(result is None for result in results):
+        raise SearchTimeout()
+    best_score = float('-inf')
+    best_move = None
+    for move, (score, alpha, nodes) in zip(moves, results):
+        cpu_player.nodes += nodes
+        # Scores at or below the move's alpha are only upper bounds and
+        # cannot beat the move that set the bound
+        if score > alpha and score > best_score:
+            best_score = score
+            best_move = move
+    cpu_player.transposition_table.store(key, depth, EXACT, best_score, best_move)
+    return best_score, best_move
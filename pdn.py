@@ -0,0 +1,380 @@
+"""
+Portable Draughts Notation (PDN): streaming game import and export.
+
+Usage:
+    python pdn.py positions GAMES.pdn OUTPUT.bin
+    python pdn.py count GAMES.pdn
+
+A PDN file is a series of games, each a section of ``[Name "value"]`` tags
+followed by movetext: numbered moves such as ``11-15`` or ``22x15`` (a
+multi-capture lists its landing squares, ``15x24x31``, or only its ends,
+``15x31``), comments in braces or after a semicolon, variations in
+parentheses, and a result. Squares are numbered 1-32 from Black's side,
+which is the numbering of ``bitboard.py`` plus one. PDN's White is this
+game's Red; a game without a ``FEN`` tag starts from the initial position
+with Black to move, as PDN has it.
+
+``read_games`` reads one game at a time, so a collection of any size is
+read in constant memory, and ``PDNGame.positions`` replays a game through
+``CheckersBoard.move_piece``. Games are replayed under this game's rules,
+where men also capture backwards, so a game played under English draughts
+rules can stop at a move that is illegal here. ``positions`` writes every
+position of every game as the binary records of ``wire.py``.
+"""
+import argparse
+import json
+import re
+import sys
+
+from bitboard import POSITIONS, SQUARES
+from checkers import CheckersBoard
+from wire import pack_position
+
+COLORS = {'W': 'R', 'B': 'B'}
+# The winner of each result: the first player's score comes first, and Black moves first
+WINNERS = {'1-0': 'B', '2-0': 'B', '0-1': 'R', '0-2': 'R', '1/2-1/2': None, '1-1': None}
+FEN_COLORS = {player: color for color, player in COLORS.items()}
+LINE_LENGTH = 79
+
+_TAG = re.compile(r'\[\s*(\w+)\s+"((?:[^"\\]|\\.)*)"\s*\]')
+# Results come first: "1-0" would otherwise read as a move
+_TOKEN = re.compile(r'(1/2-1/2|(?:1-0|0-1|2-0|0-2|1-1)(?![-x\d])|\*)|(\d+(?:[-x]\d+)+)|[{}();]|\d+\.+|\$\d+|[^\s{}();]+')
+_ESCAPE = re.compile(r'\\(.)')
+
+
+class PDNGame:
+    """
+    One game of a PDN file.
+
+    Attributes:
+        tags (dict): The tag pairs, in file order.
+        moves (list): The moves of the main line, in PDN notation.
+        result (str): The result, '*' if unknown.
+    """
+
+    def __init__(self, tags=None, moves=None, result='*'):
+        """
+        Create a game.
+
+        Args:
+            tags (dict, optional): The tag pairs.
+            moves (list, optional): The moves, in PDN notation.
+            result (str): The result.
+        """
+        self.tags = dict(tags or {})
+        self.moves = list(moves or [])
+        self.result = result
+
+    @classmethod
+    def from_moves(cls, moves, board=None, tags=None, result='*'):
+        """
+        Create a game from moves played on a ``CheckersBoard``.
+
+        Args:
+            moves (list): The moves, as the position tuples of ``get_possible_moves``.
+            board (CheckersBoard, optional): The starting position; this game's initial position by default.
+            tags (dict, optional): The tag pairs.
+            result (str): The result.
+
+        Returns:
+            PDNGame: The game, with a ``FEN`` tag unless it starts from PDN's initial position.
+        """
+        board = CheckersBoard() if board is None else board
+        tags = dict(tags or {})
+        fen = board_fen(board)
+        if fen != board_fen(initial_board()):
+            tags['SetUp'] = '1'
+            tags['FEN'] = fen
+        return cls(tags, [format_move(move) for move in moves], result)
+
+    def start_board(self):
+        """
+        Set up the position the game starts from.
+
+        Returns:
+            CheckersBoard: The ``FEN`` position, or PDN's initial position.
+        """
+        if 'FEN' in self.tags:
+            return fen_board(self.tags['FEN'])
+        return initial_board()
+
+    def positions(self):
+        """
+        Replay the game, yielding the board before the first move and after each move.
+
+        The same board is yielded each time, changed in place; copy or pack
+        what must be kept.
+
+        Yields:
+            CheckersBoard: The game's positions.
+
+        Raises:
+            ValueError: At a move that is not legal in the position reached.
+        """
+        board = self.start_board()
+        yield board
+        for text in self.moves:
+            move = resolve_move(board, text)
+            board.move_piece(*move)
+            yield board
+
+
+def initial_board():
+    """
+    Set up PDN's initial position: this game's, with Black to move.
+
+    Returns:
+        CheckersBoard: The position.
+    """
+    board = CheckersBoard()
+    board.current_player = 'B'
+    return board
+
+
+def parse_squares(text):
+    """
+    Read the squares of a move in PDN notation.
+
+    Args:
+        text (str): The move, such as '11-15' or '15x24x31'.
+
+    Returns:
+        list: The squares, numbered as in ``bitboard.py``.
+
+    Raises:
+        ValueError: If a square is not numbered 1-32.
+    """
+    squares = [int(number) - 1 for number in re.split('[-x]', text)]
+    if any(not 0 <= square < 32 for square in squares):
+        raise ValueError(f"not a PDN move: {text!r}")
+    return squares
+
+
+def resolve_move(board, text):
+    """
+    Find the legal move a move in PDN notation stands for.
+
+    A capture given by its ends only is the first legal capture path between them.
+
+    Args:
+        board (CheckersBoard): The position, with the mover to move.
+        text (str): The move.
+
+    Returns:
+        tuple: The move, as positions.
+
+    Raises:
+        ValueError: If no legal move matches.
+    """
+    positions = tuple(POSITIONS[square] for square in parse_squares(text))
+    for move in board.get_possible_moves(board.current_player):
+        if move == positions or (len(positions) == 2 and move[0] == positions[0] and move[-1] == positions[-1]):
+            return move
+    raise ValueError(f"illegal move {text} for {board.current_player}")
+
+
+def format_move(move):
+    """
+    Write a move in PDN notation.
+
+    Args:
+        move (tuple): The move, as positions.
+
+    Returns:
+        str: The move, with every landing square of a capture.
+    """
+    separator = 'x' if abs(move[1][0] - move[0][0]) == 2 else '-'
+    return separator.join(str(SQUARES[tuple(position)] + 1) for position in move)
+
+
+def board_fen(board):
+    """
+    Write a position as a PDN ``FEN`` tag value.
+
+    Args:
+        board (CheckersBoard): The position.
+
+    Returns:
+        str: The side to move and each side's squares, kings prefixed with 'K'.
+    """
+    sides = []
+    for color, player in COLORS.items():
+        pieces = [(square, 'K') for square in range(32) if board.kings[player] >> square & 1]
+        pieces += [(square, '') for square in range(32) if board.men[player] >> square & 1]
+        sides.append(color + ','.join(f'{king}{square + 1}' for square, king in sorted(pieces)))
+    return ':'.join([FEN_COLORS[board.current_player]] + sides)
+
+
+def fen_board(fen):
+    """
+    Set up a position from a PDN ``FEN`` tag value.
+
+    Args:
+        fen (str): The value, such as 'B:W21-32:B1-12' or 'W:WK3,18:B12'.
+
+    Returns:
+        CheckersBoard: The position.
+
+    Raises:
+        ValueError: If the value is not a ``FEN`` position.
+    """
+    fields = fen.strip().rstrip('.').split(':')
+    if not fields or fields[0] not in COLORS:
+        raise ValueError(f"not a FEN position: {fen!r}")
+    men = {'R': 0, 'B': 0}
+    kings = {'R': 0, 'B': 0}
+    for field in fields[1:]:
+        if not field or field[0] not in COLORS:
+            raise ValueError(f"not a FEN position: {fen!r}")
+        player = COLORS[field[0]]
+        for piece in filter(None, field[1:].split(',')):
+            pieces = kings if piece.startswith('K') else men
+            # A range such as 1-12 stands for every square from one to the other
+            first, _, last = piece.lstrip('K').partition('-')
+            first, last = parse_squares(f'{first}-{last or first}')
+            for square in range(first, last + 1):
+                pieces[player] |= 1 << square
+    board = CheckersBoard()
+    board.set_pieces(men, kings)
+    board.current_player = COLORS[fields[0]]
+    return board
+
+
+def read_games(stream):
+    """
+    Read the games of a PDN file one at a time.
+
+    Only the main line of each game is kept: comments, variations, move
+    numbers, annotation glyphs and move strength marks are skipped.
+
+    Args:
+        stream (file): The file, open in text mode.
+
+    Yields:
+        PDNGame: The games, in file order.
+    """
+    tags = {}
+    moves = []
+    comment = False
+    depth = 0
+    for line in stream:
+        if not comment and line.lstrip().startswith('['):
+            if moves:
+                yield PDNGame(tags, moves)
+                tags, moves = {}, []
+            for name, value in _TAG.findall(line):
+                tags[name] = _ESCAPE.sub(r'\1', value)
+            continue
+        position = 0
+        while position < len(line):
+            if comment:
+                end = line.find('}', position)
+                if end < 0:
+                    break
+                comment = False
+                position = end + 1
+                continue
+            token = _TOKEN.search(line, position)
+            if token is None:
+                break
+            position = token.end()
+            text = token.group()
+            if text == '{':
+                comment = True
+            elif text == ';':
+                break
+            elif text == '(':
+                depth += 1
+            elif text == ')':
+                depth = max(depth - 1, 0)
+            elif depth:
+                continue
+            elif token.group(1):
+                yield PDNGame(tags, moves, text)
+                tags, moves = {}, []
+            elif token.group(2):
+                moves.append(text)
+    if tags or moves:
+        yield PDNGame(tags, moves)
+
+
+def write_game(stream, game):
+    """
+    Write a game in PDN, followed by a blank line.
+
+    Args:
+        stream (file): The file, open in text mode.
+        game (PDNGame): The game.
+    """
+    tags = dict(game.tags)
+    tags['Result'] = game.result
+    for name, value in tags.items():
+        value = value.replace('\\', '\\\\').replace('"', '\\"')
+        stream.write(f'[{name} "{value}"]\n')
+    stream.write('\n')
+
+    # Move numbers count Black's moves, Black moving first
+    black = game.start_board().current_player == 'B'
+    number = 1
+    tokens = [] if black else ['1...']
+    for move in game.moves:
+        if black:
+            tokens.append(f'{number}.')
+        else:
+            number += 1
+        tokens.append(move)
+        black = not black
+    tokens.append(game.result)
+
+    line = ''
+    for token in tokens:
+        if line and len(line) + 1 + len(token) > LINE_LENGTH:
+            stream.write(line + '\n')
+            line = token
+        else:
+            line = f'{line} {token}' if line else token
+    stream.write(line + '\n\n')
+
+
+def main(argv=None):
+    """
+    Run the PDN command line.
+
+    Returns:
+        int: The exit status.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+    sub = commands.add_parser('positions')
+    sub.add_argument('path')
+    sub.add_argument('output')
+    sub = commands.add_parser('count')
+    sub.add_argument('path')
+    args = parser.parse_args(argv)
+
+    totals = {'games': 0, 'moves': 0, 'positions': 0, 'stopped': 0}
+    output = open(args.output, 'wb') if args.command == 'positions' else None
+    try:
+        with open(args.path, encoding='utf-8', errors='replace') as stream:
+            for game in read_games(stream):
+                totals['games'] += 1
+                totals['moves'] += len(game.moves)
+                if output is None:
+                    continue
+                try:
+                    for board in game.positions():
+                        output.write(pack_position(board))
+                        totals['positions'] += 1
+                except ValueError:
+                    totals['stopped'] += 1
+    finally:
+        if output is not None:
+            output.close()
+    if output is None:
+        del totals['positions'], totals['stopped']
+    print(json.dumps(totals))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
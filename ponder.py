@@ -0,0 +1,216 @@
+"""
+Pondering: searching on the human's time for the CPU player's next move.
+
+After the CPU player moves, a ``Ponder`` searches the positions the human's
+replies lead to, as if each reply had been played, while the human thinks.
+The CPU's answer to each reply is kept, keyed by the position it answers,
+so when the human plays a pondered reply the answer is played at once.
+Everything searched also stays in the game's transposition table, so even
+a reply that was not pondered is searched faster.
+
+The reply the CPU's principal variation expects is searched first, then the
+others, those leaving the human best off in material first. A position with
+few replies has all of them searched. Each reply gets the CPU's normal move
+budget and the whole ponder a budget of its own, so one game's pondering
+uses a bounded amount of CPU.
+"""
+import copy
+import threading
+import time
+
+from cpu import CPUPlayer
+
+
+class Ponder:
+    """
+    A speculative search of the human's replies, run on a background thread.
+
+    The ponder searches its own copy of the board; the game's transposition
+    table is shared with it, so ``cancel`` must return before the game's next
+    search starts.
+
+    Attributes:
+        color (str): The CPU player's color.
+        replies (list): The replies to search, in order.
+        answers (dict): The CPU's move per position searched, keyed by Zobrist key.
+        searched (int): Replies whose answer was searched to the end of its budget.
+        nodes (int): Positions visited by the ponder's searches.
+    """
+
+    def __init__(self, board, color, transposition_table, expected_reply=None, max_replies=8,
+                 reply_budget_ms=200, budget_ms=1000, tablebase=None, book=None, position_index=None):
+        """
+        Prepare to ponder a position where the human is to move.
+
+        Args:
+            board (CheckersBoard): The position; copied, so the game may go on meanwhile.
+            color (str): The CPU player's color.
+            transposition_table (TranspositionTable): The CPU player's table for this game.
+            expected_reply (tuple, optional): The reply the CPU expects, searched first.
+            max_replies (int): The most replies to search.
+            reply_budget_ms (float): Time allowed for the answer to each reply, in milliseconds.
+            budget_ms (float): Time allowed for the whole ponder, in milliseconds.
+            tablebase (TablebaseReader, optional): Endgame tablebase for the searches.
+            book (BookReader, optional): Opening book for the searches.
+            position_index (PositionIndex, optional): Position index for the searches.
+        """
+        self.board = copy.deepcopy(board)
+        self.color = color
+        self.transposition_table = transposition_table
+        self.reply_budget_ms = reply_budget_ms
+        self.budget_ms = budget_ms
+        self.tablebase = tablebase
+        self.book = book
+        self.position_index = position_index
+        self.replies = self._order_replies(expected_reply)[:max_replies]
+        self.answers = {}
+        self.searched = 0
+        self.nodes = 0
+        self._stop = threading.Event()
+        self._done = threading.Event()
+        self._lock = threading.Lock()
+        self._running = False
+
+    def _order_replies(self, expected_reply):
+        """
+        Order the human's replies by how likely they seem.
+
+        Args:
+            expected_reply (tuple): The reply the CPU expects, or None.
+
+        Returns:
+            list: The expected reply, then the others by the human's material lead after them.
+        """
+        board = self.board
+        human = board.current_player
+
+        def lead(reply):
+            board.apply_move(reply)
+            try:
+                return board.material[human] - board.material[self.color]
+            finally:
+                board.undo_move(reply)
+
+        replies = sorted(board.get_possible_moves(human), key=lead, reverse=True)
+        if expected_reply in replies:
+            replies.remove(expected_reply)
+            replies.insert(0, expected_reply)
+        return replies
+
+    def run(self):
+        """
+        Search the replies until all are answered, the budget runs out or the ponder is cancelled.
+        """
+        with self._lock:
+            if self._stop.is_set():
+                self._done.set()
+                return
+            self._running = True
+        board = self.board
+        deadline = time.perf_counter() + self.budget_ms / 1000.0
+        try:
+            for reply in self.replies:
+                # Only answers searched with the full move budget are kept
+                if self._stop.is_set() or (deadline - time.perf_counter()) * 1000.0 < self.reply_budget_ms:
+                    break
+                board.apply_move(reply)
+                try:
+                    if board.current_player != self.color or board.is_game_over():
+                        continue
+                    cpu_player = CPUPlayer(board, self.color, self.transposition_table,
+                                           tablebase=self.tablebase, book=self.book,
+                                           position_index=self.position_index, stop=self._stop)
+                    move = cpu_player.choose_move(time_budget_ms=self.reply_budget_ms)
+                    self.nodes += cpu_player.nodes
+                    if move is not None and not self._stop.is_set():
+                        self.answers[board.zobrist_key()] = move
+                        self.searched += 1
+                finally:
+                    board.undo_move(reply)
+        finally:
+            self._done.set()
+
+    def cancel(self):
+        """
+        Stop pondering, waiting for the search in progress to notice.
+
+        A ponder that has not started yet will not start.
+        """
+        self._stop.set()
+        with self._lock:
+            running = self._running
+        if running:
+            self._done.wait()
+
+    def answer(self, board):
+        """
+        Get the pondered answer to the position the human's move led to.
+
+        Must be called after ``cancel``.
+
+        Args:
+            board (CheckersBoard): The game, with the CPU player to move.
+
+        Returns:
+            tuple: The CPU player's move, or None if the position was not pondered.
+        """
+        move = self.answers.get(board.zobrist_key())
+        if move is None or move not in board.get_possible_moves(board.current_player):
+            return None
+        return move
+
+
+class PonderTotals:
+    """
+    Thread-safe counts of how pondering paid off.
+
+    Attributes:
+        ponders (int): Ponders finished or cancelled.
+        hits (int): CPU moves answered from a ponder.
+        misses (int): CPU moves that had to be searched although a ponder had run.
+        searched (int): Replies answered by the ponders.
+        nodes (int): Positions visited by the ponders.
+    """
+
+    def __init__(self):
+        """
+        Create empty totals.
+        """
+        self._lock = threading.Lock()
+        self.ponders = 0
+        self.hits = 0
+        self.misses = 0
+        self.searched = 0
+        self.nodes = 0
+
+    def add(self, ponder, hit):
+        """
+        Count a ponder once the human has moved.
+
+        Args:
+            ponder (Ponder): The ponder, cancelled.
+            hit (bool): Whether it answered the human's move.
+        """
+        with self._lock:
+            self.ponders += 1
+            self.hits += hit
+            self.misses += not hit
+            self.searched += ponder.searched
+            self.nodes += ponder.nodes
+
+    def as_dict(self):
+        """
+        Get the totals and the hit rate.
+
+        Returns:
+            dict: The counters and the share of ponders that answered the human's move.
+        """
+        with self._lock:
+            return {
+                'ponders': self.ponders,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / self.ponders, 4) if self.ponders else 0.0,
+                'searched': self.searched,
+                'nodes': self.nodes,
+            }
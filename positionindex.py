@@ -0,0 +1,455 @@
+"""
+Position index: how often each position occurred in a game collection,
+which moves were played from it and how those games ended.
+
+Usage:
+    python positionindex.py build GAMES.pdn [GAMES.pdn ...] --output FILE [--chunk-records N]
+    python positionindex.py show FILE
+
+``build`` replays every game of the PDN files (see ``pdn.py``) and counts,
+for each position and each move played from it, the games and their
+results. Counts are gathered in memory for up to N distinct (position, move)
+pairs at a time, each full chunk is written sorted to a temporary file, and
+the chunks are then merged, at most ``MERGE_WIDTH`` files at a time, so
+building needs memory for one chunk however large the collection is.
+``PositionIndex`` memory-maps the result and looks a position up with a
+binary search over its key column.
+
+Positions are indexed as the web app plays them. PDN games start with Black
+to move from Black's side of the board, and this game's start with Red to
+move from Red's, so each game is replayed turned half a turn, square ``s``
+becoming square ``31 - s``, with the sides swapped: a PDN game won by Black
+is counted as a win for Red, who moved first in it.
+
+File layout (little endian): a header of magic, version and record count,
+then the record keys sorted, then the records in the same order. A key is a
+position's Zobrist key; a record is the move as ``(start square << 5) | end
+square``, ``END`` for games that ended in the position, and the games, Red
+wins, Black wins and draws counted for it.
+"""
+import argparse
+import bisect
+import heapq
+import json
+import mmap
+import os
+import shutil
+import struct
+import sys
+import tempfile
+
+from bitboard import OPPONENT
+from book import move_code, unique_move_codes
+from checkers import CheckersBoard
+from pdn import WINNERS, parse_squares, read_games, resolve_move
+
+MAGIC = b'CKIX'
+VERSION = 2
+HEADER = struct.Struct('<4sHxxQ')
+KEY = struct.Struct('<Q')
+RECORD = struct.Struct('<HIIII')
+# A chunk record is a key and a record
+CHUNK_RECORD = struct.Struct('<QHIIII')
+
+# The move code of games that ended in the position
+END = 0
+DEFAULT_CHUNK_RECORDS = 1 << 18
+# The most chunk files merged at once, well under the usual limit on open files
+MERGE_WIDTH = 64
+DEFAULT_MIN_GAMES = 20
+COUNTS = ('games', 'red_wins', 'black_wins', 'draws')
+OUTCOMES = {'R': (1, 1, 0, 0), 'B': (1, 0, 1, 0), None: (1, 0, 0, 1)}
+UNKNOWN = (1, 0, 0, 0)
+
+_indexes = {}
+
+
+def _turn_plane(plane):
+    """
+    Turn a bit plane of squares half a turn.
+
+    Args:
+        plane (int): The squares, as a 32-bit mask.
+
+    Returns:
+        int: The mask with square ``s`` moved to ``31 - s``.
+    """
+    return int(f'{plane:032b}'[::-1], 2)
+
+
+def turned_board(board):
+    """
+    Turn a position half a turn and swap the sides, so a PDN position reads as
+    the web app would reach it.
+
+    Args:
+        board (CheckersBoard): The position, not in the middle of a multi-capture.
+
+    Returns:
+        CheckersBoard: A new board with each side's pieces on the other's turned squares.
+    """
+    men = {player: _turn_plane(board.men[OPPONENT[player]]) for player in ('R', 'B')}
+    kings = {player: _turn_plane(board.kings[OPPONENT[player]]) for player in ('R', 'B')}
+    turned = CheckersBoard()
+    turned.set_pieces(men, kings)
+    turned.current_player = OPPONENT[board.current_player]
+    return turned
+
+
+def turned_move(text):
+    """
+    Number the squares of a PDN move as on the board turned half a turn.
+
+    Args:
+        text (str): The move, such as '11-15'.
+
+    Returns:
+        str: The move, such as '22-18'.
+
+    Raises:
+        ValueError: If a square is not numbered 1-32.
+    """
+    return '-'.join(str(32 - square) for square in parse_squares(text))
+
+
+def game_records(game):
+    """
+    List the positions of a game with the move played from each.
+
+    The game is replayed turned half a turn with the sides swapped (see
+    ``turned_board``). It stops at a move that is not legal under this
+    game's rules; the positions before it are still counted. A game whose
+    ``FEN`` tag is not a position yields nothing.
+
+    Args:
+        game (PDNGame): The game.
+
+    Yields:
+        tuple: (key, move code, outcome counts) per position, then ``END`` for the last one.
+    """
+    # The sides swap with the board, so PDN's winner is the other side here
+    outcome = OUTCOMES[OPPONENT.get(WINNERS[game.result])] if game.result in WINNERS else UNKNOWN
+    try:
+        board = turned_board(game.start_board())
+    except ValueError:
+        return
+    for text in game.moves:
+        try:
+            move = resolve_move(board, turned_move(text))
+        except ValueError:
+            return
+        yield board.zobrist_key(), move_code(move), outcome
+        board.move_piece(*move)
+    yield board.zobrist_key(), END, outcome
+
+
+def _write_chunk(counts, directory):
+    """
+    Write a chunk of counts sorted to a temporary file.
+
+    Args:
+        counts (dict): Counts keyed by (key, move code).
+        directory (str): Where to put the file.
+
+    Returns:
+        str: The file.
+    """
+    handle, path = tempfile.mkstemp(suffix='.chunk', dir=directory)
+    with os.fdopen(handle, 'wb') as output:
+        for (key, code), record in sorted(counts.items()):
+            output.write(CHUNK_RECORD.pack(key, code, *record))
+    return path
+
+
+def _read_chunk(path, block_records=4096):
+    """
+    Read a chunk file back in order, a block at a time.
+
+    Args:
+        path (str): The file.
+        block_records (int): Records read at once.
+
+    Yields:
+        tuple: (key, move code, games, Red wins, Black wins, draws).
+    """
+    with open(path, 'rb') as chunk:
+        while True:
+            block = chunk.read(block_records * CHUNK_RECORD.size)
+            if not block:
+                return
+            yield from CHUNK_RECORD.iter_unpack(block)
+
+
+def build_index(paths, output_path, chunk_records=DEFAULT_CHUNK_RECORDS, progress=None, merge_width=MERGE_WIDTH):
+    """
+    Build an index file from PDN game collections.
+
+    Args:
+        paths (list): The PDN files.
+        output_path (str): The index file to write.
+        chunk_records (int): The most distinct (position, move) pairs counted in memory at once.
+        progress (callable, optional): Called with the number of games read so far.
+        merge_width (int): The most chunk files merged at once.
+
+    Returns:
+        dict: Games read, games stopped at a move illegal here or a bad ``FEN`` tag,
+        chunks written and records in the index.
+    """
+    totals = {'games': 0, 'stopped': 0, 'chunks': 0, 'records': 0}
+    directory = tempfile.mkdtemp(prefix='positionindex-', dir=os.path.dirname(os.path.abspath(output_path)))
+    try:
+        chunks = []
+        counts = {}
+        for path in paths:
+            with open(path, encoding='utf-8', errors='replace') as stream:
+                for game in read_games(stream):
+                    plies = 0
+                    for key, code, outcome in game_records(game):
+                        record = counts.get((key, code))
+                        if record is None:
+                            counts[(key, code)] = list(outcome)
+                        else:
+                            for field, add in enumerate(outcome):
+                                record[field] += add
+                        plies += 1
+                    totals['games'] += 1
+                    totals['stopped'] += plies <= len(game.moves)
+                    if len(counts) >= chunk_records:
+                        chunks.append(_write_chunk(counts, directory))
+                        counts = {}
+                    if progress is not None and totals['games'] % 10000 == 0:
+                        progress(totals['games'])
+        if counts:
+            chunks.append(_write_chunk(counts, directory))
+        totals['chunks'] = len(chunks)
+        totals['records'] = _merge_chunks(chunks, output_path, directory, merge_width)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    return totals
+
+
+def _sum_records(chunks):
+    """
+    Merge sorted chunk files, adding up the counts of equal (key, move code) pairs.
+
+    Args:
+        chunks (list): The chunk files, all open at once.
+
+    Yields:
+        list: (key, move code, games, Red wins, Black wins, draws), in order.
+    """
+    pending = None
+    for record in heapq.merge(*(_read_chunk(path) for path in chunks)):
+        if pending is not None and record[:2] == tuple(pending[:2]):
+            for field in range(2, len(record)):
+                pending[field] += record[field]
+            continue
+        if pending is not None:
+            yield pending
+        pending = list(record)
+    if pending is not None:
+        yield pending
+
+
+def _merge_chunks(chunks, output_path, directory, merge_width=MERGE_WIDTH):
+    """
+    Merge sorted chunk files into an index file, adding up the counts of equal pairs.
+
+    At most ``merge_width`` chunks are open at once: while there are more,
+    groups of them are merged into intermediate chunks. The keys go straight
+    to the index file and the records to a temporary file appended after
+    them, so the merge runs in constant memory.
+
+    Args:
+        chunks (list): The chunk files.
+        output_path (str): The index file to write.
+        directory (str): Where to put the intermediate and temporary files.
+        merge_width (int): The most chunks merged at once, at least two.
+
+    Returns:
+        int: The number of records written.
+    """
+    merge_width = max(merge_width, 2)
+    while len(chunks) > merge_width:
+        merged = []
+        for first in range(0, len(chunks), merge_width):
+            group = chunks[first:first + merge_width]
+            handle, path = tempfile.mkstemp(suffix='.chunk', dir=directory)
+            with os.fdopen(handle, 'wb') as output:
+                for record in _sum_records(group):
+                    output.write(CHUNK_RECORD.pack(*record))
+            for chunk in group:
+                os.remove(chunk)
+            merged.append(path)
+        chunks = merged
+
+    count = 0
+    records_path = os.path.join(directory, 'records')
+    with open(output_path, 'wb') as output, open(records_path, 'wb') as records:
+        output.write(HEADER.pack(MAGIC, VERSION, 0))
+        for record in _sum_records(chunks):
+            output.write(KEY.pack(record[0]))
+            records.write(RECORD.pack(*record[1:]))
+            count += 1
+        records.close()
+        with open(records_path, 'rb') as records:
+            shutil.copyfileobj(records, output)
+        output.seek(0)
+        output.write(HEADER.pack(MAGIC, VERSION, count))
+    return count
+
+
+class PositionIndex:
+    """
+    Looks positions up in an index file through a read-only memory map.
+
+    The key column is searched in place as 64-bit integers of this machine's
+    byte order, so the index is read on little-endian machines.
+
+    Attributes:
+        path (str): The index file.
+        count (int): The number of records.
+        probes (int): Positions looked up.
+        hits (int): Lookups that found the position.
+    """
+
+    def __init__(self, path):
+        """
+        Open an index file.
+
+        Args:
+            path (str): The index file.
+
+        Raises:
+            ValueError: If the file is not an index of this version.
+        """
+        self.path = path
+        with open(path, 'rb') as index_file:
+            self._data = mmap.mmap(index_file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.count = HEADER.unpack_from(self._data, 0)
+        if magic != MAGIC or version != VERSION:
+            self._data.close()
+            raise ValueError(f"{path} is not a version {VERSION} position index")
+        self._records = HEADER.size + self.count * KEY.size
+        self._keys = memoryview(self._data)[HEADER.size:self._records].cast('Q')
+        self.probes = 0
+        self.hits = 0
+
+    def lookup(self, board):
+        """
+        Get the counts of a position and of each move played from it.
+
+        Moves that are not legal in the position (after a hash collision) are
+        left out, and so are capture paths that share their move code with another.
+
+        Args:
+            board (CheckersBoard): The position.
+
+        Returns:
+            dict: 'games', 'red_wins', 'black_wins' and 'draws' over all games that
+            reached the position, and 'moves', the same counts and the 'move' for
+            each move played, most played first. All zero if the position is not indexed.
+        """
+        self.probes += 1
+        key = board.zobrist_key()
+        number = bisect.bisect_left(self._keys, key)
+        totals = [0, 0, 0, 0]
+        legal = None
+        moves = []
+        while number < self.count and self._keys[number] == key:
+            code, *counts = RECORD.unpack_from(self._data, self._records + number * RECORD.size)
+            number += 1
+            if code != END:
+                if legal is None:
+                    legal = unique_move_codes(board.get_possible_moves(board.current_player))
+                if code not in legal:
+                    continue
+                moves.append(dict(zip(COUNTS, counts), move=legal[code]))
+            for field, value in enumerate(counts):
+                totals[field] += value
+        if totals[0]:
+            self.hits += 1
+        moves.sort(key=lambda entry: entry['games'], reverse=True)
+        return dict(zip(COUNTS, totals), moves=moves)
+
+    def choose(self, board, min_games=DEFAULT_MIN_GAMES):
+        """
+        Pick the move that scored best for the side to move in the indexed games.
+
+        A win counts one and a draw a half; only moves played in at least
+        ``min_games`` games are considered.
+
+        Args:
+            board (CheckersBoard): The position.
+            min_games (int): The fewest games a move needs.
+
+        Returns:
+            tuple: The move, or None if no move was played often enough.
+        """
+        wins = 'red_wins' if board.current_player == 'R' else 'black_wins'
+        best, best_score = None, None
+        for entry in self.lookup(board)['moves']:
+            if entry['games'] < min_games:
+                continue
+            score = (entry[wins] + entry['draws'] / 2) / entry['games']
+            if best_score is None or score > best_score:
+                best, best_score = entry['move'], score
+        return best
+
+    def close(self):
+        """
+        Unmap the file.
+        """
+        self._keys.release()
+        self._data.close()
+
+
+def open_index(path):
+    """
+    Open an index, reusing this process's reader of the same file.
+
+    Args:
+        path (str): The index file.
+
+    Returns:
+        PositionIndex: The reader.
+    """
+    index = _indexes.get(path)
+    if index is None:
+        index = _indexes[path] = PositionIndex(path)
+    return index
+
+
+def main(argv=None):
+    """
+    Run the position index command line.
+
+    Returns:
+        int: The exit status.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+    sub = commands.add_parser('build')
+    sub.add_argument('paths', nargs='+')
+    sub.add_argument('--output', required=True)
+    sub.add_argument('--chunk-records', type=int, default=DEFAULT_CHUNK_RECORDS)
+    sub = commands.add_parser('show')
+    sub.add_argument('path')
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        totals = build_index(args.paths, args.output, args.chunk_records,
+                             progress=lambda games: print('games', games, file=sys.stderr))
+        print(json.dumps(totals))
+        return 0
+
+    index = PositionIndex(args.path)
+    stats = index.lookup(CheckersBoard())
+    print(f"{args.path}: {index.count} records, {stats['games']} games from the initial position")
+    for entry in stats['moves']:
+        print(entry['move'], {name: entry[name] for name in COUNTS})
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
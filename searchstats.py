@@ -0,0 +1,178 @@
+"""
+Statistics of the CPU player's search, for finding out where search time goes.
+
+``CPUPlayer.choose_move(..., with_stats=True)`` fills a ``SearchStats`` for
+that move. The web app adds each one to a ``SearchStatsTotals`` and reports
+the totals from ``/stats``.
+"""
+import threading
+
+
+class SearchStats:
+    """
+    What one ``choose_move`` call searched.
+
+    Nodes searched by parallel workers count towards ``nodes`` only.
+
+    Attributes:
+        nodes (int): Positions visited.
+        leaves (int): Positions scored without searching further: by evaluation,
+            as a finished game or from the endgame tablebase.
+        expanded (int): Positions whose moves were searched.
+        children (int): Moves searched from expanded positions.
+        beta_cutoffs (int): Expanded positions cut off before all moves were searched.
+        first_move_cutoffs (int): Cutoffs caused by the first move searched.
+        tt_probes (int): Transposition table lookups.
+        tt_hits (int): Lookups that found the position.
+        book_move (bool): Whether the move came from the opening book.
+        index_move (bool): Whether the move came from the position index.
+        iterations (list): Per completed depth: depth, nodes, milliseconds, score and move.
+        seconds (float): Wall-clock time of the whole call.
+    """
+
+    def __init__(self):
+        """
+        Create empty statistics.
+        """
+        self.nodes = 0
+        self.leaves = 0
+        self.expanded = 0
+        self.children = 0
+        self.beta_cutoffs = 0
+        self.first_move_cutoffs = 0
+        self.tt_probes = 0
+        self.tt_hits = 0
+        self.book_move = False
+        self.index_move = False
+        self.iterations = []
+        self.seconds = 0.0
+
+    def add_iteration(self, depth, nodes, seconds, score, move):
+        """
+        Record a completed search depth.
+
+        Args:
+            depth (int): The depth searched.
+            nodes (int): Nodes visited at this depth.
+            seconds (float): Time taken by this depth.
+            score (float): The score found.
+            move (tuple): The best move found.
+        """
+        self.iterations.append({
+            'depth': depth,
+            'nodes': nodes,
+            'ms': round(seconds * 1000.0, 3),
+            'score': score,
+            'move': move,
+        })
+
+    @property
+    def first_move_cutoff_rate(self):
+        """
+        float: Share of cutoffs caused by the first move; high when move ordering works.
+        """
+        return self.first_move_cutoffs / self.beta_cutoffs if self.beta_cutoffs else 0.0
+
+    @property
+    def branching_factor(self):
+        """
+        float: Average number of moves searched per expanded position.
+        """
+        return self.children / self.expanded if self.expanded else 0.0
+
+    @property
+    def effective_branching_factor(self):
+        """
+        float: Growth in nodes from the second-to-last to the last completed depth.
+        """
+        if len(self.iterations) < 2 or not self.iterations[-2]['nodes']:
+            return 0.0
+        return self.iterations[-1]['nodes'] / self.iterations[-2]['nodes']
+
+    def as_dict(self):
+        """
+        Get the statistics as plain data, for logging or JSON.
+
+        Returns:
+            dict: The counters, rates and iterations.
+        """
+        return {
+            'nodes': self.nodes,
+            'leaves': self.leaves,
+            'beta_cutoffs': self.beta_cutoffs,
+            'first_move_cutoff_rate': round(self.first_move_cutoff_rate, 4),
+            'branching_factor': round(self.branching_factor, 3),
+            'effective_branching_factor': round(self.effective_branching_factor, 3),
+            'tt_probes': self.tt_probes,
+            'tt_hits': self.tt_hits,
+            'book_move': self.book_move,
+            'index_move': self.index_move,
+            'depth': self.iterations[-1]['depth'] if self.iterations else 0,
+            'iterations': self.iterations,
+            'ms': round(self.seconds * 1000.0, 3),
+        }
+
+
+class SearchStatsTotals:
+    """
+    Thread-safe running totals over many searches.
+    """
+
+    COUNTERS = ('nodes', 'leaves', 'expanded', 'children', 'beta_cutoffs', 'first_move_cutoffs',
+                'tt_probes', 'tt_hits')
+
+    def __init__(self):
+        """
+        Create empty totals.
+        """
+        self._lock = threading.Lock()
+        self.searches = 0
+        self.book_moves = 0
+        self.index_moves = 0
+        self.seconds = 0.0
+        self.depth = 0
+        self.totals = dict.fromkeys(self.COUNTERS, 0)
+
+    def add(self, stats):
+        """
+        Add one search's statistics.
+
+        Args:
+            stats (SearchStats): The search.
+        """
+        with self._lock:
+            self.searches += 1
+            self.book_moves += stats.book_move
+            self.index_moves += stats.index_move
+            self.seconds += stats.seconds
+            self.depth += stats.iterations[-1]['depth'] if stats.iterations else 0
+            for name in self.COUNTERS:
+                self.totals[name] += getattr(stats, name)
+
+    def as_dict(self):
+        """
+        Get the totals and per-search averages.
+
+        Returns:
+            dict: Search count, summed counters, average depth, time and rates.
+        """
+        with self._lock:
+            totals = self.totals
+            searches = self.searches
+            return {
+                'searches': searches,
+                'book_moves': self.book_moves,
+                'index_moves': self.index_moves,
+                'nodes': totals['nodes'],
+                'leaves': totals['leaves'],
+                'beta_cutoffs': totals['beta_cutoffs'],
+                'tt_probes': totals['tt_probes'],
+                'tt_hits': totals['tt_hits'],
+                'first_move_cutoff_rate': round(totals['first_move_cutoffs'] / totals['beta_cutoffs'], 4)
+                if totals['beta_cutoffs'] else 0.0,
+                'branching_factor': round(totals['children'] / totals['expanded'], 3)
+                if totals['expanded'] else 0.0,
+                'average_depth': round(self.depth / searches, 2) if searches else 0.0,
+                'average_ms': round(self.seconds / searches * 1000.0, 3) if searches else 0.0,
+                'nodes_per_second': round(totals['nodes'] / self.seconds) if self.seconds else 0,
+            }
@@ -0,0 +1,188 @@
+"""
+Headless CPU-vs-CPU games, for comparing engine settings before deploying them.
+
+Usage:
+    python selfplay.py [--games N] [--workers W] [--red-depth D | --red-time-ms T]
+                       [--black-depth D | --black-time-ms T] [--red-weights FILE]
+                       [--black-weights FILE] [--opening-plies P]
+                       [--max-plies M] [--seed S] [--output FILE]
+
+Games are played across a process pool. Each game starts with a few random
+plies so the games differ, then both sides play ``CPUPlayer.choose_move``
+with their own depth or time budget and, to compare evaluations, their own
+weights file (see ``tuning.py``). One JSON line is written per finished
+game as soon as it ends, and a summary with win rates and throughput is
+printed to stderr at the end.
+"""
+import argparse
+import json
+import multiprocessing
+import random
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from checkers import CheckersBoard
+from cpu import CPUPlayer
+from evaluation import DEFAULT_TABLES, load_tables
+from transposition import TranspositionTable
+
+DEFAULT_DEPTH = 3
+DEFAULT_OPENING_PLIES = 4
+# Games reaching this many plies without a winner are scored as draws
+DEFAULT_MAX_PLIES = 200
+# Transposition table entries of each side, per game
+TT_ENTRIES = 1 << 16
+
+
+def play_game(game_id, sides, opening_plies=DEFAULT_OPENING_PLIES, max_plies=DEFAULT_MAX_PLIES, seed=None):
+    """
+    Play one CPU-vs-CPU game.
+
+    Args:
+        game_id (int): The number of the game, reported back.
+        sides (dict): Search settings per color, ``{'R': {'depth': 3, 'time_ms': None}, ...}``.
+            A side with a ``time_ms`` searches with that budget, otherwise to its depth,
+            and a side with a ``weights`` file evaluates with the tables in it.
+        opening_plies (int): Number of random plies played before the CPU players take over.
+        max_plies (int): Plies after which the game is a draw.
+        seed (int): Seeds the random opening.
+
+    Returns:
+        dict: The game record: moves, result ('R', 'B' or 'draw'), plies, nodes and
+        milliseconds per CPU move.
+    """
+    rng = random.Random(seed)
+    board = CheckersBoard()
+    tables = {color: TranspositionTable(TT_ENTRIES) for color in ('R', 'B')}
+    evaluations = {color: load_tables(settings['weights']) if settings.get('weights') else DEFAULT_TABLES
+                   for color, settings in sides.items()}
+    moves = []
+    nodes = []
+    move_ms = []
+    start = time.perf_counter()
+    while not board.is_game_over() and len(moves) < max_plies:
+        color = board.current_player
+        if len(moves) < opening_plies:
+            move = rng.choice(board.get_possible_moves(color))
+        else:
+            settings = sides[color]
+            cpu_player = CPUPlayer(board, color, tables[color], tables=evaluations[color])
+            move_start = time.perf_counter()
+            move = cpu_player.choose_move(depth=settings.get('depth') or DEFAULT_DEPTH,
+                                          time_budget_ms=settings.get('time_ms'))
+            move_ms.append(round((time.perf_counter() - move_start) * 1000.0, 3))
+            nodes.append(cpu_player.nodes)
+        board.move_piece(*move)
+        moves.append([list(position) for position in move])
+    return {
+        'game': game_id,
+        'seed': seed,
+        'result': board.winner() if board.is_game_over() else 'draw',
+        'plies': len(moves),
+        'moves': moves,
+        'nodes': nodes,
+        'move_ms': move_ms,
+        'seconds': round(time.perf_counter() - start, 3),
+    }
+
+
+def run(games, sides, output, workers=1, opening_plies=DEFAULT_OPENING_PLIES,
+        max_plies=DEFAULT_MAX_PLIES, seed=0):
+    """
+    Play many games and stream their records as JSON lines.
+
+    At most two games per worker are in flight, so memory does not grow with
+    the number of games.
+
+    Args:
+        games (int): The number of games.
+        sides (dict): Search settings per color; see ``play_game``.
+        output (file): Receives one JSON line per finished game, in finishing order.
+        workers (int): Worker processes; 1 plays the games in this process.
+        opening_plies (int): Random plies at the start of each game.
+        max_plies (int): Plies after which a game is a draw.
+        seed (int): Game i uses seed ``seed + i``.
+
+    Returns:
+        dict: Win rates per color, draw rate, throughput in games per second,
+        and average plies and nodes per game.
+    """
+    summary = {'games': 0, 'R': 0, 'B': 0, 'draw': 0, 'plies': 0, 'nodes': 0}
+    start = time.perf_counter()
+
+    def record(game):
+        output.write(json.dumps(game) + '\n')
+        output.flush()
+        summary['games'] += 1
+        summary[game['result']] += 1
+        summary['plies'] += game['plies']
+        summary['nodes'] += sum(game['nodes'])
+
+    if workers <= 1:
+        for game_id in range(games):
+            record(play_game(game_id, sides, opening_plies, max_plies, seed + game_id))
+    else:
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            pending = set()
+            for game_id in range(games):
+                if len(pending) >= 2 * workers:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        record(future.result())
+                pending.add(pool.submit(play_game, game_id, sides, opening_plies, max_plies, seed + game_id))
+            for future in wait(pending).done:
+                record(future.result())
+
+    seconds = time.perf_counter() - start
+    played = summary['games'] or 1
+    return {
+        'games': summary['games'],
+        'red_win_rate': round(summary['R'] / played, 4),
+        'black_win_rate': round(summary['B'] / played, 4),
+        'draw_rate': round(summary['draw'] / played, 4),
+        'seconds': round(seconds, 3),
+        'games_per_second': round(summary['games'] / seconds, 3) if seconds else None,
+        'average_plies': round(summary['plies'] / played, 1),
+        'average_nodes': round(summary['nodes'] / played),
+    }
+
+
+def main(argv=None):
+    """
+    Run the self-play command line.
+
+    Returns:
+        int: The exit status.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--games', type=int, default=100)
+    parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count())
+    for color in ('red', 'black'):
+        parser.add_argument(f'--{color}-depth', type=int, default=DEFAULT_DEPTH)
+        parser.add_argument(f'--{color}-time-ms', type=float)
+        parser.add_argument(f'--{color}-weights')
+    parser.add_argument('--opening-plies', type=int, default=DEFAULT_OPENING_PLIES)
+    parser.add_argument('--max-plies', type=int, default=DEFAULT_MAX_PLIES)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output')
+    args = parser.parse_args(argv)
+
+    sides = {
+        'R': {'depth': args.red_depth, 'time_ms': args.red_time_ms, 'weights': args.red_weights},
+        'B': {'depth': args.black_depth, 'time_ms': args.black_time_ms, 'weights': args.black_weights},
+    }
+    output = open(args.output, 'w') if args.output else sys.stdout
+    try:
+        summary = run(args.games, sides, output, args.workers, args.opening_plies, args.max_plies, args.seed)
+    finally:
+        if args.output:
+            output.close()
+    json.dump(summary, sys.stderr, indent=2)
+    print(file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
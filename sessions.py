@@ -0,0 +1,286 @@
+"""
+In-memory store of per-session games for the web app, optionally backed by
+move logs on disk (see ``journal.py``).
+"""
+import secrets
+import threading
+import time
+from collections import OrderedDict, deque
+
+from checkers import CheckersBoard
+from transposition import TranspositionTable
+from wire import pack_board
+
+# Earlier board versions kept per session, to send clients deltas from
+SNAPSHOTS = 8
+
+
+class GameSession:
+    """
+    The state of one player's game.
+
+    Attributes:
+        session_id (str): The id the client sends back to find this game.
+        board (CheckersBoard): The game board.
+        transposition_table (TranspositionTable): The CPU player's search results for this game.
+        lock (threading.Lock): Held while a request reads or changes the game.
+        last_access (float): Clock time of the last request for this game.
+        cpu_pending (bool): True while the CPU player's turn is being played in the background.
+        generation (int): Counts the games started in this session, so a background
+            turn of an earlier game is not played on a new one.
+        version (int): Counts the changes to the board, so clients can tell whether they
+            are in sync.
+        snapshots (collections.deque): (version, packed board) of the latest versions.
+        cpu_moves (list): The CPU player's last turn, as [start, end] square pairs.
+        ponder (Ponder): The search of the human's replies running since the CPU's last
+            move, or None.
+        journal (GameJournal): The move logs the game is written to, or None.
+        restored (bool): True from restoring the game from its log until the app has
+            picked up where it left off.
+    """
+
+    def __init__(self, session_id, tt_entries=1 << 16, now=0.0, board=None, version=0, journal=None):
+        """
+        Create a session with a new game, or a game restored from its log.
+
+        Args:
+            session_id (str): The id of the session.
+            tt_entries (int): Size of the CPU player's transposition table.
+            now (float): The current clock time.
+            board (CheckersBoard, optional): The restored game; a new game if omitted.
+            version (int): The restored board's version.
+            journal (GameJournal, optional): The move logs to write the game to.
+        """
+        self.session_id = session_id
+        self.board = board if board is not None else CheckersBoard()
+        self.transposition_table = TranspositionTable(tt_entries)
+        self.lock = threading.Lock()
+        self.last_access = now
+        self.cpu_pending = False
+        self.generation = 0
+        self.version = version
+        self.snapshots = deque([(version, pack_board(self.board))], maxlen=SNAPSHOTS)
+        self.cpu_moves = []
+        self.ponder = None
+        self.journal = journal
+        self.restored = board is not None
+
+    def reset(self):
+        """
+        Start a new game in this session, discarding the CPU player's search results
+        and any CPU turn still waiting to be played, and stopping any ponder.
+        """
+        if self.ponder is not None:
+            self.ponder.cancel()
+            self.ponder = None
+        self.board = CheckersBoard()
+        self.transposition_table.clear()
+        self.cpu_pending = False
+        self.generation += 1
+        self.cpu_moves = []
+        self.record_version()
+
+    def record_version(self, move=None):
+        """
+        Start a new board version after the board changed, and log the change.
+
+        Args:
+            move (list, optional): The positions of the move played; a change
+                without one, such as a new game, is logged as a snapshot.
+
+        Returns:
+            int: The new version.
+        """
+        self.version += 1
+        self.snapshots.append((self.version, pack_board(self.board)))
+        if self.journal is not None:
+            if move is None:
+                self.journal.record_snapshot(self)
+            else:
+                self.journal.record_move(self, move)
+        return self.version
+
+    def packed_board(self, version=None):
+        """
+        Get a kept version of the board.
+
+        Args:
+            version (int, optional): The version; defaults to the current one.
+
+        Returns:
+            str: The packed board, or None if that version is no longer kept.
+        """
+        if version is None:
+            version = self.version
+        for snapshot_version, squares in reversed(self.snapshots):
+            if snapshot_version == version:
+                return squares
+        return None
+
+
+class GameStore:
+    """
+    A bounded, thread-safe map from session id to GameSession.
+
+    Sessions are kept in least-recently-used order. A session idle for longer
+    than the TTL is dropped, and once the store is full the least recently
+    used session makes room for a new one. The store lives in process memory,
+    so requests of one session must reach the same process.
+
+    With a journal, every game is also logged to disk. A session that is not
+    in memory, because it was evicted or the server restarted, is restored
+    from its log when it is next asked for; an expired session's log is
+    deleted, and an evicted one's is left to the journal's own expiry.
+
+    Attributes:
+        max_games (int): The maximum number of live sessions.
+        idle_ttl (float): Seconds of inactivity after which a session expires.
+        hits (int): Lookups that found a live session.
+        misses (int): Lookups for an unknown or expired session.
+        evictions (int): Sessions dropped because the store was full.
+        expirations (int): Sessions dropped after being idle for too long.
+        restorations (int): Sessions restored from the journal.
+    """
+
+    def __init__(self, max_games=1000, idle_ttl=3600.0, tt_entries=1 << 16, clock=time.monotonic, journal=None):
+        """
+        Create an empty store.
+
+        Args:
+            max_games (int): The maximum number of live sessions.
+            idle_ttl (float): Seconds of inactivity after which a session expires.
+            tt_entries (int): Size of each session's transposition table.
+            clock (callable): Returns the current time in seconds.
+            journal (GameJournal, optional): Move logs to write games to and restore them from.
+        """
+        self.max_games = max_games
+        self.idle_ttl = idle_ttl
+        self.tt_entries = tt_entries
+        self.clock = clock
+        self.journal = journal
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.restorations = 0
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def _expire(self, now):
+        """
+        Drop idle sessions. Must be called with the store lock held.
+
+        Args:
+            now (float): The current clock time.
+        """
+        sessions = self._sessions
+        while sessions:
+            session = next(iter(sessions.values()))
+            if now - session.last_access < self.idle_ttl:
+                break
+            sessions.popitem(last=False)
+            self.expirations += 1
+            if self.journal is not None:
+                self.journal.delete(session.session_id)
+
+    def get(self, session_id):
+        """
+        Find a live session and mark it as recently used, restoring it from the
+        journal if it is not in memory.
+
+        Args:
+            session_id (str): The id of the session, or None.
+
+        Returns:
+            GameSession: The session, or None if it is unknown or expired.
+        """
+        with self._lock:
+            now = self.clock()
+            self._expire(now)
+            session = self._sessions.get(session_id) if session_id else None
+            if session is not None:
+                self.hits += 1
+                session.last_access = now
+                self._sessions.move_to_end(session_id)
+                return session
+            if self.journal is None or not session_id:
+                self.misses += 1
+                return None
+
+        # The log is read without holding the store's lock
+        restored = self.journal.restore(session_id)
+        with self._lock:
+            if restored is None:
+                self.misses += 1
+                return None
+            session = self._sessions.get(session_id)
+            if session is None:
+                board, version = restored
+                session = GameSession(session_id, self.tt_entries, now, board, version, self.journal)
+                self._make_room()
+                self._sessions[session_id] = session
+                self.restorations += 1
+            session.last_access = self.clock()
+            self._sessions.move_to_end(session_id)
+            return session
+
+    def _make_room(self):
+        """
+        Evict least recently used sessions until one more fits. Must be called
+        with the store lock held.
+        """
+        while len(self._sessions) >= self.max_games:
+            session_id, _ = self._sessions.popitem(last=False)
+            self.evictions += 1
+            if self.journal is not None:
+                self.journal.release(session_id)
+
+    def create(self):
+        """
+        Start a session with a new game under a fresh id, evicting the least
+        recently used session if the store is full.
+
+        Returns:
+            GameSession: The new session.
+        """
+        with self._lock:
+            now = self.clock()
+            self._expire(now)
+            self._make_room()
+            session_id = secrets.token_urlsafe(16)
+            session = GameSession(session_id, self.tt_entries, now, journal=self.journal)
+            self._sessions[session_id] = session
+            return session
+
+    def get_or_create(self, session_id):
+        """
+        Find a live session, or start a new one if there is none.
+
+        Args:
+            session_id (str): The id sent by the client, or None.
+
+        Returns:
+            GameSession: The existing or new session.
+        """
+        return self.get(session_id) or self.create()
+
+    def stats(self):
+        """
+        Get the store's counters, for sizing it against the player load.
+
+        Returns:
+            dict: Live sessions, capacity and hit/miss/eviction/expiration/restoration counts.
+        """
+        with self._lock:
+            return {
+                'live': len(self._sessions),
+                'max_games': self.max_games,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'restorations': self.restorations,
+            }
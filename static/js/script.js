@@ -1,19 +1,21 @@
 document.addEventListener("DOMContentLoaded", function() {
     let selectedPiece = null;
-    let currentPlayer = localStorage.getItem('currentPlayer') || 'R';
-    loadBoard();
+    let boardElement = document.getElementById("board");
+    // The board as 32 characters, one per playable square (see wire.py), and its server version
+    let squares = boardElement.dataset.squares;
+    let version = parseInt(boardElement.dataset.version, 10);
+    let currentPlayer = boardElement.dataset.currentPlayer;
+    drawSquares(squares);
 
-    document.getElementById("board").addEventListener("click", function(event) {
+    boardElement.addEventListener("click", function(event) {
         if (currentPlayer !== 'R') {  // Prevent moves during CPU's turn
             return;
         }
 
         let clickedElement = event.target;
-        console.log(clickedElement, currentPlayer, clickedElement.classList.contains("piece"), clickedElement.classList, clickedElement.classList.contains(currentPlayer))
 
         if (clickedElement.classList.contains("piece") && (clickedElement.classList.contains(currentPlayer) || clickedElement.classList.contains(`${currentPlayer}Q`))) {
             selectedPiece = clickedElement;
-            console.log(selectedPiece)
         } else if (selectedPiece && clickedElement.classList.contains("cell")) {
             let startX = parseInt(selectedPiece.parentElement.dataset.x, 10);
             let startY = parseInt(selectedPiece.parentElement.dataset.y, 10);
@@ -25,58 +27,82 @@ document.addEventListener("DOMContentLoaded", function() {
                 headers: {
                     'Content-Type': 'application/json',
                 },
-                body: JSON.stringify({ start: [startX, startY], end: [endX, endY] }),
+                body: JSON.stringify({ start: [startX, startY], end: [endX, endY], version: version }),
             })
             .then(response => response.json())
             .then(data => {
-                if (data.game_over) {
-                    let message = `Game Over. ${data.winner === 'R' ? 'Red' : 'Black'} wins!`;
-                    alert(message);
-                } else if (data.valid) {
-                    updateBoard(data.board);
-                    currentPlayer = data.current_player;
-                    localStorage.setItem('currentPlayer', currentPlayer);
-                } else if (data.mandatory_capture) {
-                    alert("A capture is available and mandatory. You must make a capture move.");
-                }
+                showState(data);
                 selectedPiece = null;
             });
         }
     });
 
-    function saveBoard() {
-        let board = [];
-        let cells = document.querySelectorAll('.cell');
-        cells.forEach(cell => {
-            let piece = cell.querySelector('.piece');
-            board.push(piece ? piece.className.split(' ')[1] : ' ');
-        });
-        localStorage.setItem('board', JSON.stringify(board));
+    function showState(data) {
+        updateSquares(data);
+        if (data.game_over) {
+            let message = `Game Over. ${data.winner === 'R' ? 'Red' : 'Black'} wins!`;
+            alert(message);
+        } else if (data.valid) {
+            currentPlayer = data.current_player;
+            if (data.cpu_pending) {
+                pollState();  // The CPU's reply is played in the background
+            }
+        } else if (data.mandatory_capture) {
+            alert("A capture is available and mandatory. You must make a capture move.");
+        }
+    }
+
+    function pollState() {
+        setTimeout(() => {
+            fetch(`/state?version=${version}`)
+            .then(response => response.json())
+            .then(data => {
+                if (data.cpu_pending && data.version === undefined) {
+                    pollState();
+                } else {
+                    showState(data);
+                }
+            });
+        }, 100);
     }
 
-    function loadBoard() {
-        let board = JSON.parse(localStorage.getItem('board'));
-        if (board && board.length === 64) {
-            updateBoard(board);
+    function updateSquares(data) {
+        if (data.version === undefined) {
+            return;
+        }
+        if (data.squares) {
+            squares = data.squares;  // Our version was too old for a delta: resync
+            drawSquares(squares);
+        } else if (data.delta) {
+            let cells = squares.split('');
+            data.delta.forEach(([square, code]) => {
+                cells[square] = code;
+                drawSquare(square, code);
+            });
+            squares = cells.join('');
         }
+        version = data.version;
     }
 
-    function updateBoard(newBoard) {
-        let cells = document.querySelectorAll('.cell');
-        cells.forEach((cell, index) => {
-            let row = Math.floor(index / 8);
-            let col = index % 8;
-            let className = newBoard[row][col] === ' ' ? '' : 'piece ' + newBoard[row][col];
-            if (newBoard[row][col].includes('Q')) {
-                className += ' queen';
-            }
-            cell.innerHTML = className ? `<div class="${className}"></div>` : '';
-        });
+    function drawSquares(newSquares) {
+        for (let square = 0; square < 32; square++) {
+            drawSquare(square, newSquares[square]);
+        }
+    }
+
+    function drawSquare(square, code) {
+        let row = square >> 2;
+        let col = ((square & 3) << 1) + (1 - (row & 1));
+        let cell = document.querySelector(`.cell[data-x="${row}"][data-y="${col}"]`);
+        let piece = {'r': 'R', 'R': 'RQ', 'b': 'B', 'B': 'BQ'}[code];
+        let className = piece ? 'piece ' + piece : '';
+        if (code === 'R' || code === 'B') {
+            className += ' queen';
+        }
+        cell.innerHTML = className ? `<div class="${className}"></div>` : '';
     }
 
     window.resetGame = function() {
-        localStorage.removeItem('board');
-        localStorage.removeItem('currentPlayer');
         fetch('/reset').then(() => {
             window.location.reload();
         });
@@ -0,0 +1,481 @@
+"""
+Endgame tablebases: the game-theoretic value of every position with few pieces.
+
+Usage:
+    python tablebase.py build --pieces N --output FILE
+    python tablebase.py info FILE
+
+``build`` solves every position with up to N pieces by retrograde analysis
+under the rules of ``CheckersBoard`` and writes the results to FILE.
+``TablebaseReader`` memory-maps such a file, so opening it costs nothing,
+a probe is a single byte read, and processes sharing the file share its pages.
+
+Positions are grouped into material classes (red men, red kings, black men,
+black kings). Within a class each position has a perfect index: every group
+of pieces is ranked as a combination of the squares the earlier groups left
+free, and the side to move is the lowest bit. The file stores one byte per
+index:
+
+- 0: draw (also used for the unreachable indices with a man on its promotion row),
+- 1-127: the side to move wins in ``byte - 1`` turns,
+- 128-255: the side to move loses in ``byte - 128`` turns.
+
+A turn is a whole move, all hops of a multi-capture included. Distances too
+long for a byte are stored as the longest one that fits.
+
+File layout (little endian): a header of magic, version, the maximum piece
+count and the class count; then per class its four piece counts, the offset
+of its data and its number of positions; then the data.
+"""
+import argparse
+import mmap
+import struct
+import sys
+from math import comb
+
+from bitboard import BLACK_PROMOTION, RED_PROMOTION, popcount
+from checkers import CheckersBoard
+
+MAGIC = b'CKTB'
+# Version 2: a multi-capture is finished by the piece that started it
+VERSION = 2
+HEADER = struct.Struct('<4sHHI')
+CLASS_ENTRY = struct.Struct('<4BQQ')
+
+DRAW = 0
+WIN = 1
+LOSS = 2
+
+MAX_WIN_DISTANCE = 126
+MAX_LOSS_DISTANCE = 127
+
+# Binomial coefficients C(n, k) for n up to 32 and k up to 12 pieces
+BINOMIAL = [[comb(n, k) for k in range(13)] for n in range(33)]
+
+# The piece groups of a material class, in index order
+GROUPS = (('R', False), ('R', True), ('B', False), ('B', True))
+
+_readers = {}
+
+
+def encode(result, distance):
+    """
+    Pack a result into its table byte.
+
+    Args:
+        result (int): WIN, LOSS or DRAW, for the side to move.
+        distance (int): Turns until the game ends.
+
+    Returns:
+        int: The byte value.
+    """
+    if result == WIN:
+        return 1 + min(distance, MAX_WIN_DISTANCE)
+    if result == LOSS:
+        return 128 + min(distance, MAX_LOSS_DISTANCE)
+    return 0
+
+
+def decode(value):
+    """
+    Unpack a table byte.
+
+    Args:
+        value (int): The byte value.
+
+    Returns:
+        tuple: (result, distance) for the side to move.
+    """
+    if value == 0:
+        return DRAW, 0
+    if value < 128:
+        return WIN, value - 1
+    return LOSS, value - 128
+
+
+def material_classes(max_pieces):
+    """
+    List the material classes with up to a number of pieces, in build order.
+
+    A capture leads to a class with fewer pieces and a promotion to one with
+    more kings, so classes are ordered by piece count, then by most kings first.
+
+    Args:
+        max_pieces (int): The largest number of pieces on the board.
+
+    Returns:
+        list: (red men, red kings, black men, black kings) tuples.
+    """
+    classes = []
+    for red in range(1, max_pieces):
+        for black in range(1, max_pieces - red + 1):
+            for red_kings in range(red + 1):
+                for black_kings in range(black + 1):
+                    classes.append((red - red_kings, red_kings, black - black_kings, black_kings))
+    classes.sort(key=lambda counts: (sum(counts), -(counts[1] + counts[3]), counts))
+    return classes
+
+
+def class_size(signature):
+    """
+    Count the indices of a material class.
+
+    Args:
+        signature (tuple): The piece counts of the class.
+
+    Returns:
+        int: The number of positions, both sides to move.
+    """
+    size = 2
+    free = 32
+    for count in signature:
+        size *= BINOMIAL[free][count]
+        free -= count
+    return size
+
+
+def signature_of(board):
+    """
+    Get the material class of a position.
+
+    Args:
+        board (CheckersBoard): The position.
+
+    Returns:
+        tuple: (red men, red kings, black men, black kings).
+    """
+    return (popcount(board.men['R']), popcount(board.kings['R']),
+            popcount(board.men['B']), popcount(board.kings['B']))
+
+
+def position_index(signature, men, kings, player):
+    """
+    Compute the perfect index of a position within its material class.
+
+    Args:
+        signature (tuple): The piece counts of the class.
+        men (dict): Bitboard of each player's men.
+        kings (dict): Bitboard of each player's kings.
+        player (str): The side to move.
+
+    Returns:
+        int: The index.
+    """
+    index = 0
+    used = 0
+    free = 32
+    for (owner, king), count in zip(GROUPS, signature):
+        pieces = kings[owner] if king else men[owner]
+        rank = 0
+        placed = 0
+        while pieces:
+            low = pieces & -pieces
+            square = low.bit_length() - 1
+            placed += 1
+            rank += BINOMIAL[square - popcount(used & (low - 1))][placed]
+            pieces ^= low
+        index = index * BINOMIAL[free][count] + rank
+        used |= kings[owner] if king else men[owner]
+        free -= count
+    return index * 2 + (player == 'B')
+
+
+def index_position(signature, index):
+    """
+    Rebuild the position with a given index; the inverse of ``position_index``.
+
+    Args:
+        signature (tuple): The piece counts of the class.
+        index (int): The index.
+
+    Returns:
+        tuple: (men, kings, player).
+    """
+    player = 'B' if index & 1 else 'R'
+    index >>= 1
+    sizes = []
+    free = 32
+    for count in signature:
+        sizes.append(BINOMIAL[free][count])
+        free -= count
+    ranks = []
+    for size in reversed(sizes):
+        ranks.append(index % size)
+        index //= size
+    ranks.reverse()
+
+    men = {'R': 0, 'B': 0}
+    kings = {'R': 0, 'B': 0}
+    used = 0
+    for (owner, king), count, rank in zip(GROUPS, signature, ranks):
+        free_squares = [square for square in range(32) if not used & (1 << square)]
+        pieces = 0
+        for placed in range(count, 0, -1):
+            compressed = placed - 1
+            while BINOMIAL[compressed + 1][placed] <= rank:
+                compressed += 1
+            rank -= BINOMIAL[compressed][placed]
+            pieces |= 1 << free_squares[compressed]
+        if king:
+            kings[owner] = pieces
+        else:
+            men[owner] = pieces
+        used |= pieces
+    return men, kings, player
+
+
+def _turn_values(board, signature, tables, inside, outside):
+    """
+    Play out every complete turn of the side to move.
+
+    Each resulting position is recorded for the opponent, who is then to move:
+    its index if it stays in the class being solved, or otherwise its known
+    table byte.
+
+    Args:
+        board (CheckersBoard): The position; restored before returning.
+        signature (tuple): The class being solved.
+        tables (dict): The solved classes' data, keyed by signature.
+        inside (list): Receives the indices of successors in the class.
+        outside (list): Receives the bytes of the other successors.
+    """
+    mover = board.current_player
+    for move in board.get_possible_moves(mover):
+        board.apply_move(move)
+        try:
+            winner = board.winner()
+            if winner is not None:
+                outside.append(encode(LOSS if winner == mover else WIN, 0))
+            else:
+                successor = signature_of(board)
+                index = position_index(successor, board.men, board.kings, board.current_player)
+                if successor == signature:
+                    inside.append(index)
+                else:
+                    outside.append(tables[successor][index])
+        finally:
+            board.undo_move(move)
+
+
+def solve_class(signature, tables):
+    """
+    Solve one material class by retrograde analysis.
+
+    Positions whose turns all leave the class are valued at once from the
+    solved classes. The rest are resolved in passes: in pass k a position is
+    a win in k turns if one of its turns reaches a loss in k - 1, and a loss
+    in k turns if every turn reaches a win and the longest is k - 1. What is
+    still unresolved when the passes stop changing anything is a draw.
+
+    Args:
+        signature (tuple): The piece counts of the class.
+        tables (dict): The data of every class a capture or promotion can lead to.
+
+    Returns:
+        bytearray: One byte per index of the class.
+    """
+    size = class_size(signature)
+    values = bytearray(size)
+    board = CheckersBoard()
+    pending = {}
+    horizon = 0
+    for index in range(size):
+        men, kings, player = index_position(signature, index)
+        if men['R'] & RED_PROMOTION or men['B'] & BLACK_PROMOTION:
+            continue
+        board.set_pieces(men, kings)
+        board.current_player = player
+        board.multi_capture_in_progress = False
+        winner = board.winner()
+        if winner is not None:
+            values[index] = encode(WIN if winner == player else LOSS, 0)
+            continue
+        inside = []
+        outside = []
+        _turn_values(board, signature, tables, inside, outside)
+        for value in outside:
+            horizon = max(horizon, decode(value)[1] + 1)
+        pending[index] = (inside, outside)
+
+    turns = 1
+    while pending:
+        resolved = {}
+        for index, (inside, outside) in pending.items():
+            quickest_loss = None
+            longest_win = 0
+            all_wins = True
+            for value in outside + [values[successor] for successor in inside]:
+                result, distance = decode(value)
+                if result == LOSS:
+                    if quickest_loss is None or distance < quickest_loss:
+                        quickest_loss = distance
+                elif result == WIN:
+                    longest_win = max(longest_win, distance)
+                else:
+                    all_wins = False
+            if quickest_loss is not None:
+                if quickest_loss + 1 <= turns:
+                    resolved[index] = encode(WIN, quickest_loss + 1)
+            elif all_wins and longest_win + 1 <= turns:
+                resolved[index] = encode(LOSS, longest_win + 1)
+        for index, value in resolved.items():
+            values[index] = value
+            del pending[index]
+        if not resolved and turns > horizon:
+            break
+        turns += 1
+    return values
+
+
+def build(max_pieces, progress=None):
+    """
+    Solve every material class with up to a number of pieces.
+
+    Args:
+        max_pieces (int): The largest number of pieces on the board.
+        progress (callable, optional): Called with each signature once it is solved.
+
+    Returns:
+        dict: The data of each class, keyed by signature.
+    """
+    tables = {}
+    for signature in material_classes(max_pieces):
+        tables[signature] = solve_class(signature, tables)
+        if progress is not None:
+            progress(signature)
+    return tables
+
+
+def write_tablebase(path, tables, max_pieces):
+    """
+    Write solved classes to a tablebase file.
+
+    Args:
+        path (str): The file to write.
+        tables (dict): The data of each class, keyed by signature.
+        max_pieces (int): The largest number of pieces covered.
+    """
+    signatures = sorted(tables)
+    offset = HEADER.size + CLASS_ENTRY.size * len(signatures)
+    with open(path, 'wb') as output:
+        output.write(HEADER.pack(MAGIC, VERSION, max_pieces, len(signatures)))
+        for signature in signatures:
+            output.write(CLASS_ENTRY.pack(*signature, offset, len(tables[signature])))
+            offset += len(tables[signature])
+        for signature in signatures:
+            output.write(tables[signature])
+
+
+class TablebaseReader:
+    """
+    Probes a tablebase file through a read-only memory map.
+
+    Attributes:
+        path (str): The tablebase file.
+        max_pieces (int): The largest number of pieces covered.
+        classes (dict): (offset, size) of each material class, keyed by signature.
+        probes (int): Positions looked up.
+        hits (int): Lookups that found the position in the tablebase.
+    """
+
+    def __init__(self, path):
+        """
+        Open a tablebase file.
+
+        Args:
+            path (str): The tablebase file.
+
+        Raises:
+            ValueError: If the file is not a tablebase of this version.
+        """
+        self.path = path
+        with open(path, 'rb') as tablebase_file:
+            self._data = mmap.mmap(tablebase_file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.max_pieces, count = HEADER.unpack_from(self._data, 0)
+        if magic != MAGIC or version != VERSION:
+            self._data.close()
+            raise ValueError(f"{path} is not a version {VERSION} tablebase")
+        self.classes = {}
+        for number in range(count):
+            *signature, offset, size = CLASS_ENTRY.unpack_from(self._data, HEADER.size + number * CLASS_ENTRY.size)
+            self.classes[tuple(signature)] = (offset, size)
+        self.probes = 0
+        self.hits = 0
+
+    def probe(self, board):
+        """
+        Look up the value of a position for the side to move.
+
+        Args:
+            board (CheckersBoard): The position; it must not be in the middle of a multi-capture.
+
+        Returns:
+            tuple: (result, distance), or None if the position is not covered.
+        """
+        self.probes += 1
+        if popcount(board.occupied()) > self.max_pieces:
+            return None
+        signature = signature_of(board)
+        entry = self.classes.get(signature)
+        if entry is None:
+            return None
+        self.hits += 1
+        index = position_index(signature, board.men, board.kings, board.current_player)
+        return decode(self._data[entry[0] + index])
+
+    def close(self):
+        """
+        Unmap the file.
+        """
+        self._data.close()
+
+
+def open_tablebase(path):
+    """
+    Open a tablebase, reusing this process's reader of the same file.
+
+    Args:
+        path (str): The tablebase file.
+
+    Returns:
+        TablebaseReader: The reader.
+    """
+    reader = _readers.get(path)
+    if reader is None:
+        reader = _readers[path] = TablebaseReader(path)
+    return reader
+
+
+def main(argv=None):
+    """
+    Run the tablebase command line.
+
+    Returns:
+        int: The exit status.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+    sub = commands.add_parser('build')
+    sub.add_argument('--pieces', type=int, default=3)
+    sub.add_argument('--output', required=True)
+    sub = commands.add_parser('info')
+    sub.add_argument('path')
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        tables = build(args.pieces, progress=lambda signature: print('solved', signature, file=sys.stderr))
+        write_tablebase(args.output, tables, args.pieces)
+        return 0
+
+    reader = TablebaseReader(args.path)
+    print(f"{args.path}: up to {reader.max_pieces} pieces, {len(reader.classes)} classes")
+    for signature, (offset, size) in sorted(reader.classes.items()):
+        data = reader._data[offset:offset + size]
+        wins = sum(1 for value in data if 0 < value < 128)
+        losses = sum(1 for value in data if value >= 128)
+        print(signature, size, 'positions', wins, 'wins', losses, 'losses')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
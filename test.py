@@ -1,6 +1,12 @@
+import time
 import unittest
 from checkers import CheckersBoard
 from cpu import CPUPlayer
+from evaluation import piece_square_tables
+from ordering import MoveOrdering
+from sessions import GameStore
+from transposition import EXACT, LOWER, TranspositionTable
+from zobrist import hash_pieces
 
 class TestCheckersGame(unittest.TestCase):
     """
@@ -52,6 +58,504 @@ class TestCheckersGame(unittest.TestCase):
         end_pos = (4, 5)    # An invalid move position
         self.assertFalse(self.board.is_valid_move(start_pos, end_pos), "This should be an invalid move")
 
+    def test_board_view_round_trip(self):
+        """
+        Test that the bitboard position survives conversion to and from the 2D list view.
+
+        Verifies that loading the initial layout and reading it back gives the same cells.
+        """
+        initial_board = self.board.create_board()
+        self.assertEqual(self.board.board, initial_board, "Board view should match the initial layout")
+        self.board.board = initial_board
+        self.assertEqual(self.board.board, initial_board, "Loading a board view should keep every cell")
+
+    def test_apply_and_undo_capture_of_king(self):
+        """
+        Test that undoing a capture restores a captured king and the side to move.
+
+        Applies a capture that removes a king and promotes the capturing piece, then undoes it.
+        """
+        layout = [[' '] * 8 for _ in range(8)]
+        layout[2][1] = 'R'
+        layout[1][2] = 'BQ'
+        layout[7][0] = 'B'
+        self.board.board = layout
+        move = ((2, 1), (0, 3))
+        self.assertIn(move, self.board.get_possible_moves('R'), "Red should be able to capture the king")
+
+        captured_piece_pos = self.board.apply_move(move)
+        self.assertEqual(captured_piece_pos, (1, 2))
+        self.assertEqual(self.board.board[0][3], 'RQ', "The capturing piece should be promoted")
+        self.assertEqual(self.board.current_player, 'B', "The turn should pass to Black")
+
+        self.board.undo_move(move, captured_piece_pos)
+        self.assertEqual(self.board.board, layout, "Undo should restore the exact position")
+        self.assertEqual(self.board.current_player, 'R', "Undo should restore the side to move")
+
+    def test_undo_stack_unwinds_long_lines(self):
+        """
+        Test that a line longer than the preallocated undo stack unwinds to the exact start.
+        """
+        from checkers import UNDO_DEPTH
+        layout = [[' '] * 8 for _ in range(8)]
+        layout[0][1], layout[7][6], layout[4][3] = 'RQ', 'BQ', 'B'
+        self.board.board = layout
+        start = (self.board.board, self.board.hash, dict(self.board.material), self.board.current_player)
+        # The kings shuttle in their corners
+        cycle = [((0, 1), (1, 0)), ((7, 6), (6, 7)), ((1, 0), (0, 1)), ((6, 7), (7, 6))]
+        played = [cycle[ply % 4] for ply in range(UNDO_DEPTH + 20)]
+        for move in played:
+            self.assertIn(move, self.board.get_possible_moves(self.board.current_player))
+            self.board.apply_move(move)
+        for move in reversed(played):
+            self.board.undo_move(move)
+        self.assertEqual((self.board.board, self.board.hash, self.board.material, self.board.current_player), start)
+        with self.assertRaises(IndexError):
+            self.board.undo_move(played[0])
+
+    def test_position_cache(self):
+        """
+        Test that cached moves are handed out as fresh lists and follow the position.
+        """
+        import checkers
+        moves = self.board.get_possible_moves('R')
+        moves.reverse()
+        self.assertEqual(self.board.get_possible_moves('R'), list(reversed(moves)),
+                         "Reordering a returned list should not change the cache")
+        self.assertEqual(len(self.board.get_possible_moves('B')), 7)
+        self.assertIs(self.board._position_facts('R'), self.board._position_facts('R'))
+
+        self.board.apply_move(((5, 0), (4, 1)))
+        self.board.apply_move(((2, 3), (3, 2)))
+        self.assertTrue(self.board.must_capture())
+        self.assertEqual(self.board.get_possible_moves('R'), [((4, 1), (2, 3))])
+        self.board.undo_move(None)
+        self.board.undo_move(None)
+        self.assertFalse(self.board.must_capture())
+
+        checkers._position_cache.clear()
+        self.assertEqual(sorted(self.board.get_possible_moves('R')), sorted(moves))
+
+    def test_multi_capture_paths(self):
+        """
+        Test that multi-captures are whole moves, and can still be played a hop at a time.
+        """
+        import bench
+        board = bench.load_position('multi-jump')
+        start = board.board
+        path = ((6, 1), (4, 3), (2, 5), (0, 3))
+        self.assertEqual(sorted(board.get_possible_moves('R')), [((6, 1), (4, 3), (2, 5), (0, 3)),
+                                                                 ((6, 1), (4, 3), (6, 5))])
+
+        self.assertEqual(board.apply_move(path), ((5, 2), (3, 4), (1, 4)))
+        self.assertEqual(board.board[0][3], 'RQ', "The piece should be promoted at the end of the path")
+        self.assertEqual(board.current_player, 'B')
+        board.undo_move(path)
+        self.assertEqual((board.board, board.current_player), (start, 'R'), "One undo should take back the path")
+
+        self.assertEqual(board.move_piece((6, 1), (4, 3)), (True, 'R', True, False))
+        self.assertEqual(board.get_possible_moves('R'), [((4, 3), (6, 5)), ((4, 3), (2, 5), (0, 3))],
+                         "Only the capturing piece should go on")
+        self.assertFalse(board.move_piece((4, 3), (2, 5), (0, 5))[0])
+        self.assertEqual(board.move_piece((4, 3), (2, 5), (0, 3)), (True, 'B', False, False))
+
+        board = bench.load_position('multi-jump')
+        self.assertEqual(board.move_piece(*path), (True, 'B', False, False))
+
+    def test_zobrist_hash_follows_moves(self):
+        """
+        Test that the incremental Zobrist hash matches a full recomputation.
+
+        Plays a move, compares the hash with one computed from scratch, and checks that undo restores the key.
+        """
+        initial_key = self.board.zobrist_key()
+        move = self.board.get_possible_moves('R')[0]
+        captured_piece_pos = self.board.apply_move(move)
+        self.assertEqual(self.board.hash, hash_pieces(self.board.men, self.board.kings))
+        self.assertNotEqual(self.board.zobrist_key(), initial_key, "A different position should hash differently")
+        self.board.undo_move(move, captured_piece_pos)
+        self.assertEqual(self.board.zobrist_key(), initial_key, "Undo should restore the hash")
+
+    def test_transposition_table_replacement(self):
+        """
+        Test the transposition table's depth-preferred replacement policy.
+
+        A shallower result for another position must not evict a deeper one from the same bucket.
+        """
+        table = TranspositionTable(size=2)
+        table.store(1, 5, EXACT, 10, ((2, 1), (3, 0)))
+        table.store(2, 1, LOWER, -3, ((2, 3), (3, 4)))
+        self.assertEqual(table.probe(1), (5, EXACT, 10, ((2, 1), (3, 0))))
+        self.assertEqual(table.probe(2), (1, LOWER, -3, ((2, 3), (3, 4))))
+        self.assertIsNone(table.probe(3))
+        self.assertEqual(table.hits, 2)
+
+    def test_incremental_evaluation(self):
+        """
+        Test that the running material counters match a full recount.
+
+        Uses piece-square tables with positional bonuses and plays a capture that promotes a piece.
+        """
+        tables = piece_square_tables(back_rank_bonus=7, centre_bonus=3)
+        layout = [[' '] * 8 for _ in range(8)]
+        layout[2][1] = 'R'
+        layout[1][2] = 'BQ'
+        layout[0][1] = 'B'
+        self.board.board = layout
+        self.board.set_tables(tables)
+        self.assertEqual(self.cpu_player.evaluate_board(), 175 + 100 + 7 - 100)
+
+        self.board.apply_move(((2, 1), (0, 3)))
+        expected = dict(self.board.material)
+        self.board.set_tables(tables)
+        self.assertEqual(self.board.material, expected, "Counters should match a recount after a promotion")
+        self.assertEqual(self.cpu_player.evaluate_board(), 100 + 7 - 175)
+
+        self.board.undo_move(((2, 1), (0, 3)))
+        self.assertEqual(self.cpu_player.evaluate_board(), 175 + 100 + 7 - 100)
+
+    def test_move_ordering(self):
+        """
+        Test that move ordering puts the given first move, promotions and killer moves ahead of the rest.
+        """
+        layout = [[' '] * 8 for _ in range(8)]
+        layout[1][2] = 'R'
+        layout[5][2] = 'R'
+        layout[6][5] = 'R'
+        layout[7][0] = 'B'
+        self.board.board = layout
+        ordering = MoveOrdering()
+        ordering.record_cutoff('R', ((6, 5), (5, 6)), 3, 2)
+        moves = ordering.order(self.board, self.board.get_possible_moves('R'), 'R', 2,
+                               first_move=((5, 2), (4, 1)))
+        self.assertEqual(moves[0], ((5, 2), (4, 1)), "The first move should be searched first")
+        self.assertEqual(moves[1][1][0], 0, "Promotions should come next")
+        self.assertEqual(moves[3], ((6, 5), (5, 6)), "Killer moves should follow promotions")
+
+    def test_perft_counts(self):
+        """
+        Test the move generator against the known perft counts of the benchmark positions.
+        """
+        import bench
+        for name, expected in bench.EXPECTED_PERFT.items():
+            board = bench.load_position(name)
+            for depth in range(1, 5):
+                self.assertEqual(bench.perft(board, depth), expected[depth - 1], f"perft({name}, {depth})")
+
+    def test_endgame_tablebase(self):
+        """
+        Test building, writing and probing a two-piece tablebase, and the CPU player using it.
+        """
+        import os
+        import tempfile
+        import tablebase
+        from bench import board_from_diagram
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'endgame.bin')
+            tablebase.write_tablebase(path, tablebase.build(2), 2)
+            reader = tablebase.TablebaseReader(path)
+            self.addCleanup(reader.close)
+
+            rows = ['........'] * 3 + ['..b.....', '...R....'] + ['........'] * 3
+            board = board_from_diagram(rows, 'R')
+            self.assertEqual(reader.probe(board), (tablebase.WIN, 1))
+            self.assertIsNone(reader.probe(CheckersBoard()))
+
+            # With Black to move, the man captures the king instead
+            board.current_player = 'B'
+            self.assertEqual(reader.probe(board), (tablebase.WIN, 1))
+            board.current_player = 'R'
+
+            cpu_player = CPUPlayer(board, 'R', tablebase=reader)
+            self.assertEqual(cpu_player.choose_move(depth=2), ((4, 3), (2, 1)))
+
+    def test_opening_book(self):
+        """
+        Test building and reading an opening book, and the CPU player playing from it.
+        """
+        import os
+        import tempfile
+        import bench
+        import book
+        from bitboard import SQUARES
+        entries = book.build_book(plies=2, depth=2)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'book.bin')
+            book.write_book(path, entries)
+            reader = book.BookReader(path)
+            self.addCleanup(reader.close)
+            self.assertEqual(len(reader), sum(len(moves) for moves in entries.values()))
+
+            moves = reader.moves(self.board)
+            self.assertEqual(sorted(moves), sorted(entries[self.board.zobrist_key()]))
+            self.assertTrue(all(move in self.board.get_possible_moves('R') for move, _ in moves))
+
+            # Black's replies to each of Red's book moves are in the book
+            for move, _ in moves:
+                self.board.apply_move(move)
+                cpu_player = CPUPlayer(self.board, 'B', book=reader)
+                self.assertIn(cpu_player.choose_move(), [reply for reply, _ in reader.moves(self.board)])
+                self.assertEqual(cpu_player.nodes, 0)
+                self.board.undo_move(move)
+            self.assertEqual(reader.moves(bench.load_position('midgame')), [])
+
+            # Two capture paths with the same ends share a code, so neither is a book move
+            loop = CheckersBoard()
+            loop.set_pieces({'R': 1 << SQUARES[(4, 3)],
+                             'B': sum(1 << SQUARES[position] for position in ((3, 2), (1, 2), (3, 4), (1, 4)))},
+                            {'R': 0, 'B': 0})
+            paths = loop.get_possible_moves('R')
+            self.assertEqual(len({book.move_code(path) for path in paths}), 1)
+            self.assertEqual(book.unique_move_codes(paths), {})
+            collided = os.path.join(directory, 'collided.bin')
+            book.write_book(collided, {loop.zobrist_key(): [(paths[0], 1)]})
+            collided_reader = book.BookReader(collided)
+            self.addCleanup(collided_reader.close)
+            self.assertEqual(collided_reader.moves(loop), [])
+
+    def test_self_play(self):
+        """
+        Test that self-play streams one record per game and sums them up.
+        """
+        import io
+        import json
+        import selfplay
+        output = io.StringIO()
+        sides = {'R': {'depth': 1}, 'B': {'depth': 2}}
+        summary = selfplay.run(3, sides, output, workers=1, opening_plies=2, max_plies=40, seed=7)
+        games = [json.loads(line) for line in output.getvalue().splitlines()]
+        self.assertEqual([game['game'] for game in games], [0, 1, 2])
+        for game in games:
+            self.assertIn(game['result'], ('R', 'B', 'draw'))
+            self.assertEqual(len(game['moves']), game['plies'])
+            self.assertEqual(len(game['nodes']), game['plies'] - 2)
+        self.assertEqual(summary['games'], 3)
+        self.assertAlmostEqual(summary['red_win_rate'] + summary['black_win_rate'] + summary['draw_rate'], 1, 3)
+        # The same seed replays the same games
+        self.assertEqual(selfplay.play_game(1, sides, 2, 40, seed=8)['moves'], games[1]['moves'])
+
+    def test_batch_evaluation(self):
+        """
+        Test that batch scores and move counts match the board's, and batches convert back to boards.
+        """
+        try:
+            import batch
+        except ImportError:
+            self.skipTest("numpy is not installed")
+        import bench
+        boards = [bench.load_position(name) for name in bench.POSITIONS]
+        boards[1].current_player = 'B'
+        positions = batch.PositionBatch.from_boards(boards)
+        self.assertEqual(positions.squares.shape, (len(boards), 32))
+        scores = batch.evaluate(positions, 'B')
+        counts = batch.count_moves(positions)
+        for board, score, count in zip(boards, scores, counts):
+            self.assertEqual(score, CPUPlayer(board, 'B').evaluate_board())
+            self.assertEqual(count, len(board.get_possible_moves(board.current_player)))
+        for board, converted in zip(boards, positions.to_boards()):
+            self.assertEqual(converted.board, board.board)
+            self.assertEqual(converted.current_player, board.current_player)
+
+    def test_evaluation_tuning(self):
+        """
+        Test fitting evaluation weights to self-play results and playing with them.
+        """
+        try:
+            import batch
+            import tuning
+        except ImportError:
+            self.skipTest("numpy is not installed")
+        import os
+        import tempfile
+        import evaluation
+        import selfplay
+        import wire
+        sides = {'R': {'depth': 1}, 'B': {'depth': 2}}
+        with tempfile.TemporaryDirectory() as directory:
+            games_path = os.path.join(directory, 'games.jsonl')
+            positions_path = os.path.join(directory, 'positions.bin')
+            weights_path = os.path.join(directory, 'weights.json')
+            with open(games_path, 'w') as output:
+                selfplay.run(6, sides, output, workers=1, opening_plies=4, max_plies=60, seed=3)
+            totals = tuning.write_positions([games_path], positions_path)
+            positions = tuning.load_positions(positions_path)
+            self.assertEqual(len(positions), totals['kept'])
+            self.assertGreater(totals['positions'], totals['kept'])
+
+            # A score is the features dotted with Red's values, as the board sums them
+            weights = evaluation.DEFAULT_TABLES['R'][0] + evaluation.DEFAULT_TABLES['R'][1]
+            for record, row in zip(positions[:20], tuning.features(positions[:20])):
+                board = wire.unpack_position(record.tobytes())
+                self.assertEqual(row @ weights, board.material['R'] - board.material['B'])
+
+            fitted = tuning.fit(positions, epochs=5, batch_size=64)
+            self.assertLessEqual(fitted['loss'], fitted['initial_loss'])
+            evaluation.write_tables(weights_path, fitted['men'], fitted['kings'], k=fitted['k'])
+            tables = evaluation.load_tables(weights_path)
+            self.assertEqual(tables['B'][0], fitted['men'][::-1])
+
+            cpu_player = CPUPlayer(self.board, 'B', tables=tables)
+            self.assertIs(self.board.tables, tables)
+            expected = batch.evaluate(batch.PositionBatch.from_boards([self.board]), 'B', tables)[0]
+            self.assertEqual(cpu_player.evaluate_board(), expected)
+            self.assertIsNotNone(cpu_player.choose_move(depth=2))
+
+    def test_search_stats(self):
+        """
+        Test that search statistics are collected only on request and add up.
+        """
+        from searchstats import SearchStatsTotals
+        move, stats = self.cpu_player.choose_move(depth=4, with_stats=True)
+        self.assertIn(move, self.board.get_possible_moves('B'))
+        self.assertEqual(stats.nodes, self.cpu_player.nodes)
+        # Nodes not counted as leaves or expanded were answered by the transposition table
+        self.assertLessEqual(stats.leaves + stats.expanded, stats.nodes)
+        self.assertGreater(stats.leaves, 0)
+        self.assertGreater(stats.beta_cutoffs, 0)
+        self.assertLessEqual(stats.first_move_cutoffs, stats.beta_cutoffs)
+        self.assertEqual([iteration['depth'] for iteration in stats.iterations], [4])
+        self.assertEqual(stats.as_dict()['depth'], 4)
+
+        _, timed = CPUPlayer(self.board, 'B').choose_move(time_budget_ms=50, with_stats=True)
+        depths = [iteration['depth'] for iteration in timed.iterations]
+        self.assertEqual(depths, list(range(1, len(depths) + 1)))
+
+        cpu_player = CPUPlayer(self.board, 'B')
+        self.assertIn(cpu_player.choose_move(depth=2), self.board.get_possible_moves('B'))
+        self.assertIsNone(cpu_player.stats, "Statistics should only be collected on request")
+
+        totals = SearchStatsTotals()
+        totals.add(stats)
+        totals.add(timed)
+        summary = totals.as_dict()
+        self.assertEqual(summary['searches'], 2)
+        self.assertEqual(summary['nodes'], stats.nodes + timed.nodes)
+
+    def test_quiescence_sees_hanging_piece(self):
+        """
+        Test that captures pending at the search horizon are played out before evaluating.
+        """
+        from bench import board_from_diagram
+        rows = ['........'] * 3 + ['b.......', '........', '..r.....', '........', '......r.']
+        hanging = ((5, 2), (4, 1))  # Black's man jumps it from (3, 0)
+        scores = {}
+        for quiescence in (False, True):
+            board = board_from_diagram(rows, 'R')
+            cpu_player = CPUPlayer(board, 'R', quiescence=quiescence)
+            board.apply_move(hanging)
+            scores[quiescence], _ = cpu_player.minimax(0, float('-inf'), float('inf'), False, ply=1)
+        self.assertEqual(scores[False], 100, "Without quiescence the man looks safe")
+        self.assertEqual(scores[True], 0, "With quiescence the man is lost")
+
+        board = board_from_diagram(rows, 'R')
+        self.assertNotEqual(CPUPlayer(board, 'R').choose_move(depth=1), hanging)
+
+    def test_search_algorithms_agree(self):
+        """
+        Test that every search algorithm finds minimax's move and score at the same depth.
+        """
+        import bench
+        from cpu import ALGORITHMS
+        for name in bench.POSITIONS:
+            board = bench.load_position(name)
+            for depth in range(1, 6):
+                results = {}
+                for algorithm in ALGORITHMS:
+                    cpu_player = CPUPlayer(board, board.current_player, algorithm=algorithm)
+                    results[algorithm] = cpu_player.search_root(depth)
+                for algorithm in ALGORITHMS:
+                    self.assertEqual(results[algorithm], results['minimax'], f"{algorithm} on {name} at depth {depth}")
+        self.assertIsNotNone(CPUPlayer(self.board, 'R', algorithm='mtdf').choose_move(time_budget_ms=50))
+        with self.assertRaises(ValueError):
+            CPUPlayer(self.board, 'R', algorithm='negascout')
+
+    def test_pdn_and_binary_positions(self):
+        """
+        Test that games survive a PDN round trip and positions a binary one.
+        """
+        import io
+        import pdn
+        import wire
+        text = """[Event "Sample"]
+[Black "A \\"quoted\\" name"]
+
+1. 11-15 {a comment
+over two lines} 23-19 (1... 22-18 15x22) 2. 8-11 $1 22-17! ; the rest
+3. 9-14 19-16 4. 12x19 1/2-1/2
+"""
+        games = list(pdn.read_games(io.StringIO(text)))
+        self.assertEqual(len(games), 1)
+        game = games[0]
+        self.assertEqual(game.tags['Black'], 'A "quoted" name')
+        self.assertEqual(game.moves, ['11-15', '23-19', '8-11', '22-17', '9-14', '19-16', '12x19'])
+        self.assertEqual(game.result, '1/2-1/2')
+        records = b''.join(wire.pack_position(board) for board in game.positions())
+        self.assertEqual(len(records), 8 * wire.POSITION.size)
+
+        # Our games start with Red to move, so they carry a FEN tag
+        moves = []
+        for _ in range(6):
+            move = self.board.get_possible_moves(self.board.current_player)[-1]
+            self.board.move_piece(*move)
+            moves.append(move)
+        output = io.StringIO()
+        pdn.write_game(output, pdn.PDNGame.from_moves(moves, result='*'))
+        replayed = list(next(pdn.read_games(io.StringIO(output.getvalue()))).positions())[-1]
+        self.assertEqual(replayed.board, self.board.board)
+        packed = wire.pack_position(self.board)
+        self.assertEqual(wire.unpack_position(packed).zobrist_key(), self.board.zobrist_key())
+
+    def test_position_index(self):
+        """
+        Test building a position index in several chunks, looking positions up and playing from it.
+        """
+        import os
+        import tempfile
+        import pdn
+        import positionindex
+        main_line = "1. 11-15 23-19 2. 8-11 22-17"
+        games = [(main_line, '1-0')] * 24 + [(main_line, '1/2-1/2'), ("1. 9-13 22-18", '0-1')]
+        with tempfile.TemporaryDirectory() as directory:
+            games_path = os.path.join(directory, 'games.pdn')
+            index_path = os.path.join(directory, 'games.idx')
+            with open(games_path, 'w') as output:
+                for number, (movetext, result) in enumerate(games):
+                    output.write(f'[Event "Test"]\n\n{movetext} {result}\n\n')
+                    if number == 12:
+                        # A game set up from a broken FEN tag is skipped, not the whole build
+                        output.write(f'[Event "Test"]\n[FEN "X:W33"]\n\n{main_line} 1-0\n\n')
+            totals = positionindex.build_index([games_path], index_path, chunk_records=4)
+            self.assertEqual((totals['games'], totals['stopped']), (27, 1))
+            self.assertGreater(totals['chunks'], 2)
+            # Merging two chunks at a time, through intermediate chunks, builds the same file
+            narrow_path = os.path.join(directory, 'narrow.idx')
+            positionindex.build_index([games_path], narrow_path, chunk_records=4, merge_width=2)
+            with open(index_path, 'rb') as index_file, open(narrow_path, 'rb') as narrow_file:
+                self.assertEqual(narrow_file.read(), index_file.read())
+            index = positionindex.PositionIndex(index_path)
+            self.addCleanup(index.close)
+
+            # Games are indexed as the web app plays them: Red, in PDN's Black's place, moves first
+            board = CheckersBoard()
+            stats = index.lookup(board)
+            self.assertEqual((stats['games'], stats['red_wins'], stats['black_wins'], stats['draws']), (26, 24, 1, 1))
+            self.assertEqual([entry['games'] for entry in stats['moves']], [25, 1])
+            self.assertEqual(stats['moves'][0]['move'], pdn.resolve_move(board, '22-18'))
+            self.assertEqual(index.lookup(pdn.initial_board())['games'], 0)
+
+            # A new web game starts in the indexed position
+            from unittest import mock
+            import app as web
+            with mock.patch.object(web, 'position_index', index):
+                self.assertEqual(web.app.test_client().get('/explore').get_json()['games'], 26)
+
+            # The CPU's reply that scored best in enough games is played without searching
+            board.move_piece(*pdn.resolve_move(board, '22-18'))
+            self.assertEqual(index.lookup(board)['games'], 25)
+            cpu_player = CPUPlayer(board, 'B', position_index=index)
+            self.assertEqual(cpu_player.choose_move(), pdn.resolve_move(board, '10-14'))
+            self.assertEqual(cpu_player.nodes, 0)
+
     def test_cpu_player_decision(self):
         """
         Test CPU player's decision-making.
@@ -61,5 +565,348 @@ class TestCheckersGame(unittest.TestCase):
         cpu_move = self.cpu_player.choose_move()
         self.assertIsNotNone(cpu_move, "CPU should be able to make a move")
 
+    def test_cpu_player_time_budget(self):
+        """
+        Test CPU player's time-managed search.
+
+        Verifies that iterative deepening returns a legal move and respects the time budget.
+        """
+        from cpu import MAX_SEARCH_DEPTH
+        # An exhausted budget stops the search after the first iteration, which always completes
+        cpu_move, stats = self.cpu_player.choose_move(time_budget_ms=0, with_stats=True)
+        self.assertIn(cpu_move, self.board.get_possible_moves('B'), "CPU should choose a legal move")
+        self.assertEqual([iteration['depth'] for iteration in stats.iterations], [1])
+
+        start = time.perf_counter()
+        cpu_move, stats = self.cpu_player.choose_move(time_budget_ms=50, with_stats=True)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.assertIn(cpu_move, self.board.get_possible_moves('B'), "CPU should choose a legal move")
+        self.assertTrue(1 <= len(stats.iterations) < MAX_SEARCH_DEPTH, "The search should stop before the depth cap")
+        # Generous, so a loaded machine does not fail it; a search ignoring its budget runs far longer
+        self.assertLess(elapsed_ms, 5000, "The search should stop at its time budget")
+        self.assertEqual(self.cpu_player.principal_variation[0], cpu_move)
+        self.assertEqual(self.board.current_player, 'R', "The search should leave the board unchanged")
+
+    def test_parallel_search_matches_serial(self):
+        """
+        Test that the parallel root search picks the same move and score as the serial search.
+        """
+        import parallel
+        self.addCleanup(parallel.shutdown_pool)
+        self.board.move_piece((5, 2), (4, 3))
+        serial = CPUPlayer(self.board, 'B').search_root(4)
+        in_parallel = CPUPlayer(self.board, 'B', workers=2).search_root(4)
+        self.assertEqual(in_parallel, serial)
+
+class TestGameStore(unittest.TestCase):
+    """
+    A test suite for the per-session game store used by the web app.
+    """
+
+    def setUp(self):
+        """
+        Set up a small store driven by a fake clock.
+        """
+        self.now = 0.0
+        self.store = GameStore(max_games=2, idle_ttl=60, tt_entries=16, clock=lambda: self.now)
+
+    def test_sessions_are_independent(self):
+        """
+        Test that each session gets its own board and is found again by its id.
+        """
+        first = self.store.create()
+        second = self.store.create()
+        first.board.move_piece((5, 0), (4, 1))
+        self.assertIs(self.store.get(first.session_id), first)
+        self.assertEqual(second.board.current_player, 'R', "Another session's move should not leak")
+        self.assertIsNone(self.store.get('unknown'))
+        self.assertEqual((self.store.hits, self.store.misses), (1, 1))
+
+    def test_lru_and_idle_eviction(self):
+        """
+        Test that a full store evicts the least recently used session and idle sessions expire.
+        """
+        first = self.store.create()
+        second = self.store.create()
+        self.store.get(first.session_id)
+        third = self.store.create()
+        self.assertIsNone(self.store.get(second.session_id), "The least recently used session should be evicted")
+        self.assertEqual(self.store.evictions, 1)
+
+        self.now = 61
+        self.assertIsNone(self.store.get(first.session_id), "Idle sessions should expire")
+        self.assertIsNone(self.store.get(third.session_id))
+        self.assertEqual(self.store.expirations, 2)
+        self.assertEqual(len(self.store), 0)
+
+    def test_games_survive_restart(self):
+        """
+        Test that games logged to a journal are restored lazily by a new store, and expired logs deleted.
+        """
+        import os
+        import tempfile
+        from journal import GameJournal
+        with tempfile.TemporaryDirectory() as directory:
+            journal = GameJournal(directory, flush_interval=60, snapshot_every=3)
+            self.addCleanup(journal.close)
+            store = GameStore(max_games=1, idle_ttl=60, tt_entries=16, clock=lambda: self.now, journal=journal)
+            session = store.create()
+            for _ in range(5):
+                move = session.board.get_possible_moves(session.board.current_player)[0]
+                session.board.move_piece(*move)
+                session.record_version(move)
+            self.assertEqual(os.listdir(directory), [], "Records should wait for the writer")
+            journal.flush()
+            self.assertEqual(journal.stats()['syncs'], 1)
+
+            # Evicted or lost with the old process, the game comes back from its log
+            other = store.create()
+            restarted = GameStore(idle_ttl=60, tt_entries=16, clock=lambda: self.now,
+                                  journal=GameJournal(directory, flush_interval=60))
+            self.addCleanup(restarted.journal.close)
+            self.assertEqual(len(restarted), 0)
+            for current in (store, restarted):
+                restored = current.get(session.session_id)
+                self.assertIsNot(restored, session)
+                self.assertTrue(restored.restored)
+                self.assertEqual(restored.board.board, session.board.board)
+                self.assertEqual(restored.board.current_player, session.board.current_player)
+                self.assertEqual(restored.version, 5)
+            self.assertEqual(restarted.restorations, 1)
+            self.assertIsNone(restarted.get(other.session_id), "A game without moves has no log")
+            self.assertIsNone(restarted.get('../escape'))
+
+            self.now = 61
+            store.get(None)
+            journal.flush()
+            self.assertEqual(os.listdir(directory), [], "An expired game's log should be deleted")
+
+    def test_restore_leaves_queued_logs_to_the_writer(self):
+        """
+        Test that restoring a game replays its queued records without writing or syncing any log.
+        """
+        import os
+        import tempfile
+        from journal import GameJournal
+        with tempfile.TemporaryDirectory() as directory:
+            journal = GameJournal(directory, flush_interval=60, snapshot_every=3)
+            self.addCleanup(journal.close)
+            store = GameStore(max_games=1, idle_ttl=60, tt_entries=16, clock=lambda: self.now, journal=journal)
+            sessions = [store.create(), store.create()]
+            for session in sessions:
+                for _ in range(4):
+                    move = session.board.get_possible_moves(session.board.current_player)[0]
+                    session.board.move_piece(*move)
+                    session.record_version(move)
+            queued = journal.stats()['queued']
+
+            # The first game was evicted by the second; it comes back from its queued records alone
+            restored = store.get(sessions[0].session_id)
+            self.assertIsNot(restored, sessions[0])
+            self.assertEqual(restored.board.board, sessions[0].board.board)
+            self.assertEqual(restored.version, 4)
+            self.assertEqual(journal.stats()['syncs'], 0)
+            self.assertEqual(journal.stats()['queued'], queued)
+            self.assertEqual(os.listdir(directory), [])
+            journal.flush()
+            self.assertEqual(len(os.listdir(directory)), 2, "The writer should still write both logs")
+
+    def test_writer_expires_logs_while_running(self):
+        """
+        Test that the journal's writer keeps deleting the logs of evicted games that expire after it started.
+        """
+        import os
+        import tempfile
+        import time
+        from journal import GameJournal
+        with tempfile.TemporaryDirectory() as directory:
+            now = [time.time()]
+            journal = GameJournal(directory, flush_interval=0.01, max_age=60, clock=lambda: now[0])
+            store = GameStore(max_games=1, tt_entries=16, journal=journal)
+            session = store.create()
+            session.record_version()
+            journal.flush()
+            self.assertEqual(len(os.listdir(directory)), 1)
+            store.create()
+
+            now[0] += 61
+            deadline = time.monotonic() + 5
+            while os.listdir(directory) and time.monotonic() < deadline:
+                time.sleep(0.01)
+            journal.close()
+            self.assertEqual(os.listdir(directory), [], "The writer should delete the expired log")
+            self.assertIsNone(journal.restore(session.session_id))
+
+    def test_expiry_keeps_logs_of_live_games(self):
+        """
+        Test that a game still in memory keeps its log however long it goes without a move.
+        """
+        import os
+        import tempfile
+        import time
+        from journal import GameJournal
+        with tempfile.TemporaryDirectory() as directory:
+            now = [time.time()]
+            journal = GameJournal(directory, flush_interval=60, max_age=60, clock=lambda: now[0])
+            self.addCleanup(journal.close)
+            store = GameStore(idle_ttl=60, tt_entries=16, clock=lambda: self.now, journal=journal)
+            session = store.create()
+            session.record_version()
+            journal.flush()
+
+            # The player keeps visiting, so the session stays live while its log ages
+            now[0] += 61
+            self.assertIs(store.get(session.session_id), session)
+            self.assertEqual(journal.expire(), 0)
+            move = session.board.get_possible_moves(session.board.current_player)[0]
+            session.board.move_piece(*move)
+            session.record_version(move)
+            journal.flush()
+
+            restarted = GameJournal(directory, flush_interval=60)
+            self.addCleanup(restarted.close)
+            board, version = restarted.restore(session.session_id)
+            self.assertEqual(board.board, session.board.board)
+            self.assertEqual(version, 2)
+            self.assertEqual(len(os.listdir(directory)), 1)
+
+class TestWebApp(unittest.TestCase):
+    """
+    A test suite for the web app's routes and its background CPU turns.
+    """
+
+    def test_turn_queue_is_bounded(self):
+        """
+        Test that the turn queue refuses turns once full and counts what it ran.
+        """
+        import threading
+        from turns import TurnQueue
+        queue = TurnQueue(workers=1, max_pending=1)
+        self.addCleanup(queue.shutdown)
+        release = threading.Event()
+        self.assertTrue(queue.submit(release.wait))
+        self.assertFalse(queue.submit(release.wait), "A full queue should refuse turns")
+        release.set()
+        queue.shutdown()
+        stats = queue.stats()
+        self.assertEqual((stats['submitted'], stats['completed'], stats['rejected']), (1, 1, 1))
+        self.assertEqual((stats['queued'], stats['running']), (0, 0))
+
+    def test_cpu_turn_in_background(self):
+        """
+        Test that a move is acknowledged before the CPU replies, and the reply is polled for.
+        """
+        import app as web
+        client = web.app.test_client()
+        data = client.post('/move', json={'start': [5, 0], 'end': [4, 1]}).get_json()
+        self.assertTrue(data['valid'])
+        self.assertEqual(data['current_player'], 'B')
+        deadline = time.time() + 10
+        while data.get('cpu_pending') and time.time() < deadline:
+            time.sleep(0.01)
+            data = client.get('/state').get_json()
+        self.assertFalse(data['cpu_pending'])
+        self.assertEqual(data['current_player'], 'R', "The CPU should have replied")
+        self.assertEqual(sum(row.count('B') for row in data['board']), 12)
+        self.assertGreaterEqual(client.get('/stats').get_json()['cpu_turns']['completed'], 1)
+
+    def test_move_refused_while_cpu_turn_pending(self):
+        """
+        Test that a move sent while the CPU's turn is pending is refused and leaves the board alone.
+        """
+        import app as web
+        client = web.app.test_client()
+        client.get('/')
+        session = web.store.get(client.get_cookie(web.app.config['SESSION_COOKIE']).value)
+        board, version = session.board.board, session.version
+        session.cpu_pending = True
+        try:
+            response = client.post('/move', json={'start': [5, 0], 'end': [4, 1]})
+        finally:
+            session.cpu_pending = False
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.get_json(), {'valid': False, 'cpu_pending': True})
+        self.assertEqual(session.board.board, board, "A refused move should not change the board")
+        self.assertEqual(session.version, version)
+        self.assertEqual(session.board.current_player, 'R')
+
+    def test_malformed_moves_are_refused(self):
+        """
+        Test that move bodies without two [row, col] positions get status 400, not a server error.
+        """
+        import app as web
+        client = web.app.test_client()
+        for body in ({'path': [[5, 0]]}, {'path': [[5, 0], [4]]}, {'path': [5, 0, 4, 1]},
+                     {'path': [[5, 0], ['4', 1]]}, {'start': [5, 0]}, {'start': 5, 'end': 4}, [[5, 0], [4, 1]]):
+            response = client.post('/move', json=body)
+            self.assertEqual(response.status_code, 400, body)
+            self.assertEqual(response.get_json(), {'valid': False})
+        self.assertTrue(client.post('/move', json={'path': [[5, 0], [4, 1]]}).get_json()['valid'])
+
+    def test_ponder_answers_and_cancels(self):
+        """
+        Test that a ponder answers the human's replies, and stops promptly when cancelled.
+        """
+        import threading
+        from ponder import Ponder
+        board = CheckersBoard()
+        table = TranspositionTable(1 << 14)
+        ponder = Ponder(board, 'B', table, expected_reply=((5, 6), (4, 7)), reply_budget_ms=20, budget_ms=5000)
+        self.assertEqual(len(ponder.replies), 7, "Every reply should be pondered when there are few")
+        self.assertEqual(ponder.replies[0], ((5, 6), (4, 7)), "The expected reply should come first")
+        ponder.run()
+        self.assertEqual(ponder.searched, 7)
+        board.apply_move(((5, 6), (4, 7)))
+        self.assertIn(ponder.answer(board), board.get_possible_moves('B'))
+        board.undo_move(None)
+        self.assertIsNone(ponder.answer(board), "A position that was not pondered has no answer")
+
+        unstarted = Ponder(board, 'B', table)
+        unstarted.cancel()
+        unstarted.run()
+        self.assertEqual(unstarted.answers, {}, "A ponder cancelled before it starts should not search")
+
+        running = Ponder(board, 'B', table, reply_budget_ms=10000, budget_ms=100000)
+        thread = threading.Thread(target=running.run)
+        thread.start()
+        time.sleep(0.1)
+        started = time.perf_counter()
+        running.cancel()
+        self.assertLess(time.perf_counter() - started, 1.0, "Cancelling should stop the search promptly")
+        self.assertEqual(running.answers, {}, "A cancelled search should leave no answer")
+        thread.join()
+
+    def test_compact_board_deltas(self):
+        """
+        Test that clients sending a board version get deltas that rebuild the board.
+        """
+        import app as web
+        import wire
+        start = wire.pack_board(CheckersBoard())
+        self.assertEqual(wire.unpack_board(start), CheckersBoard().board)
+
+        client = web.app.test_client()
+        data = client.post('/move', json={'start': [5, 0], 'end': [4, 1], 'version': 0}).get_json()
+        self.assertNotIn('board', data)
+        self.assertEqual(data['version'], 1)
+        self.assertEqual(sorted(data['delta']), [[16, 'r'], [20, '.']])
+        squares = wire.apply_delta(start, data['delta'])
+
+        version = data['version']
+        deadline = time.time() + 10
+        while time.time() < deadline:
+            time.sleep(0.01)
+            data = client.get(f"/state?version={version}").get_json()
+            if not data['cpu_pending']:
+                break
+        self.assertEqual(data['version'], 2)
+        self.assertEqual(len(data['cpu_moves']), 1)
+        squares = wire.apply_delta(squares, data['delta'])
+        self.assertEqual(wire.unpack_board(squares), client.get('/state').get_json()['board'])
+
+        # A version the server no longer keeps gets the whole board
+        data = client.get('/state?version=-5').get_json()
+        self.assertEqual(data['squares'], squares)
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,96 @@
+"""
+A fixed-size transposition table for the CPU player's search.
+"""
+
+# Bound types of a stored score
+EXACT = 0
+LOWER = 1  # The search failed high: the true score is at least the stored one
+UPPER = 2  # The search failed low: the true score is at most the stored one
+
+
+class TranspositionTable:
+    """
+    A fixed-size hash table of search results keyed by Zobrist hash.
+
+    The table is split into two-slot buckets. The first slot of a bucket keeps
+    the deepest result (replaced only by an equal or deeper search, or by any
+    result once the stored one is from an older search), the second slot
+    always takes the newest result. Memory use is fixed by the number of
+    entries chosen at construction.
+
+    Attributes:
+        size (int): The number of entries the table can hold.
+        probes (int): The number of lookups made.
+        hits (int): The number of lookups that found their position.
+        stores (int): The number of results stored.
+    """
+
+    def __init__(self, size=1 << 16):
+        """
+        Create an empty transposition table.
+
+        Args:
+            size (int): The number of entries; rounded down to an even number, minimum 2.
+        """
+        self.buckets = max(1, size // 2)
+        self.size = self.buckets * 2
+        self.entries = [None] * self.size
+        self.generation = 0
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+
+    def new_search(self):
+        """
+        Mark the start of a new search, so results from older searches age out first.
+        """
+        self.generation += 1
+
+    def clear(self):
+        """
+        Remove every entry and reset the counters.
+        """
+        self.entries = [None] * self.size
+        self.generation = 0
+        self.probes = self.hits = self.stores = 0
+
+    def probe(self, key):
+        """
+        Look up a position.
+
+        Args:
+            key (int): The Zobrist hash of the position.
+
+        Returns:
+            tuple: (depth, bound, score, best_move) if the position is stored, otherwise None.
+        """
+        self.probes += 1
+        index = (key % self.buckets) << 1
+        entries = self.entries
+        for entry in (entries[index], entries[index + 1]):
+            if entry is not None and entry[0] == key:
+                self.hits += 1
+                return entry[1:5]
+        return None
+
+    def store(self, key, depth, bound, score, best_move):
+        """
+        Store a search result, following the bucket replacement policy.
+
+        Args:
+            key (int): The Zobrist hash of the position.
+            depth (int): The remaining search depth the result was computed with.
+            bound (int): EXACT, LOWER or UPPER.
+            score (int): The score found by the search.
+            best_move (tuple): The best move found, or None.
+        """
+        self.stores += 1
+        index = (key % self.buckets) << 1
+        entries = self.entries
+        entry = (key, depth, bound, score, best_move, self.generation)
+        deepest = entries[index]
+        if (deepest is None or deepest[0] == key or depth >= deepest[1]
+                or deepest[5] != self.generation):
+            entries[index] = entry
+        else:
+            entries[index + 1] = entry
@@ -0,0 +1,282 @@
+"""
+Texel tuning: fitting the evaluation's piece-square tables to game results.
+
+Usage:
+    python tuning.py positions GAMES [GAMES ...] --output POSITIONS.bin
+    python tuning.py fit POSITIONS.bin --output WEIGHTS.json [--epochs E] [--batch-size B] [--rate R]
+
+``positions`` replays games, either self-play JSON lines (see ``selfplay.py``)
+or PDN files (see ``pdn.py``), and keeps each quiet position, where the side
+to move has no capture, labelled with the game's result. A labelled position
+is the 13-byte record of ``wire.py`` and a result byte: 1 when Red won, -1
+when Black won, 0 for a draw. Games without a result are left out.
+
+``fit`` predicts Red's result from a position as ``sigmoid(k * score)``,
+where score is the evaluation from Red's side, and lowers the squared error
+against the results (1, 0.5 or 0). It first picks the k that fits the
+starting tables best, then fits the tables with Adam gradient steps over
+batches read from the memory-mapped positions, so the dataset need not fit
+in memory. The fitted values, a man and a king value for each square from
+its owner's side, are written as a weights file for
+``evaluation.load_tables``; pass them to ``CPUPlayer(tables=...)`` or set
+``FLASK_EVALUATION_PATH`` for the web app.
+"""
+import argparse
+import json
+import struct
+import sys
+
+import numpy as np
+
+from checkers import CheckersBoard
+from evaluation import DEFAULT_TABLES, write_tables
+from pdn import WINNERS, read_games
+from wire import pack_position
+
+RESULT = struct.Struct('<b')
+RESULTS = {'R': 1, 'B': -1, 'draw': 0, None: 0}
+# A labelled position as a NumPy record: the planes and flags of ``wire.POSITION`` and the result
+LABELLED = np.dtype([('occupied', '<u4'), ('black', '<u4'), ('kings', '<u4'), ('flags', 'u1'), ('result', 'i1')])
+
+DEFAULT_EPOCHS = 10
+DEFAULT_BATCH_SIZE = 1 << 16
+DEFAULT_RATE = 1.0
+# Positions used to choose k, and the values of k tried
+K_SAMPLE = 1 << 20
+K_CANDIDATES = np.geomspace(1e-4, 1e-1, 121)
+
+_SQUARES = np.arange(32, dtype=np.uint32)
+
+
+def game_positions(path):
+    """
+    Replay the games of a file, yielding each position with the game's result.
+
+    Args:
+        path (str): Self-play JSON lines, or a PDN file if the name ends in '.pdn'.
+
+    Yields:
+        tuple: The board, changed in place between positions, and the result
+        as a ``RESULTS`` value. A PDN game stops at a move illegal here.
+    """
+    with open(path, encoding='utf-8', errors='replace') as stream:
+        if path.lower().endswith('.pdn'):
+            for game in read_games(stream):
+                if game.result not in WINNERS:
+                    continue
+                result = RESULTS[WINNERS[game.result]]
+                try:
+                    for board in game.positions():
+                        yield board, result
+                except ValueError:
+                    continue
+            return
+        for line in stream:
+            if not line.strip():
+                continue
+            game = json.loads(line)
+            board = CheckersBoard()
+            result = RESULTS[game['result']]
+            yield board, result
+            for move in game['moves']:
+                board.move_piece(*move)
+                yield board, result
+
+
+def write_positions(paths, output_path):
+    """
+    Write the quiet positions of game files, labelled with their results.
+
+    Args:
+        paths (list): The game files; see ``game_positions``.
+        output_path (str): The positions file to write.
+
+    Returns:
+        dict: Positions read and positions kept.
+    """
+    totals = {'positions': 0, 'kept': 0}
+    with open(output_path, 'wb') as output:
+        for path in paths:
+            for board, result in game_positions(path):
+                totals['positions'] += 1
+                if board.must_capture() or not board.has_valid_moves(board.current_player):
+                    continue
+                output.write(pack_position(board) + RESULT.pack(result))
+                totals['kept'] += 1
+    return totals
+
+
+def load_positions(path):
+    """
+    Memory-map a positions file.
+
+    Args:
+        path (str): The file.
+
+    Returns:
+        numpy.memmap: The labelled positions, as ``LABELLED`` records.
+    """
+    return np.memmap(path, dtype=LABELLED, mode='r')
+
+
+def features(positions):
+    """
+    Count each side's men and kings per square, seen from their owner's side.
+
+    Args:
+        positions (numpy.ndarray): ``LABELLED`` records.
+
+    Returns:
+        numpy.ndarray: (N, 64) float32: Red's men minus Black's men on each square,
+        then the same for kings, Black's squares mirrored; a score is these
+        dotted with Red's man values and king values.
+    """
+    def bits(planes):
+        return ((planes[:, None] >> _SQUARES) & 1).astype(np.float32)
+
+    occupied = positions['occupied'].astype(np.uint32)
+    black = positions['black'].astype(np.uint32)
+    kings = positions['kings'].astype(np.uint32)
+    red = occupied & ~black
+    men = bits(red & ~kings) - bits(black & ~kings)[:, ::-1]
+    crowned = bits(red & kings) - bits(black & kings)[:, ::-1]
+    return np.concatenate([men, crowned], axis=1)
+
+
+def targets(positions):
+    """
+    Get Red's result of each position: 1 for a win, 0.5 for a draw, 0 for a loss.
+
+    Args:
+        positions (numpy.ndarray): ``LABELLED`` records.
+
+    Returns:
+        numpy.ndarray: (N,) float32 results.
+    """
+    return (positions['result'].astype(np.float32) + 1.0) / 2.0
+
+
+def loss(weights, x, y, k):
+    """
+    Mean squared error of the predicted results.
+
+    Args:
+        weights (numpy.ndarray): (64,) Red's man values, then king values.
+        x (numpy.ndarray): (N, 64) features.
+        y (numpy.ndarray): (N,) results.
+        k (float): The scale from score to the sigmoid's argument.
+
+    Returns:
+        float: The error.
+    """
+    predicted = 1.0 / (1.0 + np.exp(-k * (x @ weights)))
+    return float(np.mean((predicted - y) ** 2))
+
+
+def fit_k(weights, x, y):
+    """
+    Choose the k for which the given weights predict the results best.
+
+    Args:
+        weights (numpy.ndarray): (64,) weights.
+        x (numpy.ndarray): (N, 64) features.
+        y (numpy.ndarray): (N,) results.
+
+    Returns:
+        float: The best of ``K_CANDIDATES``.
+    """
+    return float(min(K_CANDIDATES, key=lambda k: loss(weights, x, y, k)))
+
+
+def fit(positions, epochs=DEFAULT_EPOCHS, batch_size=DEFAULT_BATCH_SIZE, rate=DEFAULT_RATE,
+        initial=None, seed=0, progress=None):
+    """
+    Fit piece-square values to labelled positions.
+
+    Args:
+        positions (numpy.ndarray): ``LABELLED`` records, typically memory-mapped.
+        epochs (int): Passes over the positions.
+        batch_size (int): Positions per gradient step.
+        rate (float): Adam's step size, in evaluation points.
+        initial (dict, optional): Piece-square tables to start from; the defaults if omitted.
+        seed (int): Seeds the order the batches are visited in.
+        progress (callable, optional): Called with the epoch and its mean batch error.
+
+    Returns:
+        dict: Red's fitted 'men' and 'kings' values, 'k', and the error over the
+        ``k`` sample before ('initial_loss') and after ('loss') fitting.
+    """
+    if len(positions) == 0:
+        raise ValueError("no positions to fit")
+    tables = DEFAULT_TABLES if initial is None else initial
+    weights = np.array(tables['R'][0] + tables['R'][1], dtype=np.float64)
+    sample = np.asarray(positions[:K_SAMPLE])
+    sample_x, sample_y = features(sample), targets(sample)
+    k = fit_k(weights, sample_x, sample_y)
+    initial_loss = loss(weights, sample_x, sample_y, k)
+
+    rng = np.random.default_rng(seed)
+    moment = np.zeros_like(weights)
+    velocity = np.zeros_like(weights)
+    beta1, beta2, epsilon = 0.9, 0.999, 1e-8
+    steps = 0
+    starts = np.arange(0, len(positions), batch_size)
+    for epoch in range(epochs):
+        errors = []
+        for start in rng.permutation(starts):
+            batch = np.asarray(positions[start:start + batch_size])
+            x, y = features(batch), targets(batch)
+            predicted = 1.0 / (1.0 + np.exp(-k * (x @ weights)))
+            # d/dw of mean((p - y)^2), with dp/dscore = k p (1 - p)
+            gradient = x.T @ (2.0 * (predicted - y) * k * predicted * (1.0 - predicted)) / len(batch)
+            steps += 1
+            moment = beta1 * moment + (1.0 - beta1) * gradient
+            velocity = beta2 * velocity + (1.0 - beta2) * gradient ** 2
+            weights -= rate * (moment / (1.0 - beta1 ** steps)) / (np.sqrt(velocity / (1.0 - beta2 ** steps)) + epsilon)
+            errors.append(float(np.mean((predicted - y) ** 2)))
+        if progress is not None:
+            progress(epoch + 1, float(np.mean(errors)))
+
+    rounded = np.rint(weights)
+    return {
+        'men': [int(value) for value in rounded[:32]],
+        'kings': [int(value) for value in rounded[32:]],
+        'k': k,
+        'initial_loss': round(initial_loss, 6),
+        'loss': round(loss(rounded, sample_x, sample_y, k), 6),
+    }
+
+
+def main(argv=None):
+    """
+    Run the tuning command line.
+
+    Returns:
+        int: The exit status.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+    sub = commands.add_parser('positions')
+    sub.add_argument('paths', nargs='+')
+    sub.add_argument('--output', required=True)
+    sub = commands.add_parser('fit')
+    sub.add_argument('path')
+    sub.add_argument('--output', required=True)
+    sub.add_argument('--epochs', type=int, default=DEFAULT_EPOCHS)
+    sub.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    sub.add_argument('--rate', type=float, default=DEFAULT_RATE)
+    args = parser.parse_args(argv)
+
+    if args.command == 'positions':
+        print(json.dumps(write_positions(args.paths, args.output)))
+        return 0
+
+    fitted = fit(load_positions(args.path), args.epochs, args.batch_size, args.rate,
+                 progress=lambda epoch, error: print('epoch', epoch, 'error', round(error, 6), file=sys.stderr))
+    write_tables(args.output, fitted.pop('men'), fitted.pop('kings'), **fitted)
+    print(json.dumps(fitted))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
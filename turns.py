@@ -0,0 +1,127 @@
+"""
+Background execution of the CPU player's turns for the web app.
+
+A request that ends the human's turn hands the CPU player's reply to a
+``TurnQueue`` and returns at once; the client polls for the result. The
+queue runs turns on a fixed number of threads and refuses new turns once
+a bounded number are waiting or running, so a burst of slow searches
+cannot pile up without limit.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class TurnQueue:
+    """
+    A bounded pool of threads playing CPU turns, with queue metrics.
+
+    Attributes:
+        max_pending (int): The most turns waiting or running at once.
+        queued (int): Turns waiting for a thread.
+        running (int): Turns being played.
+        submitted (int): Turns accepted.
+        completed (int): Turns finished, including failed ones.
+        failed (int): Turns that raised an exception.
+        rejected (int): Turns refused because the queue was full.
+    """
+
+    def __init__(self, workers=4, max_pending=64, clock=time.perf_counter):
+        """
+        Create the queue and its threads.
+
+        Args:
+            workers (int): The number of threads playing turns.
+            max_pending (int): The most turns waiting or running at once.
+            clock (callable): Returns the current time in seconds.
+        """
+        self.max_pending = max_pending
+        self.clock = clock
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='cpu-turn')
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.running = 0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._run_total = 0.0
+
+    def submit(self, turn, *args):
+        """
+        Queue a turn to be played in the background.
+
+        Args:
+            turn (callable): Plays the turn; called with ``args``.
+
+        Returns:
+            bool: True if the turn was queued, False if the queue is full.
+        """
+        with self._lock:
+            if self.queued + self.running >= self.max_pending:
+                self.rejected += 1
+                return False
+            self.queued += 1
+            self.submitted += 1
+        self._executor.submit(self._run, self.clock(), turn, args)
+        return True
+
+    def _run(self, submitted_at, turn, args):
+        """
+        Play a queued turn on a pool thread, recording its wait and run times.
+        """
+        started = self.clock()
+        wait = started - submitted_at
+        with self._lock:
+            self.queued -= 1
+            self.running += 1
+            self._wait_total += wait
+            self._wait_max = max(self._wait_max, wait)
+        failed = False
+        try:
+            turn(*args)
+        except Exception:
+            failed = True
+            logger.exception("CPU turn failed")
+        finally:
+            with self._lock:
+                self.running -= 1
+                self.completed += 1
+                self.failed += failed
+                self._run_total += self.clock() - started
+
+    def stats(self):
+        """
+        Get the queue's counters and timings, for sizing it against the player load.
+
+        Returns:
+            dict: Queue depth, running turns, turn counts and wait/run times in milliseconds.
+        """
+        with self._lock:
+            started = self.completed + self.running
+            return {
+                'queued': self.queued,
+                'running': self.running,
+                'max_pending': self.max_pending,
+                'submitted': self.submitted,
+                'completed': self.completed,
+                'failed': self.failed,
+                'rejected': self.rejected,
+                'wait_ms_avg': round(self._wait_total / started * 1000.0, 3) if started else 0.0,
+                'wait_ms_max': round(self._wait_max * 1000.0, 3),
+                'run_ms_avg': round(self._run_total / self.completed * 1000.0, 3) if self.completed else 0.0,
+            }
+
+    def shutdown(self, wait=True):
+        """
+        Stop the threads once the queued turns are played.
+
+        Args:
+            wait (bool): Whether to block until they are.
+        """
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,146 @@
+"""
+Compact encodings of the board, for the web client and for storage.
+
+A board travels as a string of 32 characters, one per playable square in
+the order of ``bitboard.py``, using the letters of the position diagrams in
+``bench.py``:
+
+    . empty, r red man, R red king, b black man, B black king
+
+A delta lists only the squares that changed, as ``[square, character]``
+pairs, so a move costs a few bytes instead of the whole 8x8 grid.
+
+A position is stored as a fixed 13-byte record: three 32-bit planes with one
+bit per square, so each square takes three bits (occupied, black, king),
+then a flags byte with the side to move, whether a multi-capture is in
+progress and, in its top five bits, the square of the capturing piece.
+Records of one size can be concatenated into a file and read back with
+``POSITION.iter_unpack`` or at any offset with ``unpack_position``.
+"""
+import struct
+
+from bitboard import POSITIONS
+from checkers import CheckersBoard
+
+EMPTY = '.'
+CODES = {' ': EMPTY, 'R': 'r', 'RQ': 'R', 'B': 'b', 'BQ': 'B'}
+PIECES = {code: piece for piece, code in CODES.items()}
+
+# Occupied, black and king planes, then the flags
+POSITION = struct.Struct('<3IB')
+BLACK_TO_MOVE = 0x01
+MULTI_CAPTURE = 0x02
+CAPTURING_SHIFT = 3
+
+
+def pack_board(board):
+    """
+    Encode a board as a 32-character string.
+
+    Args:
+        board (CheckersBoard): The position.
+
+    Returns:
+        str: One character per playable square.
+    """
+    return ''.join(CODES[board.piece_at(square)] for square in range(32))
+
+
+def unpack_board(squares):
+    """
+    Decode a 32-character string into the 8x8 list view of ``CheckersBoard.board``.
+
+    Args:
+        squares (str): One character per playable square.
+
+    Returns:
+        list: A 2D list with 'R', 'B', 'RQ', 'BQ' or ' ' in each cell.
+
+    Raises:
+        ValueError: If the string is not a packed board.
+    """
+    if len(squares) != 32 or any(code not in PIECES for code in squares):
+        raise ValueError(f"not a packed board: {squares!r}")
+    cells = [[' '] * 8 for _ in range(8)]
+    for square, code in enumerate(squares):
+        row, col = POSITIONS[square]
+        cells[row][col] = PIECES[code]
+    return cells
+
+
+def board_delta(old, new):
+    """
+    List the squares that differ between two packed boards.
+
+    Args:
+        old (str): The earlier packed board.
+        new (str): The later packed board.
+
+    Returns:
+        list: ``[square, character]`` pairs giving the new contents of each changed square.
+    """
+    return [[square, code] for square, (before, code) in enumerate(zip(old, new)) if before != code]
+
+
+def apply_delta(squares, delta):
+    """
+    Apply a delta to a packed board; the inverse of ``board_delta``.
+
+    Args:
+        squares (str): The earlier packed board.
+        delta (list): ``[square, character]`` pairs.
+
+    Returns:
+        str: The later packed board.
+    """
+    cells = list(squares)
+    for square, code in delta:
+        cells[square] = code
+    return ''.join(cells)
+
+
+def pack_position(board):
+    """
+    Encode a position as a fixed-size binary record.
+
+    Args:
+        board (CheckersBoard): The position.
+
+    Returns:
+        bytes: ``POSITION.size`` bytes.
+    """
+    men, kings = board.men, board.kings
+    black = men['B'] | kings['B']
+    flags = BLACK_TO_MOVE if board.current_player == 'B' else 0
+    if board.multi_capture_in_progress:
+        flags |= MULTI_CAPTURE | board.capturing_square << CAPTURING_SHIFT
+    return POSITION.pack(men['R'] | kings['R'] | black, black, kings['R'] | kings['B'], flags)
+
+
+def unpack_position(data, offset=0, board=None):
+    """
+    Decode a binary record into a board; the inverse of ``pack_position``.
+
+    Args:
+        data (bytes): A buffer holding the record.
+        offset (int): Where the record starts in the buffer.
+        board (CheckersBoard, optional): A board to overwrite instead of creating one.
+
+    Returns:
+        CheckersBoard: The position.
+
+    Raises:
+        ValueError: If the record is not a packed position.
+    """
+    occupied, black, kings, flags = POSITION.unpack_from(data, offset)
+    capturing = flags >> CAPTURING_SHIFT if flags & MULTI_CAPTURE else -1
+    if black & ~occupied or kings & ~occupied or flags & 0x04 or (capturing < 0 and flags >> CAPTURING_SHIFT):
+        raise ValueError(f"not a packed position at offset {offset}")
+    red = occupied & ~black
+    if board is None:
+        board = CheckersBoard()
+    board.set_pieces({'R': red & ~kings, 'B': black & ~kings}, {'R': red & kings, 'B': black & kings})
+    board.current_player = 'B' if flags & BLACK_TO_MOVE else 'R'
+    board.multi_capture_in_progress = bool(flags & MULTI_CAPTURE)
+    board.capturing_square = capturing
+    return board
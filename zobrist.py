@@ -0,0 +1,38 @@
+"""
+Zobrist keys for hashing checkers positions.
+
+A position's hash is the XOR of one random 64-bit key per piece (by colour,
+type and square), plus a key when Black is to move and, while a
+multi-capture is in progress, a key for the square of the capturing piece.
+The keys come from a fixed seed so hashes are stable across processes and
+runs, which lets them be stored on disk.
+"""
+import random
+
+_rng = random.Random(0x5EED_C4EC)
+
+MEN_KEYS = {player: [_rng.getrandbits(64) for _ in range(32)] for player in ('R', 'B')}
+KING_KEYS = {player: [_rng.getrandbits(64) for _ in range(32)] for player in ('R', 'B')}
+BLACK_TO_MOVE_KEY = _rng.getrandbits(64)
+CAPTURING_KEYS = [_rng.getrandbits(64) for _ in range(32)]
+
+
+def hash_pieces(men, kings):
+    """
+    Computes the hash of a set of pieces from scratch.
+
+    Args:
+        men (dict): Bitboard of each player's men, keyed by 'R' and 'B'.
+        kings (dict): Bitboard of each player's kings, keyed by 'R' and 'B'.
+
+    Returns:
+        int: The XOR of the keys of every piece on the board.
+    """
+    key = 0
+    for player in ('R', 'B'):
+        for pieces, keys in ((men[player], MEN_KEYS[player]), (kings[player], KING_KEYS[player])):
+            while pieces:
+                low = pieces & -pieces
+                key ^= keys[low.bit_length() - 1]
+                pieces ^= low
+    return key